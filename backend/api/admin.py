@@ -1,7 +1,58 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import UserProfile, Category, Product, Sale, SaleItem
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from . import inventory
+from .db_router import use_replica
+from .models import UserProfile, Category, Product, Sale, SaleItem, ZReport, StockMovement, StockSnapshot, StockTake
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses PostgreSQL's row estimate for unfiltered changelists.
+
+    COUNT(*) over millions of partitioned sales rows is a full scan; the
+    planner's reltuples (summed over the partitions) is close enough for page
+    links. Filtered querysets and small tables still get an exact count.
+    """
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            table = queryset.model._meta.db_table
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint FROM pg_class c '
+                    'WHERE c.oid = %s::regclass OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)',
+                    [table, table],
+                )
+                estimate = cursor.fetchone()[0]
+            if estimate >= self.exact_below:
+                return estimate
+        return super().count
+
+
+class ReplicaChangeListMixin:
+    """Serve changelist pages (GET only; actions write) from the read replica when configured"""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with use_replica():
+            response = super().changelist_view(request, extra_context)
+            # Template responses render lazily; render while still routed
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+
+class ReportingAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    pass
 
 
 class UserProfileInline(admin.StackedInline):
@@ -14,12 +65,76 @@ class UserAdmin(BaseUserAdmin):
     inlines = (UserProfileInline,)
 
 
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('name', 'sku', 'category', 'price', 'stock', 'reorder_level')
+    list_select_related = ('category',)
+    # sku is unique (indexed); also used by the product autocomplete widgets
+    search_fields = ('=sku', 'name')
+
+    def save_model(self, request, obj, form, change):
+        # The change view runs in a transaction; lock the row like ProductSerializer.update
+        previous = 0
+        if change:
+            previous = Product.objects.select_for_update().values_list('stock', flat=True).get(pk=obj.pk)
+            if 'stock' not in form.changed_data:
+                obj.stock = previous
+        super().save_model(request, obj, form, change)
+        inventory.record_movements([
+            inventory.movement(obj.pk, 'adjustment' if change else 'restock', obj.stock - previous,
+                               user=request.user, note='Admin edit' if change else 'Initial stock')
+        ])
+
+
+class SaleItemInline(admin.TabularInline):
+    """Read-only lines: editing a completed sale here would bypass the stock ledger"""
+    model = SaleItem
+    extra = 0
+    fields = ('product', 'quantity', 'unit_price', 'subtotal')
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        # Each row renders str(item) and the product name
+        return super().get_queryset(request).select_related('sale', 'product')
+
+
+@admin.register(Sale)
+class SaleAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('receipt_number', 'created_at', 'total_amount', 'payment_method', 'customer_name', 'created_by')
+    list_select_related = ('created_by',)
+    search_fields = ('=receipt_number',)
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
+    autocomplete_fields = ('created_by',)
+    inlines = (SaleItemInline,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(SaleItem)
+class SaleItemAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('id', 'sale', 'product', 'quantity', 'unit_price', 'subtotal', 'created_at')
+    list_select_related = ('sale', 'product')
+    search_fields = ('=sale__receipt_number', '=product__sku')
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
+    raw_id_fields = ('sale',)
+    autocomplete_fields = ('product',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 # Re-register UserAdmin
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
 
 admin.site.register(UserProfile)
 admin.site.register(Category)
-admin.site.register(Product)
-admin.site.register(Sale)
-admin.site.register(SaleItem)
\ No newline at end of file
+admin.site.register(ZReport, ReportingAdmin)
+admin.site.register(StockMovement, ReportingAdmin)
+admin.site.register(StockSnapshot, ReportingAdmin)
+admin.site.register(StockTake)
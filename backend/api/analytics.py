@@ -0,0 +1,193 @@
+"""
+Dashboard analytics payload.
+
+Shared by AnalyticsView and anything else that needs the same numbers; the
+result is plain JSON-serializable data so it can be cached as-is. Each section
+is an independent query, built here once and evaluated either synchronously
+(``build_analytics_payload``) or concurrently on the async ORM
+(``abuild_analytics_payload``).
+"""
+import asyncio
+from datetime import timedelta
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncDate
+from django.utils import timezone
+
+from .models import Product, Sale, SaleItem
+from .utils import day_range
+
+SALE_TOTALS = {'total': Sum('total_amount'), 'orders': Count('id')}
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+def default_date_range():
+    """Last 7 days including today"""
+    end_date = timezone.localdate()
+    return end_date - timedelta(days=6), end_date
+
+
+def _daily_sales_query(start_date, end_date):
+    range_start, _ = day_range(start_date)
+    _, range_end = day_range(end_date)
+    return (
+        Sale.objects.filter(created_at__gte=range_start, created_at__lt=range_end)
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(revenue=Sum('total_amount'), orders=Count('id'))
+    )
+
+
+def _payment_methods_query():
+    return Sale.objects.values('payment_method').annotate(
+        total=Sum('total_amount'),
+        count=Count('id')
+    ).order_by('-total')
+
+
+def _top_products_query():
+    return SaleItem.objects.values(
+        'product__name', 'product__price'
+    ).annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum('subtotal')
+    ).order_by('-total_quantity')[:5]
+
+
+def _today_sales_query():
+    today_start, today_end = day_range(timezone.localdate())
+    return Sale.objects.filter(created_at__gte=today_start, created_at__lt=today_end)
+
+
+def _low_stock_query():
+    return Product.objects.filter(
+        stock__lte=F('reorder_level')
+    ).values('id', 'name', 'stock', 'reorder_level')[:10]
+
+
+def _assemble(start_date, end_date, daily_rows, payment_methods, top_products, totals, today, low_stock_products):
+    per_day = {row['day']: row for row in daily_rows}
+    daily_sales = []
+    for i in range((end_date - start_date).days + 1):
+        date = start_date + timedelta(days=i)
+        row = per_day.get(date, {})
+        daily_sales.append({
+            'day': date.strftime('%a'),  # Mon, Tue, etc.
+            'date': date.isoformat(),
+            'revenue': float(row.get('revenue') or 0),
+            'orders': row.get('orders', 0)
+        })
+
+    payment_data = [
+        {
+            'name': method['payment_method'] or 'Cash',
+            'value': float(method['total'] or 0),
+            'count': method['count']
+        }
+        for method in payment_methods
+    ]
+
+    top_products_data = [
+        {
+            'name': product['product__name'][:20] + ('...' if len(product['product__name']) > 20 else ''),
+            'sales': product['total_quantity'],
+            'revenue': float(product['total_revenue'] or 0)
+        }
+        for product in top_products
+    ]
+
+    total_sales = totals['total'] or 0
+    total_orders = totals['orders']
+
+    return {
+        'daily_sales': daily_sales,
+        'payment_methods': payment_data,
+        'top_products': top_products_data,
+        'statistics': {
+            'total_revenue': float(total_sales),
+            'total_orders': total_orders,
+            'today_revenue': float(today['total'] or 0),
+            'today_orders': today['orders'],
+            'avg_order_value': float(total_sales / total_orders) if total_orders > 0 else 0
+        },
+        'low_stock_products': list(low_stock_products)
+    }
+
+
+def build_analytics_payload(start_date, end_date):
+    """Compute the analytics dashboard payload for [start_date, end_date]"""
+    return _assemble(
+        start_date, end_date,
+        list(_daily_sales_query(start_date, end_date)),
+        list(_payment_methods_query()),
+        list(_top_products_query()),
+        Sale.objects.aggregate(**SALE_TOTALS),
+        _today_sales_query().aggregate(**SALE_TOTALS),
+        list(_low_stock_query()),
+    )
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+async def abuild_analytics_payload(start_date, end_date):
+    """Async counterpart of build_analytics_payload.
+
+    The sections are awaited together with ``asyncio.gather`` so the event
+    loop never blocks on them; Django still runs ORM calls for one request on
+    its sync thread, so other requests are what gain the concurrency.
+    """
+    sections = await asyncio.gather(
+        _alist(_daily_sales_query(start_date, end_date)),
+        _alist(_payment_methods_query()),
+        _alist(_top_products_query()),
+        Sale.objects.aaggregate(**SALE_TOTALS),
+        _today_sales_query().aaggregate(**SALE_TOTALS),
+        _alist(_low_stock_query()),
+    )
+    return _assemble(start_date, end_date, *sections)
+
+
+def build_heatmap_payload(start_date, end_date, tz):
+    """
+    Revenue and orders per local weekday x hour over [start_date, end_date] in ``tz``.
+
+    One grouped query; COUNT(*) and SUM(total_amount) over a created_at range
+    are covered by api_sale_created_at_total_idx, so long ranges stay an
+    index-only scan.
+    """
+    with timezone.override(tz):
+        range_start, _ = day_range(start_date)
+        _, range_end = day_range(end_date)
+    rows = (
+        Sale.objects.filter(created_at__gte=range_start, created_at__lt=range_end)
+        .annotate(weekday=ExtractIsoWeekDay('created_at', tzinfo=tz), hour=ExtractHour('created_at', tzinfo=tz))
+        .values('weekday', 'hour')
+        .annotate(revenue=Sum('total_amount'), orders=Count('*'))
+        .order_by()
+    )
+    revenue = [[0.0] * 24 for _ in WEEKDAYS]
+    orders = [[0] * 24 for _ in WEEKDAYS]
+    for row in rows:
+        revenue[row['weekday'] - 1][row['hour']] = float(row['revenue'] or 0)
+        orders[row['weekday'] - 1][row['hour']] = row['orders']
+
+    busiest = max(
+        ((day, hour) for day in range(len(WEEKDAYS)) for hour in range(24)),
+        key=lambda cell: (orders[cell[0]][cell[1]], revenue[cell[0]][cell[1]]),
+    )
+    return {
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'time_zone': str(tz),
+        'weekdays': list(WEEKDAYS),
+        'hours': list(range(24)),
+        'revenue': revenue,
+        'orders': orders,
+        'busiest': {
+            'weekday': WEEKDAYS[busiest[0]],
+            'hour': busiest[1],
+            'orders': orders[busiest[0]][busiest[1]],
+        } if orders[busiest[0]][busiest[1]] else None,
+    }
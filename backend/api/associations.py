@@ -0,0 +1,182 @@
+"""
+"Frequently bought together" index for POS suggestions.
+
+``build()`` reads the distinct (sale, product) pairs of the last
+ASSOCIATION_HISTORY_DAYS in windows of ASSOCIATION_CHUNK_DAYS. A sale's items
+share its created_at, so windows never split a basket and each one is a
+partition-pruned range scan. Every window becomes a sparse baskets x products
+incidence matrix B, and B^T B adds its pair counts to a sparse products x
+products co-occurrence matrix (the diagonal holds each product's basket
+count), so memory is bounded by one window plus the co-occurrence counts.
+
+Neighbours need ASSOCIATION_MIN_SUPPORT shared baskets and are ranked by lift
+(how much more often the two are bought together than by chance); the top
+ASSOCIATION_TOP_K per product replace the ProductAssociation table in one
+transaction. SciPy does the sparse products when installed; otherwise the
+same counts come from pairing items within baskets in NumPy.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Product, ProductAssociation, SaleItem
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+# Bigger baskets (bulk or wholesale orders) say little about what goes together
+MAX_BASKET_ITEMS = 50
+
+
+def _window_baskets(start, end, product_ids):
+    """(basket index, product column) arrays for the sales in [start, end)"""
+    rows = list(
+        SaleItem.objects.filter(created_at__gte=start, created_at__lt=end, product__isnull=False)
+        .values_list('sale_id', 'product_id').distinct().order_by()
+    )
+    pairs = np.array(rows, dtype=np.int64).reshape(-1, 2)
+    columns = np.minimum(np.searchsorted(product_ids, pairs[:, 1]), max(len(product_ids) - 1, 0))
+    known = product_ids[columns] == pairs[:, 1] if len(product_ids) else np.zeros(len(pairs), dtype=bool)
+    _, baskets = np.unique(pairs[known, 0], return_inverse=True)
+    columns = columns[known]
+    sizes = np.bincount(baskets)
+    small = sizes[baskets] <= MAX_BASKET_ITEMS
+    _, baskets = np.unique(baskets[small], return_inverse=True)
+    return baskets, columns[small]
+
+
+def _pair_counts_numpy(baskets, columns, size):
+    """Co-occurrence counts (including each item with itself) as (codes, counts), ``code = a * size + b``"""
+    order = np.argsort(baskets, kind='stable')
+    baskets, columns = baskets[order], columns[order]
+    sizes = np.bincount(baskets)
+    per_item = sizes[baskets]
+    first = np.repeat(np.cumsum(sizes) - sizes, sizes)
+    left = np.repeat(np.arange(len(columns)), per_item)
+    right = np.repeat(first, per_item) + (np.arange(len(left)) - np.repeat(np.cumsum(per_item) - per_item, per_item))
+    return np.unique(columns[left] * size + columns[right], return_counts=True)
+
+
+class CooccurrenceCounter:
+    """Accumulates a products x products co-occurrence matrix window by window"""
+
+    def __init__(self, size):
+        self.size = size
+        self.baskets = 0
+        if sparse is not None:
+            self.matrix = sparse.csr_matrix((size, size), dtype=np.int64)
+        else:
+            self.codes = np.zeros(0, dtype=np.int64)
+            self.counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, baskets, columns):
+        if not len(baskets):
+            return
+        count = int(baskets.max()) + 1
+        self.baskets += count
+        if sparse is not None:
+            incidence = sparse.csr_matrix(
+                (np.ones(len(baskets), dtype=np.int64), (baskets, columns)), shape=(count, self.size),
+            )
+            self.matrix = self.matrix + (incidence.T @ incidence).tocsr()
+            return
+        codes, counts = _pair_counts_numpy(baskets, columns, self.size)
+        self.codes, inverse = np.unique(np.concatenate([self.codes, codes]), return_inverse=True)
+        self.counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts])).astype(np.int64)
+
+    def triples(self):
+        """(row, column, count) arrays of the non-zero entries"""
+        if sparse is not None:
+            matrix = self.matrix.tocoo()
+            return matrix.row.astype(np.int64), matrix.col.astype(np.int64), matrix.data
+        return self.codes // self.size, self.codes % self.size, self.counts
+
+
+def top_neighbours(rows, columns, counts, baskets, top_k, min_support):
+    """Rank neighbours per product by lift; returns arrays (product, neighbour, rank, support, confidence, lift)"""
+    totals = np.zeros(int(max(rows.max(initial=-1), columns.max(initial=-1))) + 1, dtype=np.int64)
+    diagonal = rows == columns
+    totals[rows[diagonal]] = counts[diagonal]
+
+    keep = ~diagonal & (counts >= min_support)
+    rows, columns, counts = rows[keep], columns[keep], counts[keep]
+    confidence = counts / totals[rows]
+    lift = counts * baskets / (totals[rows] * totals[columns])
+
+    order = np.lexsort((-counts, -lift, rows))
+    rows, columns, counts, confidence, lift = (values[order] for values in (rows, columns, counts, confidence, lift))
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)])) + 1
+    top = rank <= top_k
+    return rows[top], columns[top], rank[top], counts[top], confidence[top], lift[top]
+
+
+def build(history_days=None, top_k=None, min_support=None, now=None):
+    """Rebuild the association table from recent sales; returns a summary dict"""
+    history_days = history_days or settings.ASSOCIATION_HISTORY_DAYS
+    top_k = top_k or settings.ASSOCIATION_TOP_K
+    min_support = min_support or settings.ASSOCIATION_MIN_SUPPORT
+    now = now or timezone.now()
+
+    product_ids = np.fromiter(Product.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+    counter = CooccurrenceCounter(len(product_ids))
+    start = now - timedelta(days=history_days)
+    while start < now:
+        end = min(start + timedelta(days=settings.ASSOCIATION_CHUNK_DAYS), now)
+        counter.add(*_window_baskets(start, end, product_ids))
+        start = end
+
+    rows, columns, ranks, support, confidence, lift = top_neighbours(*counter.triples(), counter.baskets, top_k, min_support)
+    product_ids = product_ids.tolist()
+    associations = [
+        ProductAssociation(
+            product_id=product_ids[row], associated_id=product_ids[column], rank=rank,
+            support=count, confidence=round(conf, 4), lift=round(value, 4),
+        )
+        for row, column, rank, count, conf, value in zip(
+            rows.tolist(), columns.tolist(), ranks.tolist(), support.tolist(), confidence.tolist(), lift.tolist()
+        )
+    ]
+    with transaction.atomic():
+        ProductAssociation.objects.all().delete()
+        ProductAssociation.objects.bulk_create(associations, batch_size=5000)
+    return {
+        'baskets': counter.baskets,
+        'products': len({association.product_id for association in associations}),
+        'associations': len(associations),
+        'engine': 'scipy' if sparse is not None else 'numpy',
+    }
+
+
+def suggestions(product_ids, limit):
+    """
+    Add-on suggestions for a cart: the cart items' stored neighbours that are
+    in stock and not already in the cart, scored by summed lift (one query).
+    """
+    rows = ProductAssociation.objects.filter(
+        product_id__in=product_ids, associated__stock__gt=0,
+    ).exclude(associated_id__in=product_ids).values(
+        'associated_id', 'associated__name', 'associated__sku', 'associated__price', 'support', 'lift',
+    )
+    scored = {}
+    for row in rows:
+        entry = scored.setdefault(row['associated_id'], {
+            'product_id': row['associated_id'],
+            'name': row['associated__name'],
+            'sku': row['associated__sku'],
+            'price': row['associated__price'],
+            'score': 0.0,
+            'support': 0,
+        })
+        # Suggested by several cart items -> ranked higher
+        entry['score'] += row['lift']
+        entry['support'] += row['support']
+    ranked = sorted(scored.values(), key=lambda entry: (-entry['score'], -entry['support'], entry['product_id']))
+    for entry in ranked:
+        entry['score'] = round(entry['score'], 4)
+    return ranked[:limit]
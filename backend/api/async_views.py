@@ -0,0 +1,250 @@
+"""
+Async versions of the read-heavy endpoints, for ASGI deployments
+(``uvicorn backend_project.asgi:application``).
+
+DRF views are synchronous, so under ASGI every request to them occupies a
+worker thread for its whole duration. These plain Django async views use the
+async ORM instead and return the same payloads as their DRF counterparts in
+views.py. They authenticate with the same ``Authorization: Token <key>``
+header and enforce the same role permissions.
+"""
+import asyncio
+import math
+from datetime import date
+from functools import wraps
+
+from django.http import HttpResponse
+from rest_framework.authtoken.models import Token
+
+from .analytics import abuild_analytics_payload, default_date_range
+from .cache import acached_payload
+from .db_router import use_replica
+from .models import Category, Product, StoreSettings, UserProfile
+from .notifications import PAGE_SIZE, aunread_count, page_data, page_queryset
+from .permissions import get_user_permissions
+from .renderers import dumps
+from .serializers import ProductValuesSerializer
+from .throttling import atake_token, scope_for, throttle_scope
+from .views import AnalyticsView, notification_data, store_settings_data
+
+
+async def aget_user(request):
+    """Resolve the token user (with profile) in a single query, or None"""
+    header = request.headers.get('Authorization', '')
+    keyword, _, key = header.partition(' ')
+    if keyword != 'Token' or not key:
+        return None
+    try:
+        token = await Token.objects.select_related('user__profile').aget(key=key.strip())
+    except Token.DoesNotExist:
+        return None
+    return token.user if token.user.is_active else None
+
+
+async def aget_profile(user):
+    try:
+        return user.profile
+    except UserProfile.DoesNotExist:
+        # Create default profile for users without one
+        return await UserProfile.objects.acreate(user=user, role='staff')
+
+
+def async_require_permission(permission=None):
+    """Async equivalent of ``permissions.require_permission``
+
+    Authenticates the request and stores the user on ``request.user``.
+    With ``permission=None`` only authentication is required. Like the DRF
+    views, the request then takes a token from the user's bucket for the
+    view's ``throttle_scope`` (429 when it is empty).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            user = await aget_user(request)
+            if user is None:
+                return json_response({'error': 'Authentication required'}, status=401)
+            request.user = user
+
+            if permission and not user.is_superuser:
+                profile = await aget_profile(user)
+                if not profile.has_permission(permission):
+                    return json_response({
+                        'error': f'Permission denied. Required: {permission}',
+                        'user_role': profile.role,
+                        'user_permissions': profile.permissions
+                    }, status=403)
+
+            wait = await atake_token(scope_for(wrapper, request.method), f'user:{user.pk}')
+            if wait is not None:
+                response = json_response({
+                    'detail': f'Request was throttled. Expected available in {math.ceil(wait)} seconds.'
+                }, status=429)
+                response['Retry-After'] = str(math.ceil(wait))
+                return response
+
+            return await view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def json_response(data, status=200):
+    return HttpResponse(dumps(data), content_type='application/json', status=status)
+
+
+def method_not_allowed():
+    return json_response({'detail': 'Method not allowed'}, status=405)
+
+
+@async_require_permission('view_products')
+async def products(request):
+    if request.method != 'GET':
+        return method_not_allowed()
+    serializer = ProductValuesSerializer(Product.objects.order_by('id'))
+    rows = [serializer.to_representation(row) async for row in serializer.queryset.values(*serializer.fields)]
+    return json_response(rows)
+
+
+@async_require_permission()
+async def notifications(request):
+    if request.method != 'GET':
+        return method_not_allowed()
+    try:
+        rows, limit = page_queryset(
+            request.user,
+            cursor=request.GET.get('cursor'),
+            limit=request.GET.get('limit', PAGE_SIZE),
+        )
+    except ValueError:
+        return json_response({'error': 'Invalid cursor or limit'}, status=400)
+    return json_response(page_data([notif async for notif in rows], limit, notification_data))
+
+
+@async_require_permission()
+async def store_settings(request):
+    if request.method != 'GET':
+        return method_not_allowed()
+    settings, _ = await StoreSettings.objects.aget_or_create(id=1)
+    return json_response(store_settings_data(settings))
+
+
+@throttle_scope('reports')
+@async_require_permission('view_analytics')
+async def analytics(request):
+    if request.method != 'GET':
+        return method_not_allowed()
+    start_date, end_date = default_date_range()
+    try:
+        if request.GET.get('start'):
+            start_date = date.fromisoformat(request.GET['start'])
+        if request.GET.get('end'):
+            end_date = date.fromisoformat(request.GET['end'])
+    except ValueError:
+        return json_response({'error': 'start and end must be dates in YYYY-MM-DD format'}, status=400)
+
+    max_days = AnalyticsView.max_days
+    if start_date > end_date or (end_date - start_date).days >= max_days:
+        return json_response({
+            'error': f'start must be before end and the range at most {max_days} days'
+        }, status=400)
+
+    user = request.user
+    role = 'superuser' if user.is_superuser else (await aget_profile(user)).role
+    with use_replica():
+        payload = await acached_payload(
+            'analytics',
+            f'{role}:{start_date.isoformat()}:{end_date.isoformat()}',
+            lambda: abuild_analytics_payload(start_date, end_date),
+        )
+    return json_response(payload)
+
+
+BOOTSTRAP_SECTIONS = ('user', 'settings', 'notifications', 'analytics', 'categories', 'products')
+# Sections that need a permission; the rest only need a signed-in user
+BOOTSTRAP_PERMISSIONS = {'analytics': 'view_analytics', 'products': 'view_products'}
+
+
+def _user_section(user, profile):
+    return {
+        'user_id': user.id,
+        'username': user.username,
+        'role': profile.role if profile else None,
+        'role_display': profile.role_display if profile else None,
+        'permissions': get_user_permissions(user),
+        'is_superuser': user.is_superuser,
+    }
+
+
+async def _settings_section():
+    settings, _ = await StoreSettings.objects.aget_or_create(id=1)
+    return store_settings_data(settings)
+
+
+async def _notifications_section(user):
+    rows, limit = page_queryset(user)
+    page = page_data([notif async for notif in rows], limit, notification_data)
+    page['unread_count'] = await aunread_count(user)
+    return page
+
+
+async def _analytics_section(role):
+    start_date, end_date = default_date_range()
+    with use_replica():
+        return await acached_payload(
+            'analytics',
+            f'{role}:{start_date.isoformat()}:{end_date.isoformat()}',
+            lambda: abuild_analytics_payload(start_date, end_date),
+        )
+
+
+async def _categories_section():
+    return [row async for row in Category.objects.order_by('id').values('id', 'name', 'description', 'created_at')]
+
+
+async def _products_section():
+    serializer = ProductValuesSerializer(Product.objects.order_by('id'))
+    return [serializer.to_representation(row) async for row in serializer.queryset.values(*serializer.fields)]
+
+
+@async_require_permission()
+async def bootstrap(request):
+    """
+    Everything the frontend loads at startup in one round trip.
+
+    The user and profile are resolved once; the sections run concurrently and
+    each is cached on its own (settings, per-user notifications, analytics,
+    catalogue), invalidated by the same signals as the individual endpoints.
+    ``?sections=settings,products`` limits the response; sections the user
+    lacks the permission for are left out.
+    """
+    if request.method != 'GET':
+        return method_not_allowed()
+    requested = [name for name in request.GET.get('sections', '').split(',') if name] or list(BOOTSTRAP_SECTIONS)
+    unknown = set(requested) - set(BOOTSTRAP_SECTIONS)
+    if unknown:
+        return json_response({'error': f"Unknown sections: {', '.join(sorted(unknown))}"}, status=400)
+
+    user = request.user
+    profile = None if user.is_superuser else await aget_profile(user)
+    role = 'superuser' if user.is_superuser else profile.role
+    allowed = [
+        name for name in requested
+        if name not in BOOTSTRAP_PERMISSIONS or profile is None or profile.has_permission(BOOTSTRAP_PERMISSIONS[name])
+    ]
+
+    async def section(name):
+        if name == 'user':
+            return _user_section(user, profile)
+        if name == 'settings':
+            return await acached_payload('settings', 'store', _settings_section)
+        if name == 'notifications':
+            return await acached_payload(
+                'notifications', f'bootstrap:{user.id}:{int(user.is_superuser)}', lambda: _notifications_section(user),
+            )
+        if name == 'analytics':
+            return await _analytics_section(role)
+        if name == 'categories':
+            return await acached_payload('catalog', 'categories', _categories_section)
+        return await acached_payload('catalog', 'products', _products_section)
+
+    results = await asyncio.gather(*(section(name) for name in allowed))
+    return json_response(dict(zip(allowed, results)))
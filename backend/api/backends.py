@@ -0,0 +1,37 @@
+"""
+Sign-in by email.
+
+``authenticate(request, email=..., password=...)`` finds the user through
+the ``lower(email)`` index (migration 0018) and loads the profile and token
+in the same query, so the login view answers without further reads.
+Usernames still work through ModelBackend (the admin signs in that way).
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models.functions import Lower
+
+
+def users_by_email(email):
+    """Users with ``email`` (case-insensitive), profile and token joined in"""
+    return (
+        get_user_model().objects.alias(email_lower=Lower('email'))
+        .filter(email_lower=email.strip().lower())
+        .select_related('profile', 'auth_token')
+        .order_by('pk')
+    )
+
+
+class EmailBackend(ModelBackend):
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if not email or password is None:
+            return None
+        users = list(users_by_email(email))
+        if not users:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            get_user_model()().set_password(password)
+            return None
+        # Emails are not unique in auth_user; the first account the password fits wins
+        for user in users:
+            if user.check_password(password) and self.user_can_authenticate(user):
+                return user
+        return None
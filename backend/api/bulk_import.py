@@ -0,0 +1,362 @@
+"""
+Bulk product import and price/stock updates.
+
+Rows are streamed from CSV or JSON (array or one object per line), validated
+and upserted in chunks: one ``bulk_create(update_conflicts=True)`` per chunk
+keyed on ``sku``, instead of a serializer validation plus ``save()`` per
+product. Invalid rows are reported with their row number and skipped.
+"""
+import codecs
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import inventory
+from .models import Category, Product
+from .signals import invalidate_analytics
+
+IMPORT_FIELDS = ('name', 'sku', 'description', 'category', 'price', 'cost', 'stock', 'reorder_level', 'image_url')
+# Optional columns whose blank cells keep an existing product's value
+KEEP_FIELDS = ('description', 'category_id', 'cost', 'stock', 'reorder_level', 'image_url')
+CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+
+SKU_MAX_LENGTH = Product._meta.get_field('sku').max_length
+NAME_MAX_LENGTH = Product._meta.get_field('name').max_length
+
+
+def normalize_sku(value):
+    """Same normalization as Product.save (strip + uppercase)"""
+    return str(value).strip().upper()
+
+
+def _is_valid_sku(sku):
+    return bool(sku) and len(sku) <= SKU_MAX_LENGTH and Product.sku_validator.regex.match(sku) is not None
+
+
+def _decimal(value, field, errors, required=False):
+    if value is None or str(value).strip() == '':
+        if required:
+            errors[field] = 'This field is required.'
+        return None
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        errors[field] = 'A valid number is required.'
+        return None
+    if not number.is_finite() or number < 0 or number >= Decimal('1e8'):
+        errors[field] = 'Must be between 0 and 99999999.99.'
+        return None
+    return number.quantize(Decimal('0.01'))
+
+
+def _integer(value, field, errors):
+    if value is None or str(value).strip() == '':
+        return None
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        errors[field] = 'A valid integer is required.'
+        return None
+
+
+def clean_row(row):
+    """Validate one import row; returns (values, errors). Blank optional fields are not in ``values``"""
+    errors = {}
+    values = {}
+
+    name = (row.get('name') or '').strip()
+    if not name:
+        errors['name'] = 'This field is required.'
+    elif len(name) > NAME_MAX_LENGTH:
+        errors['name'] = f'Ensure this field has no more than {NAME_MAX_LENGTH} characters.'
+    values['name'] = name
+
+    sku = normalize_sku(row.get('sku') or '')
+    if not _is_valid_sku(sku):
+        errors['sku'] = 'Uppercase letters, numbers, -, _ only (required).'
+    values['sku'] = sku
+
+    values['price'] = _decimal(row.get('price'), 'price', errors, required=True)
+    values['cost'] = _decimal(row.get('cost'), 'cost', errors)
+    if values['price'] is not None and values['cost'] is not None and values['price'] < values['cost']:
+        errors['non_field_errors'] = 'price must be greater than or equal to cost'
+
+    # Blank optional cells are left out: new products get the model default,
+    # existing ones keep their current value
+    for field in ('stock', 'reorder_level'):
+        value = _integer(row.get(field), field, errors)
+        if value is not None:
+            values[field] = value
+    if values['cost'] is None:
+        del values['cost']
+    for field in ('description', 'image_url'):
+        if row.get(field):
+            values[field] = row[field]
+    if row.get('category') not in (None, ''):
+        values['category'] = str(row['category']).strip()
+    return values, errors
+
+
+def iter_csv(stream):
+    """Yield dict rows from a binary or text CSV stream"""
+    if not isinstance(stream, io.TextIOBase):
+        stream = codecs.getreader('utf-8-sig')(stream)
+    for row in csv.DictReader(stream):
+        yield {(key or '').strip().lower(): value for key, value in row.items()}
+
+
+def iter_json(stream):
+    """Yield dict rows from a JSON array or newline-delimited JSON stream"""
+    if not isinstance(stream, io.TextIOBase):
+        stream = codecs.getreader('utf-8-sig')(stream)
+    first = stream.read(1)
+    while first and first.isspace():
+        first = stream.read(1)
+    if first == '[':
+        # A JSON array has to be parsed whole; NDJSON is streamed line by line
+        yield from json.loads(first + stream.read())
+        return
+    pending = first
+    for line in stream:
+        line = (pending + line).strip()
+        pending = ''
+        if line:
+            yield json.loads(line)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _resolve_categories(values, create=True):
+    """Map category ids/names to Category ids, creating missing names in bulk"""
+    by_id = {value for value in values if value.isdigit()}
+    names = values - by_id
+    resolved = {}
+    if by_id:
+        found = set(Category.objects.filter(id__in=[int(v) for v in by_id]).values_list('id', flat=True))
+        resolved.update({value: int(value) for value in by_id if int(value) in found})
+    if names:
+        existing = dict(Category.objects.filter(name__in=names).values_list('name', 'id'))
+        missing = names - existing.keys()
+        if missing and create:
+            Category.objects.bulk_create(Category(name=name) for name in sorted(missing))
+            existing = dict(Category.objects.filter(name__in=names).values_list('name', 'id'))
+        elif missing:
+            existing.update(dict.fromkeys(missing))
+        resolved.update(existing)
+    return resolved
+
+
+class ImportResult:
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row_number, sku, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'sku': sku, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+
+def import_products(rows, columns=None, chunk_size=CHUNK_SIZE, dry_run=False, user=None):
+    """
+    Upsert products from an iterable of dict rows.
+
+    ``columns`` limits which fields are overwritten on existing products (by
+    default the keys of the first row); new products get model defaults for
+    anything not supplied. Stock changes are written to the movement ledger
+    (restock for new products, adjustment for existing ones).
+    """
+    result = ImportResult()
+    row_number = 0
+    update_fields = None
+
+    for chunk in _chunks(rows, chunk_size):
+        if update_fields is None:
+            present = set(columns or next((row.keys() for row in chunk if isinstance(row, dict)), ()))
+            update_fields = [
+                'category_id' if f == 'category' else f for f in IMPORT_FIELDS if f in present and f != 'sku'
+            ] + ['updated_at']
+
+        valid = {}
+        for row in chunk:
+            row_number += 1
+            result.processed += 1
+            if not isinstance(row, dict):
+                result.add_error(row_number, None, {'non_field_errors': 'Each row must be an object.'})
+                continue
+            values, errors = clean_row(row)
+            if errors:
+                result.add_error(row_number, values.get('sku') or None, errors)
+                continue
+            # Later rows for the same SKU win
+            valid[values['sku']] = (row_number, values)
+
+        if not valid:
+            continue
+
+        categories = _resolve_categories({v['category'] for _, v in valid.values() if 'category' in v}, create=not dry_run)
+        kept = [f for f in KEEP_FIELDS if f in update_fields]
+        with transaction.atomic():
+            # Kept values and ledger deltas come from locked rows, so a checkout
+            # between the read and the upsert is neither overwritten nor lost
+            existing = {
+                row['sku']: row
+                for row in Product.objects.filter(sku__in=list(valid)).select_for_update()
+                .order_by('id').values('sku', 'id', 'stock', *kept)
+            }
+            products = []
+            for sku, (number, values) in valid.items():
+                category = values.pop('category', None)
+                if category is not None and category not in categories:
+                    result.add_error(number, sku, {'category': f'Unknown category id {category}.'})
+                    existing.pop(sku, None)
+                    continue
+                if category is not None:
+                    values['category_id'] = categories[category]
+                current = existing.get(sku)
+                if current:
+                    # A blank cell keeps the product's value instead of overwriting it
+                    values = {**{f: current[f] for f in kept}, **values}
+                    if values.get('cost') is not None and values['price'] < values['cost']:
+                        result.add_error(number, sku, {'non_field_errors': 'price must be greater than or equal to cost'})
+                        existing.pop(sku)
+                        continue
+                products.append(Product(**values))
+
+            result.created += len(products) - len(existing)
+            result.updated += len(existing)
+            if dry_run:
+                continue
+
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=['sku'],
+                update_fields=update_fields,
+            )
+            _record_import_movements(products, existing, 'stock' in update_fields, user)
+
+    if not dry_run and (result.created or result.updated):
+        invalidate_analytics()
+    return result
+
+
+def _record_import_movements(products, existing, stock_updated, user):
+    movements = []
+    new_skus = [p.sku for p in products if p.sku not in existing and p.stock]
+    new_ids = dict(Product.objects.filter(sku__in=new_skus).values_list('sku', 'id')) if new_skus else {}
+    for product in products:
+        if product.sku in new_ids:
+            movements.append(inventory.movement(new_ids[product.sku], 'restock', product.stock, user=user, note='Import'))
+        elif product.sku in existing and stock_updated:
+            current = existing[product.sku]
+            movements.append(inventory.movement(current['id'], 'adjustment', product.stock - current['stock'], user=user, note='Import'))
+    inventory.record_movements(movements)
+
+
+UPDATE_FIELDS = ('price', 'cost', 'stock', 'reorder_level')
+STOCK_KINDS = ('adjustment', 'restock', 'return')
+
+
+def bulk_update_products(updates, user=None):
+    """
+    Apply partial price/stock updates given as dicts with ``id`` or ``sku``.
+
+    Each product is updated only in the fields present in its entry, so a
+    price-only change never overwrites stock that a concurrent sale moved.
+    Stock changes are written to the movement ledger as ``kind`` (adjustment
+    by default, or restock/return). Returns (updated_count, errors).
+    """
+    errors = []
+    parsed = []
+    for index, entry in enumerate(updates, start=1):
+        row_errors = {}
+        if not isinstance(entry, dict):
+            errors.append({'row': index, 'errors': {'non_field_errors': 'Each update must be an object.'}})
+            continue
+        if entry.get('id'):
+            entry = {**entry, 'id': _integer(entry['id'], 'id', row_errors)}
+        elif not entry.get('sku'):
+            row_errors['non_field_errors'] = 'id or sku is required.'
+        changes = {}
+        for field in ('price', 'cost'):
+            if field in entry:
+                changes[field] = _decimal(entry[field], field, row_errors, required=(field == 'price'))
+        for field in ('stock', 'reorder_level'):
+            if field in entry:
+                changes[field] = _integer(entry[field], field, row_errors)
+                if changes[field] is None and field not in row_errors:
+                    row_errors[field] = 'This field may not be blank.'
+        if entry.get('kind', 'adjustment') not in STOCK_KINDS:
+            row_errors['kind'] = f'Must be one of {", ".join(STOCK_KINDS)}.'
+        if not changes and not row_errors:
+            row_errors['non_field_errors'] = f'Nothing to update; expected one of {", ".join(UPDATE_FIELDS)}.'
+        if row_errors:
+            errors.append({'row': index, 'id': entry.get('id'), 'sku': entry.get('sku'), 'errors': row_errors})
+            continue
+        parsed.append((index, entry, changes))
+
+    ids = [e['id'] for _, e, _ in parsed if e.get('id')]
+    skus = [normalize_sku(e['sku']) for _, e, _ in parsed if not e.get('id')]
+
+    updated = 0
+    with transaction.atomic():
+        # Deltas are taken against locked rows, so the ledger matches what the update changes
+        locked = list(Product.objects.filter(Q(id__in=ids) | Q(sku__in=skus)).select_for_update().order_by('id'))
+        by_id = {product.id: product for product in locked}
+        by_sku = {product.sku: product for product in locked}
+
+        groups = {}
+        movements = []
+        now = timezone.now()
+        for index, entry, changes in parsed:
+            product = by_id.get(entry['id']) if entry.get('id') else by_sku.get(normalize_sku(entry['sku']))
+            if product is None:
+                errors.append({'row': index, 'id': entry.get('id'), 'sku': entry.get('sku'), 'errors': {'non_field_errors': 'Product not found.'}})
+                continue
+            previous_stock = product.stock
+            for field, value in changes.items():
+                setattr(product, field, value)
+            if product.cost is not None and product.price < product.cost:
+                errors.append({'row': index, 'id': product.id, 'sku': product.sku, 'errors': {'non_field_errors': 'price must be greater than or equal to cost'}})
+                continue
+            if 'stock' in changes:
+                movements.append(inventory.movement(
+                    product.id, entry.get('kind', 'adjustment'), product.stock - previous_stock, user=user, note='Bulk update'
+                ))
+            # bulk_update() does not apply auto_now
+            product.updated_at = now
+            groups.setdefault(tuple(sorted(changes)), []).append(product)
+
+        for fields, products in groups.items():
+            updated += Product.objects.bulk_update(products, [*fields, 'updated_at'], batch_size=CHUNK_SIZE)
+        inventory.record_movements(movements)
+    if updated:
+        invalidate_analytics()
+    return updated, errors
@@ -0,0 +1,198 @@
+"""
+Cached, precomputed payloads with single-flight and stale-while-revalidate.
+
+Entries are grouped in namespaces (e.g. ``analytics``). Each namespace has a
+generation counter; bumping it (see ``invalidate``) marks every entry of the
+namespace stale without deleting it, so readers keep getting the previous
+payload while one background worker recomputes it.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+
+from asgiref.sync import AsyncToSync, async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _generation_key(namespace):
+    return f'payload-generation:{namespace}'
+
+
+def _initial_generation():
+    # Not 1: generations also go out in ETags (api/conditional.py) and must
+    # not repeat earlier values after the cache is flushed
+    return int(time.time() * 1000)
+
+
+def get_generation(namespace):
+    generation = cache.get(_generation_key(namespace))
+    if generation is None:
+        initial = _initial_generation()
+        cache.add(_generation_key(namespace), initial, None)
+        generation = cache.get(_generation_key(namespace), initial)
+    return generation
+
+
+def invalidate(namespace):
+    """Mark every cached payload of ``namespace`` stale"""
+    try:
+        cache.incr(_generation_key(namespace))
+    except ValueError:
+        cache.set(_generation_key(namespace), _initial_generation(), None)
+
+
+def _store(entry_key, value, generation, ttl):
+    cache.set(entry_key, {
+        'value': value,
+        'generation': generation,
+        'fresh_until': time.time() + ttl,
+    }, settings.PAYLOAD_CACHE_STALE_TTL)
+
+
+def _refresh_in_background(entry_key, lock_key, namespace, compute, ttl):
+    def run():
+        try:
+            generation = get_generation(namespace)
+            _store(entry_key, compute(), generation, ttl)
+        finally:
+            cache.delete(lock_key)
+            connections.close_all()
+
+    # Carry the caller's context over (e.g. replica routing, api/db_router.py)
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,), name=f'refresh {entry_key}', daemon=True).start()
+
+
+def payload_version(namespace, key):
+    """Version of the stored ``cached_payload`` entry (changes whenever it is recomputed), or None"""
+    entry = cache.get(f'payload:{namespace}:{key}')
+    return None if entry is None else f"{entry['generation']}.{entry['fresh_until']}"
+
+
+def cached_payload(namespace, key, compute, ttl=None):
+    """
+    Return ``compute()`` cached under ``namespace``/``key``.
+
+    * fresh hit: returned as-is
+    * stale hit (expired or invalidated): returned as-is while a single
+      background thread recomputes it
+    * miss: exactly one caller computes (``cache.add`` lock), concurrent
+      callers wait for its result instead of hitting the database too
+    """
+    ttl = settings.PAYLOAD_CACHE_TTL if ttl is None else ttl
+    entry_key = f'payload:{namespace}:{key}'
+    lock_key = f'{entry_key}:lock'
+    lock_timeout = settings.PAYLOAD_CACHE_LOCK_TIMEOUT
+    generation = get_generation(namespace)
+
+    entry = cache.get(entry_key)
+    if entry is not None:
+        if entry['generation'] != generation or entry['fresh_until'] <= time.time():
+            if cache.add(lock_key, 1, lock_timeout):
+                _refresh_in_background(entry_key, lock_key, namespace, compute, ttl)
+        return entry['value']
+
+    deadline = time.time() + lock_timeout
+    while not cache.add(lock_key, 1, lock_timeout):
+        # Someone else is computing this payload; wait for it
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(entry_key)
+        if entry is not None:
+            return entry['value']
+        if time.time() >= deadline:
+            return compute()
+
+    try:
+        value = compute()
+        _store(entry_key, value, generation, ttl)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+async def aget_generation(namespace):
+    generation = await cache.aget(_generation_key(namespace))
+    if generation is None:
+        initial = _initial_generation()
+        await cache.aadd(_generation_key(namespace), initial, None)
+        generation = await cache.aget(_generation_key(namespace), initial)
+    return generation
+
+
+async def _astore(entry_key, value, generation, ttl):
+    await cache.aset(entry_key, {
+        'value': value,
+        'generation': generation,
+        'fresh_until': time.time() + ttl,
+    }, settings.PAYLOAD_CACHE_STALE_TTL)
+
+
+async def _arefresh(entry_key, lock_key, namespace, acompute, ttl):
+    try:
+        generation = await aget_generation(namespace)
+        await _astore(entry_key, await acompute(), generation, ttl)
+    finally:
+        await cache.adelete(lock_key)
+
+
+_background_tasks = set()
+
+
+def _refresh_in_task(entry_key, lock_key, namespace, acompute, ttl):
+    if asyncio.get_running_loop() in AsyncToSync.loop_thread_executors:
+        # A loop made by async_to_sync (async views under WSGI) is closed as
+        # soon as the response is returned, cancelling any task left on it;
+        # refresh on a thread with its own loop instead
+        def run():
+            try:
+                async_to_sync(_arefresh)(entry_key, lock_key, namespace, acompute, ttl)
+            finally:
+                connections.close_all()
+
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(run,), name=f'refresh {entry_key}', daemon=True).start()
+        return
+    task = asyncio.ensure_future(_arefresh(entry_key, lock_key, namespace, acompute, ttl))
+    # Keep a reference until the task finishes so it is not garbage collected
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def acached_payload(namespace, key, acompute, ttl=None):
+    """Async version of ``cached_payload``; ``acompute`` is a coroutine function.
+
+    Entries, locks and generations are shared with the sync version.
+    """
+    ttl = settings.PAYLOAD_CACHE_TTL if ttl is None else ttl
+    entry_key = f'payload:{namespace}:{key}'
+    lock_key = f'{entry_key}:lock'
+    lock_timeout = settings.PAYLOAD_CACHE_LOCK_TIMEOUT
+    generation = await aget_generation(namespace)
+
+    entry = await cache.aget(entry_key)
+    if entry is not None:
+        if entry['generation'] != generation or entry['fresh_until'] <= time.time():
+            if await cache.aadd(lock_key, 1, lock_timeout):
+                _refresh_in_task(entry_key, lock_key, namespace, acompute, ttl)
+        return entry['value']
+
+    deadline = time.time() + lock_timeout
+    while not await cache.aadd(lock_key, 1, lock_timeout):
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        entry = await cache.aget(entry_key)
+        if entry is not None:
+            return entry['value']
+        if time.time() >= deadline:
+            return await acompute()
+
+    try:
+        value = await acompute()
+        await _astore(entry_key, value, generation, ttl)
+    finally:
+        await cache.adelete(lock_key)
+    return value
@@ -0,0 +1,126 @@
+"""
+ABC / slow-mover classification of the whole catalogue.
+
+Two queries - units, revenue and cost of goods per product over the period
+plus each product's last sale (one grouped scan of sale items), and the
+product list - then NumPy ranks every product at once:
+
+* ``revenue_class`` / ``margin_class``: A for the products making up the
+  first ABC_A_SHARE of revenue (or margin), B up to ABC_B_SHARE, C the rest
+  (anything that earned nothing is C)
+* ``stock_value`` at cost, ``days_since_last_sale`` and ``slow_mover`` (stock
+  on hand but nothing sold for SLOW_MOVER_DAYS)
+
+Margin is revenue minus units x current cost; products without a cost have
+no margin or stock value.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from .models import Product, SaleItem
+from .utils import day_range
+
+CLASSES = ('A', 'B', 'C')
+
+
+def abc_classes(values, a_share, b_share):
+    """Class per value: A/B while the running share of the total before it is below the cut-offs"""
+    values = np.nan_to_num(values, nan=0.0)
+    order = np.argsort(-values, kind='stable')
+    total = values[values > 0].sum()
+    classes = np.full(len(values), 'C', dtype='<U1')
+    if total <= 0:
+        return classes
+    preceding = (np.cumsum(values[order]) - values[order]) / total
+    ranked = np.where(preceding < a_share, 'A', np.where(preceding < b_share, 'B', 'C'))
+    ranked[values[order] <= 0] = 'C'
+    classes[order] = ranked
+    return classes
+
+
+def _as_float(values):
+    return np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+
+
+def _round(value, digits=2):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def build_report(start_date, end_date):
+    """Classification of every product by sales in [start_date, end_date]"""
+    range_start, _ = day_range(start_date)
+    _, range_end = day_range(end_date)
+    in_period = Q(created_at__gte=range_start, created_at__lt=range_end)
+    sales = {
+        row['product']: row for row in SaleItem.objects.filter(product__isnull=False, created_at__lt=range_end)
+        .values('product')
+        .annotate(
+            units=Sum('quantity', filter=in_period),
+            revenue=Sum('subtotal', filter=in_period),
+            last_sold=Max('created_at'),
+        ).order_by()
+    }
+    products = list(
+        Product.objects.order_by('id').values('id', 'name', 'sku', 'category__name', 'cost', 'stock')
+    )
+    empty = {'units': None, 'revenue': None, 'last_sold': None}
+    rows = [sales.get(product['id'], empty) for product in products]
+
+    units = np.nan_to_num(_as_float(row['units'] for row in rows))
+    revenue = np.nan_to_num(_as_float(row['revenue'] for row in rows))
+    cost = _as_float(product['cost'] for product in products)
+    stock = np.array([product['stock'] for product in products], dtype=np.float64)
+    margin = revenue - units * cost
+    stock_value = np.maximum(stock, 0) * cost
+    last_sold = np.array(
+        [timezone.localdate(row['last_sold']) if row['last_sold'] else 'NaT' for row in rows], dtype='datetime64[D]'
+    )
+    days_since = (np.datetime64(end_date, 'D') - last_sold).astype('timedelta64[D]').astype(np.float64)
+    days_since[np.isnat(last_sold)] = np.nan
+    slow = (stock > 0) & ~(days_since < settings.SLOW_MOVER_DAYS)
+
+    revenue_class = abc_classes(revenue, settings.ABC_A_SHARE, settings.ABC_B_SHARE)
+    margin_class = abc_classes(margin, settings.ABC_A_SHARE, settings.ABC_B_SHARE)
+
+    summary = {
+        name: {
+            'products': int(np.count_nonzero(revenue_class == name)),
+            'revenue': round(float(revenue[revenue_class == name].sum()), 2),
+            'stock_value': round(float(np.nansum(stock_value[revenue_class == name])), 2),
+        }
+        for name in CLASSES
+    }
+    summary['slow_movers'] = int(np.count_nonzero(slow))
+    summary['slow_mover_stock_value'] = round(float(np.nansum(stock_value[slow])), 2)
+
+    order = np.lexsort((np.arange(len(products)), -revenue))
+    return {
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'summary': summary,
+        'products': [{
+            'product_id': products[i]['id'],
+            'name': products[i]['name'],
+            'sku': products[i]['sku'],
+            'category': products[i]['category__name'],
+            'units': int(units[i]),
+            'revenue': round(float(revenue[i]), 2),
+            'margin': _round(margin[i]),
+            'revenue_class': str(revenue_class[i]),
+            'margin_class': str(margin_class[i]),
+            'stock': int(stock[i]),
+            'stock_value': _round(stock_value[i]),
+            'days_since_last_sale': None if np.isnan(days_since[i]) else int(days_since[i]),
+            'slow_mover': bool(slow[i]),
+        } for i in order.tolist()],
+    }
+
+
+def default_period():
+    """Last ABC_PERIOD_DAYS including today"""
+    end_date = timezone.localdate()
+    return end_date - timedelta(days=settings.ABC_PERIOD_DAYS - 1), end_date
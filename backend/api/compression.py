@@ -0,0 +1,101 @@
+"""
+Response compression.
+
+Picks the best encoding the client accepts from zstd (``zstandard``
+package), Brotli (``brotli`` package) and gzip, in that order of preference;
+the first two are used only when installed. Responses under
+COMPRESSION_MIN_SIZE bytes, non-text content types, streaming responses and
+responses that are already encoded are left alone.
+
+Place near the top of MIDDLEWARE so nothing later reads the compressed body.
+"""
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/msgpack', 'application/javascript', 'application/xml', 'image/svg+xml',
+)
+
+
+def _encoders():
+    encoders = {}
+    if zstandard is not None:
+        encoders['zstd'] = lambda data: zstandard.ZstdCompressor(level=3).compress(data)
+    if brotli is not None:
+        encoders['br'] = lambda data: brotli.compress(data, quality=5)
+    encoders['gzip'] = lambda data: gzip.compress(data, compresslevel=6, mtime=0)
+    return encoders
+
+
+ENCODERS = _encoders()
+
+
+def accepted_encodings(header):
+    """Encodings in an Accept-Encoding header with a non-zero q value"""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header)
+    for name in ENCODERS:
+        if name in accepted or '*' in accepted:
+            return name
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressed = ENCODERS[encoding](response.content)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The bytes differ per encoding, so a strong ETag no longer holds
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,37 @@
+"""
+Cheap conditional GET.
+
+ETags come from cache generations (api/cache.py), which api/signals.py bumps
+whenever the underlying rows change, or from the version of a cached payload.
+Checking ``If-None-Match`` therefore costs a cache lookup: no query and no
+hashing of the response body.
+
+* ``conditional(generation_etag(...))`` on a view method answers 304 before
+  the view runs (Django's ``condition``).
+* ``with_etag`` tags a response built from a cached payload with the version
+  read *before* the payload was fetched, so the tag is never newer than the body.
+"""
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .cache import get_generation
+
+
+def conditional(etag_func):
+    """``condition(etag_func=...)`` for APIView methods; apply inside ``require_permission``"""
+    return method_decorator(condition(etag_func=etag_func))
+
+
+def generation_etag(*namespaces):
+    def etag(request, *args, **kwargs):
+        return '-'.join(f'{namespace}.{get_generation(namespace)}' for namespace in namespaces)
+    return etag
+
+
+def with_etag(request, response, etag):
+    """Set ``etag`` on ``response``; 304 instead when the client already has it"""
+    if etag is None:
+        return response
+    response['ETag'] = quote_etag(etag)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
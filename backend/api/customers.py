@@ -0,0 +1,91 @@
+"""
+Returning-customer lookup.
+
+Sales keep the customer's phone in E.164 form (``customer_phone_normalized``,
+set by ``Sale.save`` and backfilled by migration 0020), so a customer is an
+index lookup however many sales there are:
+
+* ``search(query)`` - customers by phone (normalized, exact) or by part of
+  the name (served by the trigram index from migration 0019)
+* ``totals(phone)`` - lifetime visits, spend and first/last purchase in one
+  aggregate over the customer's sales
+* ``history_page(phone, cursor, limit)`` - purchase history, newest first,
+  keyset-paginated on (created_at, id) like the notification feed, with the
+  page's items in one more query
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Max, Min, Q, Sum
+
+from .models import Sale, SaleItem
+from .utils import decode_cursor, encode_cursor, normalize_phone
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+SEARCH_LIMIT = 20
+# Shorter name queries have no trigram to look up
+MIN_NAME_QUERY = 3
+HISTORY_FIELDS = ('id', 'receipt_number', 'total_amount', 'payment_method', 'customer_name', 'created_by', 'created_at')
+
+
+def search(query, limit=SEARCH_LIMIT):
+    """Customers matching a phone number or part of a name, most recent first"""
+    query = query.strip()
+    phone = normalize_phone(query)
+    if phone:
+        sales = Sale.objects.filter(customer_phone_normalized=phone)
+    elif len(query) >= MIN_NAME_QUERY:
+        sales = Sale.objects.filter(customer_name__icontains=query, customer_phone_normalized__isnull=False)
+    else:
+        return []
+    return list(
+        sales.values(phone=F('customer_phone_normalized'))
+        .annotate(name=Max('customer_name'), visits=Count('id'), last_purchase=Max('created_at'))
+        .order_by('-last_purchase')[:limit]
+    )
+
+
+def totals(phone):
+    row = Sale.objects.filter(customer_phone_normalized=phone).aggregate(
+        visits=Count('id'),
+        total_spent=Sum('total_amount'),
+        first_purchase=Min('created_at'),
+        last_purchase=Max('created_at'),
+    )
+    row['total_spent'] = row['total_spent'] or 0
+    row['average_sale'] = round(row['total_spent'] / row['visits'], 2) if row['visits'] else 0
+    return row
+
+
+def history_page(phone, cursor=None, limit=PAGE_SIZE):
+    """One page of the customer's sales with their items; raises ValueError for a bad cursor or limit"""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    queryset = Sale.objects.filter(customer_phone_normalized=phone).order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    rows = list(queryset.only(*HISTORY_FIELDS)[:limit + 1])
+    sales = rows[:limit]
+
+    items_by_sale = defaultdict(list)
+    if sales:
+        # The created_at bounds let PostgreSQL prune the sale item partitions
+        items = SaleItem.objects.filter(
+            sale_id__in=[sale.id for sale in sales],
+            created_at__gte=sales[-1].created_at, created_at__lte=sales[0].created_at,
+        ).order_by('id').values('sale', 'product', 'product__name', 'quantity', 'unit_price', 'subtotal')
+        for item in items:
+            items_by_sale[item.pop('sale')].append(item)
+    return {
+        'results': [{
+            'id': sale.id,
+            'receipt_number': sale.receipt_number,
+            'total_amount': sale.total_amount,
+            'payment_method': sale.payment_method,
+            'customer_name': sale.customer_name,
+            'created_by': sale.created_by_id,
+            'created_at': sale.created_at,
+            'items': items_by_sale[sale.id],
+        } for sale in sales],
+        'next_cursor': encode_cursor(sales[-1]) if len(rows) > limit else None,
+    }
@@ -0,0 +1,102 @@
+"""
+Read-replica routing for reporting traffic.
+
+When DB_REPLICA_HOST is set, settings defines a ``replica`` alias and
+DATABASE_REPLICA_ALIAS names it. Reads go to the replica only inside
+``use_replica()`` (reporting views, admin changelists, analytics builds);
+everything else, and every write, stays on ``default``.
+
+Read-your-writes: a client that wrote something (any non-GET request that
+succeeded) is pinned to the primary for REPLICA_PIN_SECONDS, tracked in the
+cache by token/session; and once a request has written, the rest of that
+request reads from the primary too.
+"""
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+
+_reporting = ContextVar('replica_reporting', default=False)
+_pinned = ContextVar('replica_pinned', default=False)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_alias():
+    return getattr(settings, 'DATABASE_REPLICA_ALIAS', None)
+
+
+@contextmanager
+def use_replica():
+    """Route reads in this block (or decorated function) to the replica"""
+    token = _reporting.set(True)
+    # A write inside the block pins the rest of it; restore on exit
+    pinned = _pinned.set(_pinned.get())
+    try:
+        yield
+    finally:
+        _pinned.reset(pinned)
+        _reporting.reset(token)
+
+
+@contextmanager
+def pin_to_primary():
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias and _reporting.get() and not _pinned.get():
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        if replica_alias() and _reporting.get():
+            # Reads after a write in the same request must see it
+            _pinned.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != replica_alias()
+
+
+def _client_key(request):
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if header:
+        ident = header
+    elif getattr(request, 'session', None) is not None and request.session.session_key:
+        ident = request.session.session_key
+    else:
+        ident = request.META.get('REMOTE_ADDR', '')
+    return 'replica-pin:' + hashlib.sha1(ident.encode()).hexdigest()
+
+
+class ReplicaPinMiddleware:
+    """Keep clients that just wrote on the primary for REPLICA_PIN_SECONDS"""
+
+    def __init__(self, get_response):
+        if not replica_alias():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = _client_key(request)
+        if request.method in SAFE_METHODS and not cache.get(key):
+            return self.get_response(request)
+        with pin_to_primary():
+            response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            cache.set(key, 1, settings.REPLICA_PIN_SECONDS)
+        return response
@@ -0,0 +1,193 @@
+"""
+Demand forecasting and suggested reorder levels.
+
+``forecast()`` reads units sold per product per day for the last
+FORECAST_HISTORY_DAYS in one grouped query, lays them out as a
+products x days NumPy matrix and computes for the whole catalogue at once:
+
+* velocity - exponentially weighted mean daily demand (half-life
+  FORECAST_HALF_LIFE_DAYS), so recent days count more
+* weekday seasonality - each weekday's demand relative to the product's
+  mean, shrunk towards flat when there are few observations
+* safety stock - z(FORECAST_SERVICE_LEVEL) x daily std x sqrt(lead time)
+
+The suggested reorder level is the weekday-adjusted demand over the next
+FORECAST_LEAD_TIME_DAYS plus safety stock; days of cover is stock / velocity.
+Days before a product was created are not counted as zero-demand days, and
+products with less than FORECAST_MIN_HISTORY_DAYS of history get no
+suggestion. Results are written back with a single UPDATE.
+"""
+import math
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Product, SaleItem
+from .signals import invalidate_analytics, invalidate_catalog
+from .utils import day_range
+
+# Pseudo-observations at the flat profile added to each weekday's demand
+SEASONALITY_PRIOR_DAYS = 4
+# Products per NumPy block; bounds memory at catalogue sizes of 100k+
+CHUNK_SIZE = 20000
+
+
+def _load_products():
+    rows = list(Product.objects.order_by('id').values_list('id', 'stock', 'created_at'))
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    stock = np.fromiter((max(row[1], 0) for row in rows), dtype=np.float64, count=len(rows))
+    created = np.array([timezone.localdate(row[2]) for row in rows], dtype='datetime64[D]')
+    return ids, stock, created
+
+
+def _load_sales(start_day, today):
+    """(product ids, day offsets from ``start_day``, units) of daily sales, one query"""
+    rows = list(
+        SaleItem.objects.filter(
+            created_at__gte=day_range(start_day)[0], created_at__lt=day_range(today)[0], product__isnull=False,
+        )
+        .annotate(day=TruncDate('created_at'))
+        .values_list('product_id', 'day')
+        .annotate(units=Sum('quantity'))
+        .order_by()
+    )
+    product_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    days = np.array([row[1] for row in rows], dtype='datetime64[D]')
+    offsets = (days - np.datetime64(start_day, 'D')).astype(np.int64)
+    units = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+    return product_ids, offsets, units
+
+
+def compute(demand, first_day, stock, start_weekday, lead_time_days, half_life_days, z):
+    """
+    Forecast one block of products.
+
+    ``demand`` is products x days units sold, ``first_day`` the column each
+    product's history starts at (creation day), ``start_weekday`` the weekday
+    (Monday=0) of column 0. The forecast starts the day after the last column.
+    Returns (velocity, reorder level, days of cover, days of history).
+    """
+    days = demand.shape[1]
+    columns = np.arange(days)
+    valid = columns[None, :] >= first_day[:, None]
+    observed = valid.sum(axis=1)
+    demand = np.where(valid, demand, 0.0)
+
+    weights = np.where(valid, 0.5 ** ((days - 1 - columns) / half_life_days)[None, :], 0.0)
+    weight_sum = weights.sum(axis=1)
+    velocity = np.divide((demand * weights).sum(axis=1), weight_sum, out=np.zeros(len(demand)), where=weight_sum > 0)
+
+    mean = np.divide(demand.sum(axis=1), observed, out=np.zeros(len(demand)), where=observed > 0)
+    squares = np.where(valid, (demand - mean[:, None]) ** 2, 0.0).sum(axis=1)
+    sigma = np.sqrt(np.divide(squares, observed - 1, out=np.zeros(len(demand)), where=observed > 1))
+
+    weekday_of_column = np.eye(7)[(start_weekday + columns) % 7]
+    weekday_units = demand @ weekday_of_column
+    weekday_days = valid @ weekday_of_column
+    expected = (weekday_days + SEASONALITY_PRIOR_DAYS) * mean[:, None]
+    index = np.divide(
+        weekday_units + SEASONALITY_PRIOR_DAYS * mean[:, None], expected,
+        out=np.ones_like(expected), where=expected > 0,
+    )
+    upcoming = (start_weekday + days + np.arange(lead_time_days)) % 7
+    lead_demand = velocity * index[:, upcoming].sum(axis=1)
+
+    safety = z * sigma * math.sqrt(lead_time_days)
+    reorder = np.ceil(lead_demand + safety).astype(np.int64)
+    cover = np.divide(stock, velocity, out=np.full(len(demand), np.nan), where=velocity > 0)
+    return velocity, reorder, cover, observed
+
+
+def _write(ids, velocity, reorder, cover, forecast_at, apply):
+    """Store the results in one statement (PostgreSQL) or batched bulk_update elsewhere"""
+    ids = ids.tolist()
+    velocity = [round(value, 3) for value in velocity.tolist()]
+    reorder = [None if value < 0 else value for value in reorder.tolist()]
+    cover = [None if math.isnan(value) else round(value, 1) for value in cover.tolist()]
+
+    if connection.vendor == 'postgresql':
+        table = connection.ops.quote_name(Product._meta.db_table)
+        apply_sql = ', reorder_level = COALESCE(v.level, p.reorder_level)' if apply else ''
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} AS p SET daily_demand = v.demand, suggested_reorder_level = v.level, '
+                f'days_of_cover = v.cover, forecast_at = %s{apply_sql} '
+                'FROM unnest(%s::bigint[], %s::double precision[], %s::integer[], %s::double precision[]) '
+                'AS v(id, demand, level, cover) WHERE p.id = v.id',
+                [forecast_at, ids, velocity, reorder, cover],
+            )
+        return
+
+    products = [
+        Product(id=pk, daily_demand=demand, suggested_reorder_level=level, days_of_cover=days, forecast_at=forecast_at)
+        for pk, demand, level, days in zip(ids, velocity, reorder, cover)
+    ]
+    Product.objects.bulk_update(products, ['daily_demand', 'suggested_reorder_level', 'days_of_cover', 'forecast_at'], batch_size=1000)
+    if apply:
+        suggested = [product for product in products if product.suggested_reorder_level is not None]
+        for product in suggested:
+            product.reorder_level = product.suggested_reorder_level
+        Product.objects.bulk_update(suggested, ['reorder_level'], batch_size=1000)
+
+
+def forecast(history_days=None, lead_time_days=None, service_level=None, apply=False, today=None):
+    """
+    Forecast every product and store daily demand, suggested reorder level and days of cover.
+
+    With ``apply`` the suggestions also replace ``reorder_level`` (products
+    without enough history keep theirs). Returns a summary dict.
+    """
+    history_days = history_days or settings.FORECAST_HISTORY_DAYS
+    lead_time_days = lead_time_days or settings.FORECAST_LEAD_TIME_DAYS
+    service_level = service_level or settings.FORECAST_SERVICE_LEVEL
+    if not 0 < service_level < 1:
+        raise ValueError('service level must be between 0 and 1')
+    z = NormalDist().inv_cdf(service_level)
+    today = today or timezone.localdate()
+    start_day = today - timedelta(days=history_days)
+
+    ids, stock, created = _load_products()
+    if not len(ids):
+        return {'products': 0, 'with_sales': 0, 'suggested': 0, 'applied': apply}
+    sale_products, offsets, units = _load_sales(start_day, today)
+    rows = np.minimum(np.searchsorted(ids, sale_products), len(ids) - 1)
+    # Sales of products deleted since are dropped
+    known = ids[rows] == sale_products
+    rows, offsets, units = rows[known], offsets[known], units[known]
+    first_day = np.clip((created - np.datetime64(start_day, 'D')).astype(np.int64), 0, history_days)
+
+    velocity = np.zeros(len(ids))
+    reorder = np.full(len(ids), -1, dtype=np.int64)
+    cover = np.full(len(ids), np.nan)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, len(ids))
+        demand = np.zeros((end - start, history_days))
+        in_chunk = (rows >= start) & (rows < end)
+        demand[rows[in_chunk] - start, offsets[in_chunk]] = units[in_chunk]
+        block = compute(
+            demand, first_day[start:end], stock[start:end], start_day.weekday(),
+            lead_time_days, settings.FORECAST_HALF_LIFE_DAYS, z,
+        )
+        velocity[start:end], reorder[start:end], cover[start:end], observed = block
+        # Not enough history for a suggestion
+        reorder[start:end][observed < settings.FORECAST_MIN_HISTORY_DAYS] = -1
+
+    with transaction.atomic():
+        _write(ids, velocity, reorder, cover, timezone.now(), apply)
+        if apply:
+            # The dashboard's low-stock list compares against reorder_level
+            invalidate_analytics()
+        else:
+            invalidate_catalog()
+    return {
+        'products': len(ids),
+        'with_sales': int(np.count_nonzero(velocity)),
+        'suggested': int(np.count_nonzero(reorder >= 0)),
+        'applied': apply,
+    }
@@ -0,0 +1,108 @@
+"""
+Liveness and readiness probes.
+
+Plain Django views (no DRF authentication, permissions or serializers) so a
+probe costs next to nothing:
+
+* ``/api/health/live``  - the process is up; never touches the database
+* ``/api/health/ready`` - ``SELECT 1`` on the DB connection plus a
+  few diagnostics, cached in-process for HEALTH_READY_CACHE_SECONDS so that
+  every till polling it does not each cost a round trip
+
+The probes are public, so failures are logged and reported only as
+``ok: false`` - no exception text (hosts, users) or migration names.
+"""
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+
+from .throttling import throttle_scope
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_ready = {'expires': 0.0, 'status': 503, 'payload': None}
+_migrations = {'expires': 0.0, 'pending': None}
+
+MIGRATIONS_CHECK_SECONDS = 60
+
+
+def _check_database():
+    connection = connections[DEFAULT_DB_ALIAS]
+    start = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception:
+        logger.exception('Readiness check: database unavailable')
+        return {'ok': False}
+    return {'ok': True, 'latency_ms': round((time.perf_counter() - start) * 1000, 2)}
+
+
+def _pending_migrations(now):
+    # Migrations only change on deploy, so this is checked far less often
+    if now >= _migrations['expires']:
+        connection = connections[DEFAULT_DB_ALIAS]
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        _migrations['pending'] = len(plan)
+        _migrations['expires'] = now + MIGRATIONS_CHECK_SECONDS
+    return _migrations['pending']
+
+
+def _check_cache():
+    token = uuid.uuid4().hex
+    try:
+        cache.set('health:ping', token, 10)
+        ok = cache.get('health:ping') == token
+    except Exception:
+        logger.exception('Readiness check: cache unavailable')
+        return {'ok': False}
+    return {'ok': ok, 'backend': settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1]}
+
+
+def _run_checks(now):
+    database = _check_database()
+    pending = None
+    if database['ok']:
+        try:
+            pending = _pending_migrations(now)
+        except Exception:
+            logger.exception('Readiness check: could not load the migration plan')
+        if pending:
+            logger.warning('Readiness check: %d migrations pending', pending)
+    ready = database['ok'] and pending == 0
+    return (200 if ready else 503), {
+        'status': 'ready' if ready else 'unavailable',
+        'database': database,
+        'migrations': {'ok': pending == 0},
+        'cache': _check_cache(),
+    }
+
+
+# Never shed under load (see THROTTLE_BUCKETS)
+@throttle_scope('health')
+@require_http_methods(['GET', 'HEAD'])
+def live(request):
+    return JsonResponse({'status': 'ok'})
+
+
+@throttle_scope('health')
+@require_http_methods(['GET', 'HEAD'])
+def ready(request):
+    now = time.monotonic()
+    if now >= _ready['expires']:
+        with _lock:
+            if now >= _ready['expires']:
+                _ready['status'], _ready['payload'] = _run_checks(now)
+                _ready['expires'] = now + settings.HEALTH_READY_CACHE_SECONDS
+    return JsonResponse(_ready['payload'], status=_ready['status'])
@@ -0,0 +1,155 @@
+"""
+Stock movement ledger.
+
+Stock changes are recorded as append-only StockMovements (sale, restock,
+adjustment, return) carrying the signed quantity actually applied. Checkout,
+the product API and admin, bulk import/update and stock takes write them;
+saving ``Product.stock`` directly through the ORM (shell, data migrations)
+does not, and has to add its own movement to keep the ledger complete.
+
+``take_snapshots`` periodically copies the current stock of every product
+into StockSnapshot, so "stock as of X" is the latest snapshot at or before X
+plus the movements between that snapshot and X - one indexed lookup and a
+short tail scan per product instead of replaying all history.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Product, StockMovement, StockSnapshot
+
+BATCH_SIZE = 2000
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def movement(product_id, kind, quantity, sale=None, user=None, note='', created_at=None):
+    """Unsaved StockMovement; pass lists of these to ``record_movements``"""
+    return StockMovement(
+        product_id=product_id,
+        kind=kind,
+        quantity=quantity,
+        sale=sale,
+        created_by=user if user is not None and user.is_authenticated else None,
+        note=note,
+        created_at=created_at or timezone.now(),
+    )
+
+
+def record_movements(movements):
+    """Append movements in one INSERT (zero-quantity ones are dropped)"""
+    movements = [m for m in movements if m.quantity]
+    if movements:
+        StockMovement.objects.bulk_create(movements, batch_size=BATCH_SIZE)
+    return movements
+
+
+def apply_sale(sale, items, user=None):
+    """
+    Decrement stock for the SaleItems of ``sale`` and write their ledger rows.
+
+    Products are locked and read in one query, updated in one bulk UPDATE and
+    the movements inserted in one INSERT, however many lines the sale has.
+    Stock never goes below zero; the ledger records the quantity actually
+    taken so replaying it reproduces ``Product.stock``.
+    """
+    quantities = {}
+    for item in items:
+        if item.product_id:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    if not quantities:
+        return []
+
+    products = Product.objects.select_for_update().only('id', 'stock').in_bulk(list(quantities))
+    now = timezone.now()
+    changed, movements = [], []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        new_stock = max(product.stock - quantity, 0)
+        if new_stock == product.stock:
+            continue
+        movements.append(movement(product_id, 'sale', new_stock - product.stock, sale=sale, user=user, created_at=sale.created_at))
+        product.stock = new_stock
+        product.updated_at = now
+        changed.append(product)
+
+    Product.objects.bulk_update(changed, ['stock', 'updated_at'])
+    return record_movements(movements)
+
+
+def take_snapshots(taken_at=None):
+    """Snapshot the current stock of every product; returns the number written"""
+    taken_at = taken_at or timezone.now()
+    written = 0
+    with transaction.atomic():
+        rows = Product.objects.values_list('id', 'stock').order_by('id').iterator(chunk_size=BATCH_SIZE)
+        batch = []
+        for product_id, stock in rows:
+            batch.append(StockSnapshot(product_id=product_id, stock=stock, taken_at=taken_at))
+            if len(batch) >= BATCH_SIZE:
+                StockSnapshot.objects.bulk_create(batch, ignore_conflicts=True)
+                written += len(batch)
+                batch = []
+        if batch:
+            StockSnapshot.objects.bulk_create(batch, ignore_conflicts=True)
+            written += len(batch)
+    return written
+
+
+def stock_as_of(when, products=None):
+    """
+    Product queryset annotated with ``stock_as_of`` at ``when``.
+
+    Computed in a single query: the latest snapshot at or before ``when`` per
+    product (index on product, taken_at) plus the sum of that product's
+    movements after the snapshot up to ``when`` (index on product, created_at).
+    Products without a snapshot are replayed from zero.
+    """
+    products = Product.objects.all() if products is None else products
+    snapshots = StockSnapshot.objects.filter(product=OuterRef('pk'), taken_at__lte=when).order_by('-taken_at')
+    products = products.annotate(
+        snapshot_stock=Subquery(snapshots.values('stock')[:1]),
+        snapshot_at=Subquery(snapshots.values('taken_at')[:1]),
+    )
+    tail = StockMovement.objects.filter(
+        product=OuterRef('pk'),
+        created_at__gt=Coalesce(OuterRef('snapshot_at'), Value(EPOCH)),
+        created_at__lte=when,
+    ).order_by().values('product').annotate(total=Sum('quantity')).values('total')
+    return products.annotate(
+        stock_as_of=Coalesce('snapshot_stock', 0) + Coalesce(Subquery(tail, output_field=IntegerField()), 0),
+    )
+
+
+def movement_report(start, end, product_id=None):
+    """Per product and kind: movement count and net quantity in [start, end)"""
+    movements = StockMovement.objects.filter(created_at__gte=start, created_at__lt=end)
+    if product_id is not None:
+        movements = movements.filter(product_id=product_id)
+    rows = movements.order_by().values('product', 'product__name', 'product__sku').annotate(
+        movements=Count('id'),
+        sold=Coalesce(Sum('quantity', filter=Q(kind='sale')), 0),
+        restocked=Coalesce(Sum('quantity', filter=Q(kind='restock')), 0),
+        adjusted=Coalesce(Sum('quantity', filter=Q(kind='adjustment')), 0),
+        returned=Coalesce(Sum('quantity', filter=Q(kind='return')), 0),
+        net=Sum('quantity'),
+    ).order_by('product__name')
+    return [
+        {
+            'product_id': row['product'],
+            'name': row['product__name'],
+            'sku': row['product__sku'],
+            'movements': row['movements'],
+            # Sales are stored as negative deltas
+            'sold': -row['sold'],
+            'restocked': row['restocked'],
+            'adjusted': row['adjusted'],
+            'returned': row['returned'],
+            'net': row['net'],
+        }
+        for row in rows
+    ]
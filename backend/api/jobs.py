@@ -0,0 +1,49 @@
+"""Periodic jobs run by the in-process scheduler (api/scheduler.py)"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .associations import build as build_associations
+from .forecasting import forecast
+from .inventory import take_snapshots
+from .models import Product, StockSnapshot, StoreSettings, ZReport
+from .reports import get_or_generate_zreport
+from .scheduler import every
+
+
+@every(settings.ZREPORT_CHECK_INTERVAL)
+def daily_zreport():
+    """Close yesterday with a Z-report when daily sales reports are enabled"""
+    if not StoreSettings.get_settings().daily_sales_report:
+        return
+    try:
+        get_or_generate_zreport(timezone.localdate() - timedelta(days=1))
+    except ZReport.DoesNotExist:
+        # Nothing sold yet
+        pass
+
+
+@every(settings.STOCK_SNAPSHOT_INTERVAL)
+def stock_snapshot():
+    """Snapshot stock levels unless a recent snapshot exists (e.g. after a restart)"""
+    latest = StockSnapshot.objects.order_by('-taken_at').values_list('taken_at', flat=True).first()
+    if latest and timezone.now() - latest < timedelta(seconds=settings.STOCK_SNAPSHOT_INTERVAL):
+        return
+    take_snapshots()
+
+
+@every(settings.FORECAST_INTERVAL)
+def demand_forecast():
+    """Refresh suggested reorder levels unless a recent forecast exists"""
+    latest = Product.objects.aggregate(latest=Max('forecast_at'))['latest']
+    if latest and timezone.now() - latest < timedelta(seconds=settings.FORECAST_INTERVAL):
+        return
+    forecast(apply=settings.FORECAST_APPLY)
+
+
+@every(settings.ASSOCIATION_INTERVAL)
+def product_associations():
+    """Rebuild the frequently-bought-together index"""
+    build_associations()
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.associations import build
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "frequently bought together" suggestions from recent sales'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, default=settings.ASSOCIATION_HISTORY_DAYS,
+                            help='Days of sales to read')
+        parser.add_argument('--top-k', type=int, default=settings.ASSOCIATION_TOP_K,
+                            help='Neighbours kept per product')
+        parser.add_argument('--min-support', type=int, default=settings.ASSOCIATION_MIN_SUPPORT,
+                            help='Baskets two products must share to be associated')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        summary = build(options['history_days'], options['top_k'], options['min_support'])
+        self.stdout.write(
+            f"Stored {summary['associations']} associations for {summary['products']} products "
+            f"from {summary['baskets']} baskets ({summary['engine']}) in {time.perf_counter() - started:.2f}s"
+        )
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.forecasting import forecast
+
+
+class Command(BaseCommand):
+    help = 'Forecast demand for every product and store suggested reorder levels and days of cover'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, default=settings.FORECAST_HISTORY_DAYS,
+                            help='Days of sales history to use')
+        parser.add_argument('--lead-time', type=int, default=settings.FORECAST_LEAD_TIME_DAYS,
+                            help='Supplier lead time in days')
+        parser.add_argument('--service-level', type=float, default=settings.FORECAST_SERVICE_LEVEL,
+                            help='Probability of not running out during the lead time (0-1)')
+        parser.add_argument('--apply', action='store_true',
+                            help='Also replace reorder_level with the suggestion where there is enough history')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            summary = forecast(options['history_days'], options['lead_time'], options['service_level'], apply=options['apply'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"Forecast {summary['products']} products ({summary['with_sales']} with sales, "
+            f"{summary['suggested']} suggestions{', applied' if summary['applied'] else ''}) "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bulk_import import CHUNK_SIZE, import_products, iter_csv, iter_json
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or JSON (array / NDJSON) supplier catalogue into products, upserting by SKU'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Input format (default: from file extension)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without writing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('json' if path.lower().endswith(('.json', '.ndjson', '.jsonl')) else 'csv')
+        start = time.perf_counter()
+        try:
+            with open(path, 'rb') as fh:
+                rows = iter_json(fh) if fmt == 'json' else iter_csv(fh)
+                result = import_products(rows, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise CommandError(f'Could not parse {path}: {exc}')
+        elapsed = time.perf_counter() - start
+
+        for error in result.errors:
+            self.stderr.write(f"row {error['row']} ({error['sku'] or '-'}): {error['errors']}")
+        rate = result.processed / elapsed if elapsed else 0
+        prefix = 'Dry run: ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}{result.processed} rows in {elapsed:.2f}s ({rate:,.0f} rows/s): '
+            f'{result.created} created, {result.updated} updated, {result.failed} failed'
+        ))
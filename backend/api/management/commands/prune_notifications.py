@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.retention import Archive, compact_low_stock, purge_read
+
+
+class Command(BaseCommand):
+    help = 'Collapse repeated low-stock alerts and delete old read notifications in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl-days', type=int, default=settings.NOTIFICATION_READ_TTL_DAYS,
+                            help='Delete read notifications older than this many days')
+        parser.add_argument('--batch-size', type=int, default=settings.NOTIFICATION_DELETE_BATCH,
+                            help='Rows deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between batches')
+        parser.add_argument('--archive-dir', help='Append deleted rows to a gzipped JSON-lines file here')
+        parser.add_argument('--no-compact', action='store_true', help='Skip collapsing low-stock alerts')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        archive = Archive(options['archive_dir']) if options['archive_dir'] and not options['dry_run'] else None
+        batching = {'batch_size': options['batch_size'], 'archive': archive, 'pause': options['pause'],
+                    'dry_run': options['dry_run']}
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+
+        if not options['no_compact']:
+            removed = compact_low_stock(**batching)
+            self.stdout.write(f'{verb} {removed} duplicate low-stock alerts')
+        removed = purge_read(options['ttl_days'], **batching)
+        self.stdout.write(f"{verb} {removed} read notifications older than {options['ttl_days']} days")
+        if archive is not None and archive.rows:
+            self.stdout.write(f'Archived {archive.rows} rows to {archive.path}')
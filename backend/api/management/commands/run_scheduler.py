@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api import scheduler
+
+
+class Command(BaseCommand):
+    help = 'Run the periodic jobs (Z-reports, stock snapshots, forecast) in the foreground; run one of these per deployment'
+
+    def handle(self, *args, **options):
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import partitions
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly sales partitions and detach or archive old ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=3,
+                            help='Number of future months to create partitions for (default: 3)')
+        parser.add_argument('--retain-months', type=int, default=None,
+                            help='Keep this many months attached (including the current one); older partitions, and '
+                                 'partitions left detached by --detach-only, are archived')
+        parser.add_argument('--detach-only', action='store_true',
+                            help='Detach old partitions but keep them as standalone tables instead of archiving')
+        parser.add_argument('--archive-dir', default=None,
+                            help='Directory for compressed archives (default: settings.SALES_ARCHIVE_DIR)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be done')
+
+    def handle(self, *args, **options):
+        if not partitions.is_partitioned():
+            raise CommandError('api_sale is not a partitioned table (PostgreSQL with migration 0008 required)')
+
+        this_month = partitions.month_start(timezone.now())
+        last_month = partitions.add_months(this_month, options['ahead'])
+
+        if options['dry_run']:
+            for month in partitions.month_range(this_month, last_month):
+                self.stdout.write(f'Would ensure partitions for {month:%Y-%m}')
+        else:
+            created = partitions.ensure_partitions(this_month, last_month)
+            for name in created:
+                self.stdout.write(f'Created partition {name}')
+            if not created:
+                self.stdout.write('All upcoming partitions already exist')
+
+        retain = options['retain_months']
+        if retain is None:
+            return
+        if retain < 1:
+            raise CommandError('--retain-months must be at least 1')
+
+        cutoff = partitions.add_months(this_month, -(retain - 1))
+        archive_dir = options['archive_dir'] or settings.SALES_ARCHIVE_DIR
+        for table, month, name in partitions.partitions_before(cutoff, include_detached=not options['detach_only']):
+            if options['dry_run']:
+                action = 'detach' if options['detach_only'] else 'archive'
+                self.stdout.write(f'Would {action} {name}')
+            elif options['detach_only']:
+                partitions.detach_partition(table, name)
+                self.stdout.write(f'Detached {name}')
+            else:
+                path = partitions.archive_partition(table, name, archive_dir)
+                self.stdout.write(self.style.SUCCESS(f'Archived {name} to {path}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.inventory import take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Snapshot the current stock of every product (speeds up stock-as-of lookups)'
+
+    def handle(self, *args, **options):
+        written = take_snapshots()
+        self.stdout.write(f'Snapshotted stock for {written} products')
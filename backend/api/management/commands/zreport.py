@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import ZReport
+from api.reports import get_or_generate_zreport
+
+
+class Command(BaseCommand):
+    help = 'Generate end-of-day Z-reports for closed days (existing reports are never recomputed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Business date to close (YYYY-MM-DD, default: yesterday)')
+        parser.add_argument('--backfill', type=int, default=0,
+                            help='Also generate missing reports for this many days before --date')
+
+    def handle(self, *args, **options):
+        try:
+            last = date.fromisoformat(options['date']) if options['date'] else timezone.localdate() - timedelta(days=1)
+        except ValueError:
+            raise CommandError('--date must be in YYYY-MM-DD format')
+
+        for offset in range(options['backfill'], -1, -1):
+            business_date = last - timedelta(days=offset)
+            existed = ZReport.objects.filter(business_date=business_date).exists()
+            try:
+                report = get_or_generate_zreport(business_date)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            except ZReport.DoesNotExist as exc:
+                self.stdout.write(f'{business_date} skipped: {exc}')
+                continue
+            totals = report.data['totals']
+            status = 'exists' if existed else 'generated'
+            self.stdout.write(
+                f"{business_date} {status}: {totals['orders']} orders, revenue {totals['revenue']:.2f}"
+            )
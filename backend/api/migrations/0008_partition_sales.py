@@ -0,0 +1,144 @@
+# Converts api_sale and api_saleitem into tables range-partitioned by month on
+# created_at (PostgreSQL only). Future partitions and archiving are handled by
+# the ``sale_partitions`` management command.
+
+from datetime import date, datetime, timezone as dt_timezone
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+MONTHS_AHEAD = 3
+
+
+def _next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _bound(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc).isoformat()
+
+
+def _create_partitions(cursor, table, first, last):
+    cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+    month = date(first.year, first.month, 1)
+    while month <= last:
+        upper = _next_month(month)
+        cursor.execute(
+            f'CREATE TABLE "{table}_p{month.year:04d}_{month.month:02d}" PARTITION OF "{table}" '
+            'FOR VALUES FROM (%s) TO (%s)',
+            [_bound(month), _bound(upper)],
+        )
+        month = upper
+
+
+def partition_sales(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT MIN(created_at) FROM api_sale')
+        oldest = cursor.fetchone()[0]
+        today = datetime.now(dt_timezone.utc).date()
+        first = (oldest.astimezone(dt_timezone.utc).date() if oldest else today).replace(day=1)
+        last = today.replace(day=1)
+        for _ in range(MONTHS_AHEAD):
+            last = _next_month(last)
+
+        for table in ('api_sale', 'api_saleitem'):
+            cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{table}_unpartitioned"')
+            cursor.execute(
+                f'CREATE TABLE "{table}" (LIKE "{table}_unpartitioned" INCLUDING DEFAULTS) '
+                'PARTITION BY RANGE (created_at)'
+            )
+            _create_partitions(cursor, table, first, last)
+            cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{table}_unpartitioned"')
+
+        cursor.execute('DROP TABLE "api_saleitem_unpartitioned"')
+        cursor.execute('DROP TABLE "api_sale_unpartitioned"')
+
+        # Global uniqueness on receipt_number cannot be enforced on a partitioned
+        # table; migration 0021 enforces it through the api_sale_receipt table.
+        cursor.execute('ALTER TABLE "api_sale" ADD PRIMARY KEY ("id", "created_at")')
+        cursor.execute('ALTER TABLE "api_sale" ADD CONSTRAINT "api_sale_receipt_number_created_at_uniq" UNIQUE ("receipt_number", "created_at")')
+        cursor.execute('CREATE INDEX "api_sale_receipt_number_idx" ON "api_sale" ("receipt_number")')
+        cursor.execute('CREATE INDEX "api_sale_created_by_id_idx" ON "api_sale" ("created_by_id")')
+        cursor.execute(
+            'ALTER TABLE "api_sale" ADD CONSTRAINT "api_sale_created_by_id_fk_auth_user_id" '
+            'FOREIGN KEY ("created_by_id") REFERENCES "auth_user" ("id") DEFERRABLE INITIALLY DEFERRED'
+        )
+
+        cursor.execute('ALTER TABLE "api_saleitem" ADD PRIMARY KEY ("id", "created_at")')
+        cursor.execute('CREATE INDEX "api_saleitem_sale_id_idx" ON "api_saleitem" ("sale_id")')
+        cursor.execute('CREATE INDEX "api_saleitem_product_id_idx" ON "api_saleitem" ("product_id")')
+        cursor.execute(
+            'ALTER TABLE "api_saleitem" ADD CONSTRAINT "api_saleitem_product_id_fk_api_product_id" '
+            'FOREIGN KEY ("product_id") REFERENCES "api_product" ("id") DEFERRABLE INITIALLY DEFERRED'
+        )
+
+        for table in ('api_sale', 'api_saleitem'):
+            cursor.execute(f'CREATE SEQUENCE "{table}_id_seq" OWNED BY "{table}"."id"')
+            cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN "id" SET DEFAULT nextval(\'{table}_id_seq\')')
+            cursor.execute(f'SELECT setval(\'{table}_id_seq\', COALESCE(MAX("id"), 0) + 1, false) FROM "{table}"')
+
+
+def unpartition_sales(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for table in ('api_sale', 'api_saleitem'):
+            cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{table}_partitioned"')
+            cursor.execute(f'CREATE TABLE "{table}" (LIKE "{table}_partitioned")')
+            cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{table}_partitioned"')
+        cursor.execute('DROP TABLE "api_saleitem_partitioned"')
+        cursor.execute('DROP TABLE "api_sale_partitioned"')
+
+        for table in ('api_sale', 'api_saleitem'):
+            cursor.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY ("id")')
+            cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN "id" ADD GENERATED BY DEFAULT AS IDENTITY')
+            cursor.execute(
+                f'SELECT setval(pg_get_serial_sequence(\'"{table}"\', \'id\'), COALESCE(MAX("id"), 0) + 1, false) FROM "{table}"'
+            )
+
+        cursor.execute('ALTER TABLE "api_sale" ADD CONSTRAINT "api_sale_receipt_number_key" UNIQUE ("receipt_number")')
+        cursor.execute('CREATE INDEX "api_sale_created_by_id_idx" ON "api_sale" ("created_by_id")')
+        cursor.execute(
+            'ALTER TABLE "api_sale" ADD CONSTRAINT "api_sale_created_by_id_fk_auth_user_id" '
+            'FOREIGN KEY ("created_by_id") REFERENCES "auth_user" ("id") DEFERRABLE INITIALLY DEFERRED'
+        )
+        cursor.execute('CREATE INDEX "api_saleitem_sale_id_idx" ON "api_saleitem" ("sale_id")')
+        cursor.execute('CREATE INDEX "api_saleitem_product_id_idx" ON "api_saleitem" ("product_id")')
+        cursor.execute(
+            'ALTER TABLE "api_saleitem" ADD CONSTRAINT "api_saleitem_product_id_fk_api_product_id" '
+            'FOREIGN KEY ("product_id") REFERENCES "api_product" ("id") DEFERRABLE INITIALLY DEFERRED'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_auto_20251111_0114'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saleitem',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE api_saleitem
+            SET created_at = (SELECT s.created_at FROM api_sale s WHERE s.id = api_saleitem.sale_id)
+            WHERE sale_id IS NOT NULL;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='saleitem',
+            name='sale',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='api.sale'),
+        ),
+        migrations.RunPython(partition_sales, unpartition_sales),
+    ]
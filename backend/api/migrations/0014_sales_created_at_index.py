@@ -0,0 +1,33 @@
+# Index created_at on the (partitioned) sales tables so the admin's newest-first
+# changelists and date hierarchy read an index instead of scanning every
+# partition. Indexes on a partitioned table cascade to existing and future
+# partitions. PostgreSQL only; other backends keep their default indexes.
+
+from django.db import migrations
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('CREATE INDEX IF NOT EXISTS "api_sale_created_at_idx" ON "api_sale" ("created_at")')
+        cursor.execute('CREATE INDEX IF NOT EXISTS "api_saleitem_created_at_idx" ON "api_saleitem" ("created_at")')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX IF EXISTS "api_saleitem_created_at_idx"')
+        cursor.execute('DROP INDEX IF EXISTS "api_sale_created_at_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_notification_occurrences'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
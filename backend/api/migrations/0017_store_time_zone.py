@@ -0,0 +1,40 @@
+# Store time zone for local-time reports, and a covering sales index so the
+# hour x weekday heatmap (and other created_at range totals) can be answered
+# from the index alone: (created_at) INCLUDE (total_amount) replaces the
+# plain created_at index from 0014. PostgreSQL only for the index.
+
+from django.db import migrations, models
+
+
+def create_covering_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS "api_sale_created_at_total_idx" ON "api_sale" ("created_at") INCLUDE ("total_amount")'
+        )
+        cursor.execute('DROP INDEX IF EXISTS "api_sale_created_at_idx"')
+
+
+def drop_covering_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('CREATE INDEX IF NOT EXISTS "api_sale_created_at_idx" ON "api_sale" ("created_at")')
+        cursor.execute('DROP INDEX IF EXISTS "api_sale_created_at_total_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_product_association'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storesettings',
+            name='time_zone',
+            field=models.CharField(default='Africa/Accra', max_length=64),
+        ),
+        migrations.RunPython(create_covering_index, drop_covering_index),
+    ]
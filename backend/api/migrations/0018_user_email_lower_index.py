@@ -0,0 +1,31 @@
+# Case-insensitive email sign-in (api/backends.py) filters on lower(email);
+# index that expression so login is an index lookup rather than a scan of
+# auth_user. PostgreSQL only; other backends fall back to a scan.
+
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('CREATE INDEX IF NOT EXISTS "api_user_email_lower_idx" ON "auth_user" (lower("email"))')
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX IF EXISTS "api_user_email_lower_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_store_time_zone'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,41 @@
+# Indexed customer lookup: the E.164 phone column (B-tree, declared on the
+# model) and a trigram index for name search. Django's icontains compiles to
+# UPPER("customer_name"::text) LIKE UPPER(...) on PostgreSQL, so the trigram
+# index is on that expression. Both indexes are created on the partitioned
+# sales table and cascade to its partitions. PostgreSQL only for pg_trgm.
+
+from django.db import migrations, models
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS "api_sale_customer_name_trgm_idx" ON "api_sale" '
+            'USING gin ((UPPER("customer_name"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX IF EXISTS "api_sale_customer_name_trgm_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_user_email_lower_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='customer_phone_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=16, null=True),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,60 @@
+# Fill customer_phone_normalized for existing sales. Runs outside a single
+# transaction in batches of sales ids so large tables are not locked for the
+# whole backfill; re-running it only touches rows still missing a value.
+#
+# normalize_phone is a frozen copy of api.utils.normalize_phone as of this
+# migration, so later changes to that helper do not change what it writes.
+
+import re
+
+from django.conf import settings
+from django.db import migrations
+
+BATCH_SIZE = 5000
+
+
+def normalize_phone(value):
+    if not value:
+        return None
+    value = value.strip()
+    digits = re.sub(r'\D', '', value)
+    country = getattr(settings, 'PHONE_COUNTRY_CODE', '233')
+    national_digits = getattr(settings, 'PHONE_NATIONAL_DIGITS', 9)
+    if value.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith(country) and len(digits) == len(country) + national_digits:
+        pass
+    elif digits.startswith('0'):
+        digits = country + digits[1:]
+    elif len(digits) == national_digits:
+        digits = country + digits
+    if not 8 <= len(digits) <= 15 or digits.startswith('0'):
+        return None
+    return '+' + digits
+
+
+def backfill(apps, schema_editor):
+    Sale = apps.get_model('api', 'Sale')
+    pending = Sale.objects.filter(customer_phone__isnull=False, customer_phone_normalized__isnull=True).exclude(customer_phone='')
+    last_id = 0
+    while True:
+        rows = list(pending.filter(id__gt=last_id).order_by('id').values_list('id', 'customer_phone')[:BATCH_SIZE])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        sales = [Sale(id=pk, customer_phone_normalized=normalize_phone(phone)) for pk, phone in rows]
+        Sale.objects.bulk_update([sale for sale in sales if sale.customer_phone_normalized], ['customer_phone_normalized'])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('api', '0019_sale_customer_phone_normalized'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
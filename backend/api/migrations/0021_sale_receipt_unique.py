@@ -0,0 +1,65 @@
+# Enforces unique receipt numbers across all sales partitions (PostgreSQL only).
+# A partitioned table can only have unique constraints that include the
+# partition key, so 0008 left UNIQUE (receipt_number, created_at). Every
+# receipt number is now also inserted into api_sale_receipt, keyed on the
+# number alone, by a trigger in the same transaction as the sale; a duplicate
+# fails the checkout. Archiving a partition drops its sales without firing
+# triggers, so archived receipt numbers stay reserved.
+
+from django.db import migrations
+
+
+def create_receipt_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('CREATE TABLE "api_sale_receipt" ("receipt_number" varchar(100) PRIMARY KEY)')
+        # Fails if duplicates slipped in since 0008; they have to be renumbered first
+        cursor.execute('INSERT INTO "api_sale_receipt" SELECT "receipt_number" FROM "api_sale"')
+        cursor.execute("""
+            CREATE FUNCTION "api_sale_receipt_sync"() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO "api_sale_receipt" VALUES (NEW."receipt_number");
+                ELSIF TG_OP = 'UPDATE' THEN
+                    UPDATE "api_sale_receipt" SET "receipt_number" = NEW."receipt_number"
+                    WHERE "receipt_number" = OLD."receipt_number";
+                ELSE
+                    DELETE FROM "api_sale_receipt" WHERE "receipt_number" = OLD."receipt_number";
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        cursor.execute(
+            'CREATE TRIGGER "api_sale_receipt_sync" AFTER INSERT OR DELETE ON "api_sale" '
+            'FOR EACH ROW EXECUTE FUNCTION "api_sale_receipt_sync"()'
+        )
+        cursor.execute(
+            'CREATE TRIGGER "api_sale_receipt_update" AFTER UPDATE OF "receipt_number" ON "api_sale" '
+            'FOR EACH ROW WHEN (OLD."receipt_number" IS DISTINCT FROM NEW."receipt_number") '
+            'EXECUTE FUNCTION "api_sale_receipt_sync"()'
+        )
+
+
+def drop_receipt_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TRIGGER IF EXISTS "api_sale_receipt_update" ON "api_sale"')
+        cursor.execute('DROP TRIGGER IF EXISTS "api_sale_receipt_sync" ON "api_sale"')
+        cursor.execute('DROP FUNCTION IF EXISTS "api_sale_receipt_sync"()')
+        cursor.execute('DROP TABLE IF EXISTS "api_sale_receipt"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_backfill_customer_phone'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_receipt_table, drop_receipt_table),
+    ]
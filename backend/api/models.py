@@ -1,7 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
+from django.utils import timezone
 from decimal import Decimal
+import zoneinfo
+
+from .utils import normalize_phone
 
 
 class UserProfile(models.Model):
@@ -62,6 +66,11 @@ class Product(models.Model):
     cost = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     stock = models.IntegerField(default=0)
     reorder_level = models.IntegerField(default=3)
+    # Written by the demand forecast (api/forecasting.py); null until the first run
+    daily_demand = models.FloatField(blank=True, null=True)
+    suggested_reorder_level = models.IntegerField(blank=True, null=True)
+    days_of_cover = models.FloatField(blank=True, null=True)
+    forecast_at = models.DateTimeField(blank=True, null=True)
     image_url = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -82,6 +91,8 @@ class Sale(models.Model):
     payment_method = models.CharField(max_length=50, blank=True, null=True)
     customer_name = models.CharField(max_length=255, blank=True, null=True)
     customer_phone = models.CharField(max_length=50, blank=True, null=True)
+    # E.164 form of customer_phone, set on save; customer lookups go through its index
+    customer_phone_normalized = models.CharField(max_length=16, blank=True, null=True, db_index=True, editable=False)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='sales')
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -90,6 +101,7 @@ class Sale(models.Model):
         if self.payment_method:
             # Convert to title case for consistency
             self.payment_method = self.payment_method.strip().title()
+        self.customer_phone_normalized = normalize_phone(self.customer_phone)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -97,11 +109,16 @@ class Sale(models.Model):
     
 
 class SaleItem(models.Model):
-    sale = models.ForeignKey(Sale, on_delete=models.CASCADE, null=True, related_name='items')
+    # Sales are range-partitioned on created_at (see api/partitions.py), so the
+    # primary key is (id, created_at) and a plain FK constraint on sale_id is not
+    # possible; integrity is kept by the ORM (cascade) instead.
+    sale = models.ForeignKey(Sale, on_delete=models.CASCADE, null=True, related_name='items', db_constraint=False)
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
     quantity = models.IntegerField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    # Copy of sale.created_at, the partition key of api_saleitem
+    created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         sale_num = getattr(self.sale, "receipt_number", None) or f"Sale {self.sale_id or 'Unknown'}"
@@ -117,6 +134,8 @@ class StoreSettings(models.Model):
     store_email = models.EmailField(default='info@hafshatkidz.com')
     currency = models.CharField(max_length=10, default='GHS')
     tax_rate = models.DecimalField(max_digits=5, decimal_places=2, default=12.5)
+    # IANA name; reports bucket by the store's local time (TIME_ZONE is UTC)
+    time_zone = models.CharField(max_length=64, default='Africa/Accra')
     
     # POS Settings
     receipt_footer = models.TextField(default='Thank you for shopping with us!')
@@ -146,6 +165,10 @@ class StoreSettings(models.Model):
         settings, created = cls.objects.get_or_create(id=1)
         return settings
 
+    @property
+    def tzinfo(self):
+        return zoneinfo.ZoneInfo(self.time_zone)
+
 
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
@@ -161,9 +184,136 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
+    # Times this alert was raised; repeated low-stock alerts reuse one row
+    occurrences = models.PositiveIntegerField(default=1)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the feed (api/notifications.py)
+            models.Index(fields=['-created_at', '-id'], name='api_notification_feed'),
+        ]
     
     def __str__(self):
-        return f"{self.get_type_display()}: {self.title}"
\ No newline at end of file
+        return f"{self.get_type_display()}: {self.title}"
+
+class ZReport(models.Model):
+    """Immutable end-of-day (Z) report for one business date, see api/reports.py"""
+    business_date = models.DateField(unique=True)
+    data = models.JSONField()
+    generated_at = models.DateTimeField(auto_now_add=True)
+    generated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='zreports')
+
+    class Meta:
+        ordering = ['-business_date']
+
+    def save(self, *args, **kwargs):
+        # Historic reports are snapshots and must never be rewritten
+        if not self._state.adding:
+            raise ValueError('Z-reports are immutable')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Z-report {self.business_date}"
+
+
+class StockMovement(models.Model):
+    """Append-only ledger of every change to Product.stock (see api/inventory.py)"""
+    KIND_CHOICES = [
+        ('sale', 'Sale'),
+        ('restock', 'Restock'),
+        ('adjustment', 'Adjustment'),
+        ('return', 'Return'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Signed change actually applied to Product.stock
+    quantity = models.IntegerField()
+    # No DB constraint: api_sale is partitioned (see SaleItem.sale)
+    sale = models.ForeignKey(Sale, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_constraint=False)
+    note = models.CharField(max_length=255, blank=True, default='')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['product', 'created_at'], name='api_stockmove_product_time')]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} {self.product_id}"
+
+
+class StockSnapshot(models.Model):
+    """Periodic copy of Product.stock; stock history = snapshot + later movements"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    stock = models.IntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'taken_at'], name='api_stocksnapshot_product_time_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.taken_at}: {self.stock}"
+
+
+class StockTake(models.Model):
+    """A physical inventory count session (see api/stocktake.py)"""
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('committed', 'Committed'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    note = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    committed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    committed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Stock take #{self.pk} ({self.status})"
+
+
+class StockTakeCount(models.Model):
+    stock_take = models.ForeignKey(StockTake, on_delete=models.CASCADE, related_name='counts')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    counted = models.IntegerField()
+    # Product.stock when the session was committed
+    expected = models.IntegerField(null=True, blank=True)
+    counted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stock_take', 'product'], name='api_stocktakecount_take_product_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.counted}"
+
+
+class ProductAssociation(models.Model):
+    """Top-K "frequently bought together" neighbours per product (rebuilt by api/associations.py)"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='associations')
+    associated = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    # Baskets containing both, share of the product's baskets that also had
+    # the neighbour, and how much more often than chance they occur together
+    support = models.PositiveIntegerField()
+    confidence = models.FloatField()
+    lift = models.FloatField()
+
+    class Meta:
+        constraints = [
+            # Also the index the cart lookup uses
+            models.UniqueConstraint(fields=['product', 'rank'], name='api_association_product_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.associated_id} (#{self.rank})"
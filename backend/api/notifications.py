@@ -0,0 +1,86 @@
+"""
+Notification feed helpers shared by the sync and async views.
+
+The feed is keyset-paginated on (created_at, id): the cursor is the position
+of the last row returned, so every page is an index range scan rather than an
+OFFSET over all older rows. Unread counts are cached per user under the
+``notifications`` generation (see api/cache.py), which every write bumps, so
+the header badge costs a cache lookup instead of a COUNT.
+"""
+from django.core.cache import cache
+from django.db.models import Q
+
+from .cache import aget_generation, get_generation
+from .models import Notification
+from .signals import invalidate_notifications
+from .utils import decode_cursor, encode_cursor
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+FEED_FIELDS = (
+    'id', 'type', 'title', 'message', 'is_read', 'created_at', 'occurrences', 'related_product', 'related_product__name'
+)
+UNREAD_COUNT_TTL = 300
+
+
+def visible_notifications(user):
+    """Notifications addressed to ``user`` or broadcast (superusers see all)"""
+    queryset = Notification.objects.all()
+    if not user.is_superuser:
+        queryset = queryset.filter(Q(user=user) | Q(user__isnull=True))
+    return queryset
+
+
+def feed_queryset(user):
+    return visible_notifications(user).select_related('related_product').only(*FEED_FIELDS).order_by('-created_at', '-id')
+
+
+def page_queryset(user, cursor=None, limit=PAGE_SIZE):
+    """(queryset, limit) for one feed page; fetch ``limit + 1`` rows to detect a next page"""
+    queryset = feed_queryset(user)
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    return queryset[:limit + 1], limit
+
+
+def page_data(rows, limit, serialize):
+    return {
+        'results': [serialize(notif) for notif in rows[:limit]],
+        'next_cursor': encode_cursor(rows[limit - 1]) if len(rows) > limit else None,
+    }
+
+
+def _unread_key(user):
+    return f"notifications:unread:{get_generation('notifications')}:{user.id}:{int(user.is_superuser)}"
+
+
+def unread_count(user):
+    key = _unread_key(user)
+    count = cache.get(key)
+    if count is None:
+        count = visible_notifications(user).filter(is_read=False).count()
+        cache.set(key, count, UNREAD_COUNT_TTL)
+    return count
+
+
+async def aunread_count(user):
+    """Async ``unread_count``, sharing its cache entries"""
+    key = f"notifications:unread:{await aget_generation('notifications')}:{user.id}:{int(user.is_superuser)}"
+    count = await cache.aget(key)
+    if count is None:
+        count = await visible_notifications(user).filter(is_read=False).acount()
+        await cache.aset(key, count, UNREAD_COUNT_TTL)
+    return count
+
+
+def mark_read(user, ids=None):
+    """Mark the given (or all) visible unread notifications read with one UPDATE"""
+    queryset = visible_notifications(user).filter(is_read=False)
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    updated = queryset.update(is_read=True)
+    if updated:
+        invalidate_notifications()
+    return updated
@@ -0,0 +1,198 @@
+"""
+Monthly range partitions for the sales tables (PostgreSQL only).
+
+api_sale and api_saleitem are declared ``PARTITION BY RANGE (created_at)`` by
+migration 0008. Each calendar month (UTC) lives in its own child table named
+``<table>_pYYYY_MM``; a ``<table>_default`` partition catches anything outside
+the months that have been created.
+"""
+import gzip
+import re
+from datetime import date, datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.db import connection, transaction
+
+PARTITIONED_TABLES = ('api_sale', 'api_saleitem')
+
+# Items reference sales, so they are detached/archived first.
+ARCHIVE_ORDER = ('api_saleitem', 'api_sale')
+
+PARTITION_NAME_RE = re.compile(r'^(?P<table>api_sale(?:item)?)_p(?P<year>\d{4})_(?P<month>\d{2})$')
+
+
+def month_start(value):
+    """Return the first day of the month containing ``value``"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    """Return the first day of the month ``months`` after ``value``"""
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(first, last):
+    """Yield the first day of every month from ``first`` to ``last`` inclusive"""
+    current = month_start(first)
+    last = month_start(last)
+    while current <= last:
+        yield current
+        current = add_months(current, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month.year:04d}_{month.month:02d}'
+
+
+def parse_partition_name(name):
+    """Return (table, month) for a monthly partition name, or None"""
+    match = PARTITION_NAME_RE.match(name)
+    if not match:
+        return None
+    return match.group('table'), date(int(match.group('year')), int(match.group('month')), 1)
+
+
+def _bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc).isoformat()
+
+
+def is_partitioned(table='api_sale'):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(table):
+    """Return the names of the partitions currently attached to ``table``"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s ORDER BY child.relname",
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _has_receipt_table(cursor):
+    cursor.execute("SELECT to_regclass('api_sale_receipt') IS NOT NULL")
+    return cursor.fetchone()[0]
+
+
+def create_month_partition(table, month):
+    """
+    Create the partition of ``table`` for ``month`` if it does not exist.
+
+    Rows that already landed in the default partition for that month are moved
+    into the new partition, otherwise PostgreSQL refuses to create it. Their
+    receipt numbers are released first, since re-inserting the sales registers
+    them again (migration 0021). Returns True when a partition was created.
+    """
+    name = partition_name(table, month)
+    if name in list_partitions(table):
+        return False
+
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    default = f'{table}_default'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'SELECT 1 FROM "{default}" WHERE created_at >= %s AND created_at < %s LIMIT 1', [lower, upper])
+        stray_rows = cursor.fetchone() is not None
+        if stray_rows:
+            cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"')
+        cursor.execute(
+            f'CREATE TABLE "{name}" PARTITION OF "{table}" FOR VALUES FROM (%s) TO (%s)',
+            [lower, upper],
+        )
+        if stray_rows:
+            if table == 'api_sale' and _has_receipt_table(cursor):
+                cursor.execute(
+                    f'DELETE FROM "api_sale_receipt" WHERE receipt_number IN '
+                    f'(SELECT receipt_number FROM "{default}" WHERE created_at >= %s AND created_at < %s)',
+                    [lower, upper],
+                )
+            cursor.execute(
+                f'INSERT INTO "{table}" SELECT * FROM "{default}" WHERE created_at >= %s AND created_at < %s',
+                [lower, upper],
+            )
+            cursor.execute(f'DELETE FROM "{default}" WHERE created_at >= %s AND created_at < %s', [lower, upper])
+            cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT')
+    return True
+
+
+def ensure_partitions(first, last):
+    """Create monthly partitions for both sales tables between two dates"""
+    created = []
+    for month in month_range(first, last):
+        for table in PARTITIONED_TABLES:
+            if create_month_partition(table, month):
+                created.append(partition_name(table, month))
+    return created
+
+
+def detached_partitions():
+    """Names of monthly partition tables that exist but are not attached (``--detach-only`` leftovers)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_class c "
+            "WHERE c.relkind = 'r' AND pg_table_is_visible(c.oid) "
+            "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid) "
+            "ORDER BY c.relname"
+        )
+        return [row[0] for row in cursor.fetchall() if parse_partition_name(row[0])]
+
+
+def partitions_before(month, include_detached=False):
+    """
+    Return (table, month, name) for attached partitions older than ``month``,
+    plus the detached ones with ``include_detached``.
+    """
+    names = [name for table in ARCHIVE_ORDER for name in list_partitions(table)]
+    if include_detached:
+        names += detached_partitions()
+    old = []
+    for name in names:
+        parsed = parse_partition_name(name)
+        if parsed and parsed[1] < month:
+            old.append((parsed[0], parsed[1], name))
+    return sorted(old, key=lambda entry: (entry[1], ARCHIVE_ORDER.index(entry[0])))
+
+
+def detach_partition(table, name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+
+
+def archive_partition(table, name, archive_dir):
+    """
+    Dump a partition to ``<archive_dir>/<name>.csv.gz``, then detach and drop it.
+
+    Old months no longer receive writes, so the dump is taken while the
+    partition is still attached (without locking the parent table). Detach and
+    drop run in one transaction only after the archive is complete: if the
+    dump or the drop fails, the partition stays attached and its sales stay
+    visible, and the next run tries again. Already detached partitions are
+    just dumped and dropped. Returns the path of the written archive.
+    """
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f'{name}.csv.gz'
+    partial = path.with_name(f'{path.name}.partial')
+    try:
+        with connection.cursor() as cursor, gzip.open(partial, 'wb') as fh:
+            cursor.cursor.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', fh)
+        partial.replace(path)
+    finally:
+        partial.unlink(missing_ok=True)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if name in list_partitions(table):
+            cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+        cursor.execute(f'DROP TABLE "{name}"')
+    return path
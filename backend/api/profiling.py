@@ -0,0 +1,237 @@
+"""
+On-demand request profiler for superusers.
+
+Add ``?__profile=1`` (or the ``X-Profile: 1`` header) to any request made as
+a superuser and the request is run under a profiler with every SQL query
+recorded. The report is stored in PROFILER_DIR and its id returned in the
+``X-Profile-Id`` response header; fetch it from ``/api/profiles/<id>/``.
+
+Modes:
+
+* ``sample`` (default) - a background thread samples the request thread's
+  stack every PROFILER_SAMPLE_INTERVAL seconds; the artifact is a folded
+  stack file for flamegraph.pl, inferno or speedscope.
+* ``cprofile`` - deterministic cProfile; the artifact is a pstats ``.prof``
+  file (snakeviz, ``python -m pstats``) and the report lists the top
+  functions by cumulative time.
+
+Requests without the flag only pay for a substring check.
+"""
+import cProfile
+import io
+import json
+import marshal
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+PROFILE_PARAM = '__profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+MODES = ('sample', 'cprofile')
+MAX_QUERIES = 500
+PROFILE_ID = re.compile(r'^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$')
+ARTIFACT_EXTENSIONS = {'sample': 'folded', 'cprofile': 'prof'}
+
+
+def requested_mode(request):
+    """Profiling mode asked for by the request, or None"""
+    if PROFILE_PARAM not in request.META.get('QUERY_STRING', '') and PROFILE_HEADER not in request.META:
+        return None
+    value = request.GET.get(PROFILE_PARAM) or request.META.get(PROFILE_HEADER) or ''
+    value = value.strip().lower()
+    if value in ('', '0', 'false', 'no'):
+        return None
+    return value if value in MODES else 'sample'
+
+
+def _superuser(request):
+    """Session or token user if it is an active superuser (DRF auth runs later)"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user if user.is_superuser else None
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword != 'Token' or not key:
+        return None
+    token = Token.objects.select_related('user').filter(key=key.strip()).first()
+    if token is None or not token.user.is_active or not token.user.is_superuser:
+        return None
+    return token.user
+
+
+class QueryLog:
+    """``connection.execute_wrapper`` hook recording SQL and timings"""
+
+    def __init__(self):
+        self.queries = []
+        self.count = 0
+        self.time = 0.0
+
+    def wrapper(self, alias):
+        def record(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.count += 1
+                self.time += elapsed
+                if len(self.queries) < MAX_QUERIES:
+                    self.queries.append({'alias': alias, 'sql': sql, 'time_ms': round(elapsed * 1000, 3), 'many': many})
+        return record
+
+    def as_dict(self):
+        repeated = Counter(query['sql'] for query in self.queries)
+        return {
+            'count': self.count,
+            'time_ms': round(self.time * 1000, 3),
+            # Same statement run many times is usually an N+1
+            'repeated': [{'sql': sql, 'count': n} for sql, n in repeated.most_common(10) if n > 1],
+            'queries': self.queries,
+            'truncated': self.count > len(self.queries),
+        }
+
+
+class StackSampler:
+    """Sample one thread's Python stack from a background thread into folded stacks"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request profiler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common()).encode()
+
+
+def _profile_dir():
+    path = settings.PROFILER_DIR
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _prune(directory):
+    reports = sorted(directory.glob('*.json'))
+    for report in reports[:-settings.PROFILER_KEEP]:
+        for path in directory.glob(f'{report.stem}.*'):
+            path.unlink(missing_ok=True)
+
+
+def save(report, artifact, mode):
+    directory = _profile_dir()
+    (directory / f"{report['id']}.{ARTIFACT_EXTENSIONS[mode]}").write_bytes(artifact)
+    (directory / f"{report['id']}.json").write_text(json.dumps(report, default=str))
+    _prune(directory)
+
+
+def load(profile_id):
+    """Stored report dict, or None for unknown/malformed ids"""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = settings.PROFILER_DIR / f'{profile_id}.json'
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def artifact_path(report):
+    return settings.PROFILER_DIR / f"{report['id']}.{ARTIFACT_EXTENSIONS[report['mode']]}"
+
+
+def list_reports():
+    if not settings.PROFILER_DIR.exists():
+        return []
+    reports = []
+    for path in sorted(settings.PROFILER_DIR.glob('*.json'), reverse=True):
+        report = json.loads(path.read_text())
+        reports.append({key: report[key] for key in ('id', 'created_at', 'mode', 'method', 'path', 'status', 'duration_ms')})
+    return reports
+
+
+def profile_request(request, get_response, mode):
+    log = QueryLog()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(log.wrapper(connection.alias)))
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        else:
+            with StackSampler(threading.get_ident(), settings.PROFILER_SAMPLE_INTERVAL) as sampler:
+                response = get_response(request)
+    duration = time.perf_counter() - started
+
+    report = {
+        'id': f"{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}",
+        'created_at': timezone.now().isoformat(),
+        'mode': mode,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'sql': log.as_dict(),
+    }
+    if mode == 'cprofile':
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats(40)
+        report['top'] = stream.getvalue()
+        # Same format as Stats.dump_stats()
+        artifact = marshal.dumps(stats.stats)
+    else:
+        report['samples'] = sampler.samples
+        report['interval'] = settings.PROFILER_SAMPLE_INTERVAL
+        artifact = sampler.folded()
+    save(report, artifact, mode)
+
+    response['X-Profile-Id'] = report['id']
+    response['X-Profile-Queries'] = str(log.count)
+    return response
+
+
+class ProfilerMiddleware:
+    """Profile requests flagged with ``?__profile=`` or ``X-Profile`` (superusers only)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None or _superuser(request) is None:
+            return self.get_response(request)
+        return profile_request(request, self.get_response, mode)
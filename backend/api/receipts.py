@@ -0,0 +1,219 @@
+"""
+Server-side receipts.
+
+``render(sale_id, fmt)`` renders a sale as
+
+* ``html`` - api/templates/api/receipt.html, for the browser and email
+* ``pdf`` - a one-page PDF on 80 mm paper, written directly (built-in
+  Courier fonts, no PDF library)
+* ``escpos`` - raw ESC/POS bytes for thermal printers, RECEIPT_LINE_WIDTH
+  characters per line
+
+Sales do not change after checkout, so the output is cached per sale and
+format for RECEIPT_CACHE_TTL. The key carries the layout version (the code
+below plus a hash of the HTML template) and the settings cache generation,
+which api/signals.py bumps whenever StoreSettings is saved; a reprint is a
+single cache read, and editing the store details or the template makes new
+receipts without touching old entries.
+"""
+import functools
+import hashlib
+import textwrap
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .cache import get_generation
+from .models import Sale, SaleItem, StoreSettings
+
+TEMPLATE = 'api/receipt.html'
+# Bump when the PDF or ESC/POS layout below changes; HTML template edits are picked up by hash
+LAYOUT_VERSION = 1
+CENT = Decimal('0.01')
+
+
+@functools.cache
+def layout_version():
+    source = get_template(TEMPLATE).template.source
+    return f'{LAYOUT_VERSION}.{hashlib.sha1(source.encode()).hexdigest()[:10]}'
+
+
+def _money(value):
+    return f'{value:.2f}'
+
+
+def receipt_data(sale_id):
+    """Everything a receipt shows, as strings (three queries); raises Sale.DoesNotExist"""
+    sale = Sale.objects.select_related('created_by').get(pk=sale_id)
+    items = (
+        SaleItem.objects.filter(sale_id=sale.pk, created_at=sale.created_at)
+        .select_related('product').order_by('id')
+    )
+    store = StoreSettings.get_settings()
+    # A freshly created settings row still holds the float default
+    tax_rate = Decimal(str(store.tax_rate))
+    tax = (sale.total_amount * tax_rate / (100 + tax_rate)).quantize(CENT)
+    cashier = sale.created_by
+    return {
+        'store': {
+            'name': store.store_name,
+            'address': store.store_address,
+            'phone': store.store_phone,
+            'email': store.store_email,
+            'footer': store.receipt_footer,
+        },
+        'currency': store.currency,
+        'receipt_number': sale.receipt_number,
+        'date': timezone.localtime(sale.created_at, store.tzinfo).strftime('%Y-%m-%d %H:%M'),
+        'customer_name': sale.customer_name or '',
+        'customer_phone': sale.customer_phone or '',
+        'payment_method': sale.payment_method or 'Cash',
+        'cashier': (cashier.get_full_name() or cashier.username) if cashier else '',
+        'items': [{
+            'name': item.product.name if item.product else f'Product {item.product_id or "?"}',
+            'quantity': item.quantity,
+            'unit_price': _money(item.unit_price),
+            'subtotal': _money(item.subtotal),
+        } for item in items],
+        # Prices include tax
+        'subtotal': _money(sale.total_amount - tax),
+        'tax_rate': f'{tax_rate.normalize():f}',
+        'tax': _money(tax) if tax else '',
+        'total': _money(sale.total_amount),
+    }
+
+
+def render_html(data):
+    return get_template(TEMPLATE).render({'receipt': data}).encode()
+
+
+def _columns(left, right, width):
+    return f'{left[:width - len(right) - 1]:<{width - len(right)}}{right}'
+
+
+def receipt_lines(data, width):
+    """
+    The plain-text receipt shared by the PDF and ESC/POS output, as
+    (style, text) pairs; style is ``title``, ``center``, ``bold``, ``text``
+    or ``rule``.
+    """
+    store = data['store']
+    lines = [('title', line) for line in textwrap.wrap(store['name'], width // 2)]
+    for text in [*store['address'].splitlines(), f"Tel: {store['phone']}", store['email']]:
+        lines += [('center', line) for line in textwrap.wrap(text, width)]
+    lines.append(('rule', ''))
+    details = [
+        ('Receipt', data['receipt_number']), ('Date', data['date']), ('Customer', data['customer_name']),
+        ('Phone', data['customer_phone']), ('Payment', data['payment_method']), ('Cashier', data['cashier']),
+    ]
+    lines += [('text', _columns(f'{label}:', value, width)) for label, value in details if value]
+    lines.append(('rule', ''))
+    for item in data['items']:
+        lines += [('text', line) for line in textwrap.wrap(item['name'], width)]
+        lines.append(('text', _columns(f"  {item['quantity']} x {item['unit_price']}", item['subtotal'], width)))
+    lines.append(('rule', ''))
+    lines.append(('text', _columns('Subtotal', data['subtotal'], width)))
+    if data['tax']:
+        lines.append(('text', _columns(f"Tax incl. ({data['tax_rate']}%)", data['tax'], width)))
+    lines.append(('bold', _columns('TOTAL', f"{data['currency']} {data['total']}", width)))
+    lines.append(('rule', ''))
+    for text in store['footer'].splitlines():
+        lines += [('center', line) for line in textwrap.wrap(text, width)]
+    return lines
+
+
+# ESC/POS commands
+ESC_INIT = b'\x1b@'
+ESC_CODEPAGE_437 = b'\x1bt\x00'
+ESC_ALIGN = {'left': b'\x1ba\x00', 'center': b'\x1ba\x01'}
+ESC_BOLD = {True: b'\x1bE\x01', False: b'\x1bE\x00'}
+GS_SIZE = {'double': b'\x1d!\x11', 'normal': b'\x1d!\x00'}
+GS_FEED_CUT = b'\x1dVA\x03'
+
+
+def render_escpos(data):
+    width = settings.RECEIPT_LINE_WIDTH
+    out = bytearray(ESC_INIT + ESC_CODEPAGE_437)
+    for style, text in receipt_lines(data, width):
+        if style == 'rule':
+            text = '-' * width
+        centered = style in ('title', 'center')
+        out += ESC_ALIGN['center' if centered else 'left']
+        if style == 'title':
+            out += GS_SIZE['double'] + ESC_BOLD[True]
+        elif style == 'bold':
+            out += ESC_BOLD[True]
+        out += text.encode('cp437', 'replace') + b'\n'
+        if style == 'title':
+            out += GS_SIZE['normal']
+        if style in ('title', 'bold'):
+            out += ESC_BOLD[False]
+    out += ESC_ALIGN['left'] + GS_FEED_CUT
+    return bytes(out)
+
+
+# PDF: 80 mm roll, Courier 8 pt (4.8 pt per character)
+PDF_PAGE_WIDTH = 226
+PDF_MARGIN = 12
+PDF_FONT_SIZE = 8
+PDF_LEADING = 10
+PDF_CHAR_WIDTH = PDF_FONT_SIZE * 0.6
+
+
+def _pdf_text(text):
+    escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return escaped.encode('latin-1', 'replace')
+
+
+def render_pdf(data):
+    width = int((PDF_PAGE_WIDTH - 2 * PDF_MARGIN) / PDF_CHAR_WIDTH)
+    lines = receipt_lines(data, width)
+    height = 2 * PDF_MARGIN + PDF_LEADING * len(lines)
+
+    stream = bytearray()
+    y = height - PDF_MARGIN - PDF_FONT_SIZE
+    for style, text in lines:
+        if style == 'rule':
+            text = '-' * width
+        x = PDF_MARGIN
+        if style in ('title', 'center'):
+            x += (width - len(text)) * PDF_CHAR_WIDTH / 2
+        font = 'F2' if style in ('title', 'bold') else 'F1'
+        stream += b'BT /%s %d Tf %.1f %d Td (' % (font.encode(), PDF_FONT_SIZE, x, y) + _pdf_text(text) + b') Tj ET\n'
+        y -= PDF_LEADING
+
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+        b'/Resources << /Font << /F1 4 0 R /F2 5 0 R >> >> /Contents 6 0 R >>' % (PDF_PAGE_WIDTH, height),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold /Encoding /WinAnsiEncoding >>',
+        b'<< /Length %d >>\nstream\n' % len(stream) + bytes(stream) + b'endstream',
+    ]
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+RENDERERS = {'html': render_html, 'pdf': render_pdf, 'escpos': render_escpos}
+
+
+def render(sale_id, fmt):
+    """Receipt bytes for a sale, from the cache when already rendered; raises Sale.DoesNotExist"""
+    key = f'receipt:{layout_version()}:{get_generation("settings")}:{sale_id}:{fmt}'
+    content = cache.get(key)
+    if content is None:
+        content = RENDERERS[fmt](receipt_data(sale_id))
+        cache.set(key, content, settings.RECEIPT_CACHE_TTL)
+    return content
@@ -0,0 +1,101 @@
+"""
+Response renderers.
+
+ORJSONRenderer replaces DRF's JSONRenderer (falling back to it when orjson is
+not installed). MessagePackRenderer is offered for clients that send
+``Accept: application/msgpack`` when the msgpack package is available.
+Both write what DRF's encoder would: serializer money fields arrive as
+strings, other Decimals become numbers, and UTC datetimes end in ``Z``.
+"""
+from decimal import Decimal
+
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if hasattr(obj, 'tolist'):  # numpy scalars and arrays
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    """Serialize ``data`` to JSON bytes the same way ORJSONRenderer does"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+    return JSONRenderer().render(data)
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return dumps(data)
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if hasattr(obj, 'isoformat'):
+        value = obj.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    if isinstance(obj, Promise):
+        return str(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not MessagePack serializable')
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+class ReceiptRenderer(BaseRenderer):
+    """Passes pre-rendered receipt bytes through (api/receipts.py); errors are sent as JSON"""
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        renderer_context['response']['Content-Type'] = 'application/json'
+        return dumps(data)
+
+
+class ReceiptHTMLRenderer(ReceiptRenderer):
+    media_type = 'text/html'
+    format = 'html'
+    charset = 'utf-8'
+
+
+class ReceiptPDFRenderer(ReceiptRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class ESCPOSRenderer(ReceiptRenderer):
+    # Raw printer commands, sent to the printer as-is
+    media_type = 'application/octet-stream'
+    format = 'escpos'
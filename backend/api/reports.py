@@ -0,0 +1,124 @@
+"""
+End-of-day (Z) reports.
+
+A Z-report is computed once per closed business day with a handful of
+aggregate queries and stored as an immutable ZReport snapshot; every later
+read is a single-row lookup.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .db_router import pin_to_primary
+from .models import Sale, SaleItem, StoreSettings, ZReport
+from .utils import day_range
+
+CENT = Decimal('0.01')
+
+
+def _money(value):
+    return float((value or Decimal('0')).quantize(CENT))
+
+
+def compute_zreport(business_date):
+    """Aggregate the sales of ``business_date`` into a JSON-serializable dict"""
+    start, end = day_range(business_date)
+    sales = Sale.objects.filter(created_at__gte=start, created_at__lt=end)
+    # SaleItem.created_at is the sale's timestamp, so this stays on one partition
+    items = SaleItem.objects.filter(created_at__gte=start, created_at__lt=end)
+
+    totals = sales.aggregate(revenue=Sum('total_amount'), orders=Count('id'))
+    revenue = totals['revenue'] or Decimal('0')
+
+    cashiers = sales.values(
+        'created_by', 'created_by__username', 'created_by__first_name', 'created_by__last_name'
+    ).annotate(revenue=Sum('total_amount'), orders=Count('id')).order_by('-revenue')
+
+    payments = sales.values('payment_method').annotate(
+        revenue=Sum('total_amount'), orders=Count('id')
+    ).order_by('-revenue')
+
+    products = items.values('product', 'product__name', 'product__sku').annotate(
+        quantity=Sum('quantity'), revenue=Sum('subtotal')
+    ).order_by('-quantity')
+
+    # Prices are tax-inclusive: tax = gross * rate / (100 + rate)
+    # (tax_rate is a float on a freshly created settings row)
+    tax_rate = Decimal(str(StoreSettings.get_settings().tax_rate))
+    tax_collected = revenue * tax_rate / (Decimal('100') + tax_rate)
+
+    products = list(products)
+    return {
+        'business_date': business_date.isoformat(),
+        'totals': {
+            'revenue': _money(revenue),
+            'orders': totals['orders'],
+            'items_sold': sum(row['quantity'] or 0 for row in products),
+            'tax_rate': float(tax_rate),
+            'tax_collected': _money(tax_collected),
+            'net_revenue': _money(revenue - tax_collected),
+        },
+        'cashiers': [
+            {
+                'user_id': row['created_by'],
+                'username': row['created_by__username'],
+                'name': ' '.join(filter(None, [row['created_by__first_name'], row['created_by__last_name']])),
+                'revenue': _money(row['revenue']),
+                'orders': row['orders'],
+            }
+            for row in cashiers
+        ],
+        'payment_methods': [
+            {
+                'name': row['payment_method'] or 'Cash',
+                'revenue': _money(row['revenue']),
+                'orders': row['orders'],
+            }
+            for row in payments
+        ],
+        'items': [
+            {
+                'product_id': row['product'],
+                'name': row['product__name'],
+                'sku': row['product__sku'],
+                'quantity': row['quantity'],
+                'revenue': _money(row['revenue']),
+            }
+            for row in products
+        ],
+    }
+
+
+def get_or_generate_zreport(business_date, user=None):
+    """
+    Return the stored Z-report for ``business_date``, generating it on first use.
+
+    Only closed days (before today) can be reported; an existing report is
+    always returned as stored and never recomputed. Days before the first
+    recorded sale - before the store opened, or in archived partitions -
+    raise ZReport.DoesNotExist rather than storing an empty report.
+    """
+    report = ZReport.objects.filter(business_date=business_date).first()
+    if report is not None:
+        return report
+    if business_date >= timezone.localdate():
+        raise ValueError('Z-reports can only be generated for closed days')
+
+    # Views read from the replica; the snapshot is computed from the primary
+    # so it cannot miss sales the replica has not replayed yet
+    with pin_to_primary():
+        first_sale = Sale.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        if first_sale is None or business_date < timezone.localdate(first_sale):
+            raise ZReport.DoesNotExist('No sales are recorded on or before this day')
+        try:
+            with transaction.atomic():
+                return ZReport.objects.create(
+                    business_date=business_date,
+                    data=compute_zreport(business_date),
+                    generated_by=user,
+                )
+        except IntegrityError:
+            # Another worker generated it concurrently
+            return ZReport.objects.get(business_date=business_date)
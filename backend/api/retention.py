@@ -0,0 +1,128 @@
+"""
+Notification retention.
+
+* Repeated low-stock alerts for the same product (and recipient) are
+  collapsed into their newest row, whose ``occurrences`` carries the total.
+* Read notifications older than NOTIFICATION_READ_TTL_DAYS are deleted.
+
+Deletes run in bounded batches of primary keys, each in its own short
+transaction, so the table is never locked for long. Deleted rows can be
+appended to a gzipped JSON-lines archive first.
+"""
+import gzip
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import Notification
+from .renderers import dumps
+from .signals import invalidate_notifications
+
+ARCHIVE_FIELDS = ('id', 'type', 'title', 'message', 'related_product', 'is_read', 'created_at', 'user', 'occurrences')
+COMPACT_GROUPS_PER_BATCH = 200
+
+
+class Archive:
+    """Append deleted rows to ``<archive_dir>/notifications-<timestamp>.jsonl.gz``"""
+
+    def __init__(self, archive_dir):
+        archive_dir = Path(archive_dir)
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        self.path = archive_dir / f"notifications-{timezone.now():%Y%m%d-%H%M%S}.jsonl.gz"
+        self.rows = 0
+
+    def write(self, queryset):
+        with gzip.open(self.path, 'ab') as fh:
+            for row in queryset.values(*ARCHIVE_FIELDS):
+                fh.write(dumps(row) + b'\n')
+                self.rows += 1
+
+
+def delete_in_batches(queryset, batch_size=None, archive=None, pause=0, dry_run=False):
+    """Delete ``queryset`` in primary-key batches; returns the number of rows deleted"""
+    batch_size = batch_size or settings.NOTIFICATION_DELETE_BATCH
+    if dry_run:
+        return queryset.count()
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            batch = Notification.objects.filter(id__in=ids)
+            if archive is not None:
+                archive.write(batch)
+            # Nothing references notifications; skip loading rows for delete signals
+            deleted += batch._raw_delete(batch.db)
+        if pause:
+            time.sleep(pause)
+    if deleted:
+        invalidate_notifications()
+    return deleted
+
+
+def compact_low_stock(batch_size=None, archive=None, pause=0, dry_run=False):
+    """
+    Collapse duplicate low-stock alerts per (product, recipient) into the newest row.
+
+    The kept row's ``occurrences`` becomes the sum over the group and it stays
+    unread if any alert in the group was unread. Returns rows removed.
+    """
+    alerts = Notification.objects.filter(type='low_stock', related_product__isnull=False)
+    groups = list(
+        alerts.values('related_product', 'user')
+        .annotate(rows=Count('id'), total=Sum('occurrences'), unread=Count('id', filter=Q(is_read=False)))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    if dry_run or not groups:
+        return sum(group['rows'] - 1 for group in groups)
+
+    # Re-raising an alert bumps created_at on the existing row, so the newest
+    # alert is not necessarily the one with the highest id.
+    newest = alerts.annotate(
+        rank=Window(
+            RowNumber(),
+            partition_by=[F('related_product'), F('user')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        )
+    ).filter(rank=1).order_by()
+    keep = {(product, user): pk for product, user, pk in newest.values_list('related_product', 'user', 'id')}
+
+    removed = 0
+    for start in range(0, len(groups), COMPACT_GROUPS_PER_BATCH):
+        chunk = groups[start:start + COMPACT_GROUPS_PER_BATCH]
+        for group in chunk:
+            group['keep'] = keep[(group['related_product'], group['user'])]
+        kept = Notification.objects.in_bulk([group['keep'] for group in chunk])
+        for group in chunk:
+            notif = kept[group['keep']]
+            notif.occurrences = group['total']
+            notif.is_read = not group['unread']
+        Notification.objects.bulk_update(kept.values(), ['occurrences', 'is_read'])
+
+        duplicates = Q()
+        for group in chunk:
+            duplicates |= Q(related_product=group['related_product'], user=group['user'])
+        removed += delete_in_batches(
+            Notification.objects.filter(duplicates, type='low_stock').exclude(id__in=kept.keys()),
+            batch_size=batch_size, archive=archive, pause=pause,
+        )
+    invalidate_notifications()
+    return removed
+
+
+def purge_read(ttl_days=None, batch_size=None, archive=None, pause=0, dry_run=False):
+    """Delete read notifications older than ``ttl_days``; returns rows removed"""
+    ttl_days = settings.NOTIFICATION_READ_TTL_DAYS if ttl_days is None else ttl_days
+    cutoff = timezone.now() - timedelta(days=ttl_days)
+    return delete_in_batches(
+        Notification.objects.filter(is_read=True, created_at__lt=cutoff),
+        batch_size=batch_size, archive=archive, pause=pause, dry_run=dry_run,
+    )
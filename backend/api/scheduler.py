@@ -0,0 +1,50 @@
+"""
+Lightweight scheduler for periodic maintenance jobs.
+
+Jobs are declared in api/jobs.py with the ``every`` decorator and run
+sequentially by ``manage.py run_scheduler``, one dedicated process next to
+the web workers (never inside them, migrate or a shell). Jobs must still be
+idempotent: each runs as soon as the process starts, so a restart repeats
+whatever ran last.
+"""
+import logging
+import time
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_jobs = []
+
+TICK_SECONDS = 1
+
+
+def every(seconds):
+    """Register the decorated function to run every ``seconds`` seconds"""
+    def decorator(func):
+        _jobs.append((seconds, func))
+        return func
+    return decorator
+
+
+def run_pending(next_runs, now):
+    for interval, func in _jobs:
+        if now < next_runs.get(func, 0):
+            continue
+        try:
+            func()
+        except Exception:
+            logger.exception('Scheduled job %s failed', func.__name__)
+        finally:
+            close_old_connections()
+            next_runs[func] = now + interval
+
+
+def run():
+    """Run the registered jobs until interrupted"""
+    from . import jobs  # noqa: F401 - registers the jobs
+    logger.info('Scheduler started with %d jobs', len(_jobs))
+    next_runs = {}
+    while True:
+        run_pending(next_runs, time.monotonic())
+        time.sleep(TICK_SECONDS)
@@ -1,4 +1,9 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, models, transaction
 from rest_framework import serializers
+
+from . import inventory
 from .models import Category, Product, Sale, SaleItem, User
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -11,6 +16,7 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
+        read_only_fields = ('daily_demand', 'suggested_reorder_level', 'days_of_cover', 'forecast_at')
 
     def validate(self, data):
         # Ensure business rule: price should be greater than or equal to cost (if cost provided)
@@ -26,6 +32,30 @@ class ProductSerializer(serializers.ModelSerializer):
                 pass
         return data
 
+    def create(self, validated_data):
+        with transaction.atomic():
+            product = super().create(validated_data)
+            inventory.record_movements([
+                inventory.movement(product.id, 'restock', product.stock, user=self._user(), note='Initial stock')
+            ])
+        return product
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            # Lock the row so a concurrent checkout cannot move stock between
+            # the read and the save; an edit without stock keeps the locked value
+            previous = Product.objects.select_for_update().values_list('stock', flat=True).get(pk=instance.pk)
+            instance.stock = previous
+            product = super().update(instance, validated_data)
+            inventory.record_movements([
+                inventory.movement(product.id, 'adjustment', product.stock - previous, user=self._user(), note='Product edit')
+            ])
+        return product
+
+    def _user(self):
+        request = self.context.get('request')
+        return getattr(request, 'user', None)
+
 
 class SaleItemSerializer(serializers.ModelSerializer):
     subtotal = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
@@ -40,19 +70,85 @@ class SaleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Sale
-        fields = ['id','receipt_number','total_amount','payment_method','customer_name','customer_phone','created_by','created_at','items']
+        fields = ['id','receipt_number','total_amount','payment_method','customer_name','customer_phone','customer_phone_normalized','created_by','created_at','items']
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        sale = Sale.objects.create(**validated_data)
-        for item_data in items_data:
-            # Remove subtotal from item_data if it exists to avoid duplicate
-            item_data.pop('subtotal', None)
-            # Calculate subtotal
-            subtotal = item_data['unit_price'] * item_data['quantity']
-            si = SaleItem.objects.create(sale=sale, subtotal=subtotal, **item_data)
-            # Decrement Stock Safely
-            if si.product:
-                si.product.stock = max(si.product.stock - si.quantity, 0)
-                si.product.save()
+        try:
+            with transaction.atomic():
+                sale = Sale.objects.create(**validated_data)
+                items = []
+                for item_data in items_data:
+                    # Remove subtotal from item_data if it exists to avoid duplicate
+                    item_data.pop('subtotal', None)
+                    # Calculate subtotal
+                    subtotal = item_data['unit_price'] * item_data['quantity']
+                    items.append(SaleItem(sale=sale, subtotal=subtotal, created_at=sale.created_at, **item_data))
+                SaleItem.objects.bulk_create(items)
+                # Decrement stock (never below zero) and record it in the ledger
+                inventory.apply_sale(sale, items, user=sale.created_by)
+        except IntegrityError:
+            # A concurrent checkout took the receipt number after validation
+            if Sale.objects.filter(receipt_number=validated_data.get('receipt_number')).exists():
+                raise serializers.ValidationError({'receipt_number': ['sale with this receipt number already exists.']})
+            raise
         return sale
+
+
+class ValuesSerializer:
+    """
+    Read-only list serializer built on ``QuerySet.values()``.
+
+    Skips model instantiation and per-field serializer calls for large list
+    responses. Output has the same keys and formats as the corresponding
+    ModelSerializer: money fields become strings (COERCE_DECIMAL_TO_STRING),
+    datetimes are left to the renderer.
+    """
+    fields = ()
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.decimal_fields = decimal_fields(queryset.model, self.fields)
+
+    def to_representation(self, row):
+        return coerce_decimals(row, self.decimal_fields)
+
+    @property
+    def data(self):
+        return [self.to_representation(row) for row in self.queryset.values(*self.fields)]
+
+
+def decimal_fields(model, names):
+    return [name for name in names if isinstance(model._meta.get_field(name), models.DecimalField)]
+
+
+def coerce_decimals(row, names):
+    for name in names:
+        if row[name] is not None:
+            row[name] = str(row[name])
+    return row
+
+
+class ProductValuesSerializer(ValuesSerializer):
+    fields = ('id', 'name', 'description', 'sku', 'price', 'cost', 'stock', 'reorder_level',
+              'daily_demand', 'suggested_reorder_level', 'days_of_cover', 'forecast_at',
+              'image_url', 'created_at', 'updated_at', 'category')
+
+
+class SaleValuesSerializer(ValuesSerializer):
+    fields = ('id', 'receipt_number', 'total_amount', 'payment_method', 'customer_name',
+              'customer_phone', 'customer_phone_normalized', 'created_by', 'created_at')
+    item_fields = ('id', 'product', 'quantity', 'unit_price', 'subtotal')
+
+    @property
+    def data(self):
+        sales = super().data
+        # All items in one query instead of one per sale
+        items_by_sale = defaultdict(list)
+        items = SaleItem.objects.filter(sale_id__in=self.queryset.values('id')).order_by('id')
+        money = decimal_fields(SaleItem, self.item_fields)
+        for item in items.values('sale', *self.item_fields):
+            items_by_sale[item.pop('sale')].append(coerce_decimals(item, money))
+        for sale in sales:
+            sale['items'] = items_by_sale.get(sale['id'], [])
+        return sales
@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate
+from .models import Category, Notification, Product, Sale, StoreSettings
+
+
+def invalidate_analytics():
+    """Mark cached analytics and the product catalogue stale once the current transaction commits"""
+    transaction.on_commit(lambda: (invalidate('analytics'), invalidate('catalog')))
+
+
+def invalidate_catalog():
+    """Mark the cached category/product lists stale once the current transaction commits"""
+    transaction.on_commit(lambda: invalidate('catalog'))
+
+
+def invalidate_settings():
+    """Mark the cached store settings stale once the current transaction commits"""
+    transaction.on_commit(lambda: invalidate('settings'))
+
+
+def invalidate_notifications():
+    """Drop cached unread counts once the current transaction commits"""
+    transaction.on_commit(lambda: invalidate('notifications'))
+
+
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def sales_or_stock_changed(sender, **kwargs):
+    invalidate_analytics()
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def notifications_changed(sender, **kwargs):
+    invalidate_notifications()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def categories_changed(sender, **kwargs):
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=StoreSettings)
+def settings_changed(sender, **kwargs):
+    invalidate_settings()
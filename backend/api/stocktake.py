@@ -0,0 +1,163 @@
+"""
+Stock-take (physical inventory count) sessions.
+
+Counts are uploaded in bulk into an open StockTake and upserted with one
+INSERT per batch. Variance against ``Product.stock`` is a single joined
+query, and committing sets every counted product's stock with one
+set-based UPDATE plus one INSERT of adjustment movements into the ledger.
+"""
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import inventory
+from .bulk_import import CHUNK_SIZE, _chunks, _integer, normalize_sku
+from .models import Product, StockTake, StockTakeCount
+from .signals import invalidate_analytics
+
+
+def _resolve_products(ids, skus):
+    """Map requested ids and SKUs to existing product ids in (at most) two queries"""
+    found_ids = set(Product.objects.filter(id__in=ids).values_list('id', flat=True)) if ids else set()
+    by_sku = dict(Product.objects.filter(sku__in=skus).values_list('sku', 'id')) if skus else {}
+    return found_ids, by_sku
+
+
+def add_counts(stock_take, rows):
+    """
+    Upsert counted quantities into an open stock take.
+
+    ``rows`` are dicts with ``id`` or ``sku`` and ``counted``; recounting a
+    product replaces its earlier count. Returns (saved_count, errors).
+    """
+    errors = []
+    parsed = []
+    for index, row in enumerate(rows, start=1):
+        row_errors = {}
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'errors': {'non_field_errors': 'Each count must be an object.'}})
+            continue
+        product_id = _integer(row.get('id'), 'id', row_errors) if row.get('id') not in (None, '') else None
+        sku = normalize_sku(row['sku']) if product_id is None and row.get('sku') else None
+        if product_id is None and not sku and 'id' not in row_errors:
+            row_errors['non_field_errors'] = 'id or sku is required.'
+        counted = _integer(row.get('counted'), 'counted', row_errors)
+        if counted is None and 'counted' not in row_errors:
+            row_errors['counted'] = 'This field is required.'
+        elif counted is not None and counted < 0:
+            row_errors['counted'] = 'Ensure this value is greater than or equal to 0.'
+        if row_errors:
+            errors.append({'row': index, 'id': row.get('id'), 'sku': row.get('sku'), 'errors': row_errors})
+            continue
+        parsed.append((index, product_id, sku, counted))
+
+    found_ids, by_sku = _resolve_products(
+        [pid for _, pid, _, _ in parsed if pid is not None],
+        [sku for _, pid, sku, _ in parsed if pid is None],
+    )
+    now = timezone.now()
+    counts = {}
+    for index, requested_id, sku, counted in parsed:
+        product_id = requested_id if requested_id in found_ids else by_sku.get(sku)
+        if product_id is None:
+            errors.append({'row': index, 'id': requested_id, 'sku': sku, 'errors': {'non_field_errors': 'Product not found.'}})
+            continue
+        # Later rows for the same product win
+        counts[product_id] = StockTakeCount(stock_take=stock_take, product_id=product_id, counted=counted, counted_at=now)
+
+    with transaction.atomic():
+        for chunk in _chunks(counts.values(), CHUNK_SIZE):
+            StockTakeCount.objects.bulk_create(
+                chunk,
+                update_conflicts=True,
+                unique_fields=['stock_take', 'product'],
+                update_fields=['counted', 'counted_at'],
+            )
+    return len(counts), errors
+
+
+def variance_rows(stock_take, only_variances=False):
+    """Counted vs. system stock per product, computed in one joined query"""
+    expected = F('product__stock') if stock_take.status == 'open' else F('expected')
+    rows = StockTakeCount.objects.filter(stock_take=stock_take).annotate(
+        system=expected,
+        variance=F('counted') - expected,
+    )
+    rows = rows.annotate(variance_value=ExpressionWrapper(
+        F('variance') * Coalesce('product__cost', 'product__price'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    ))
+    if only_variances:
+        rows = rows.exclude(variance=0)
+    return rows.order_by('product__name').values(
+        'product', 'product__name', 'product__sku', 'counted', 'system', 'variance', 'variance_value'
+    )
+
+
+def variance_report(stock_take, only_variances=False):
+    lines = [
+        {
+            'product_id': row['product'],
+            'name': row['product__name'],
+            'sku': row['product__sku'],
+            'counted': row['counted'],
+            'expected': row['system'],
+            'variance': row['variance'],
+            # Valued at cost (price when no cost is recorded)
+            'variance_value': row['variance_value'],
+        }
+        for row in variance_rows(stock_take, only_variances)
+    ]
+    return {
+        'products_counted': stock_take.counts.count() if only_variances else len(lines),
+        'products_with_variance': sum(1 for line in lines if line['variance']),
+        'units_over': sum(line['variance'] for line in lines if line['variance'] > 0),
+        'units_short': -sum(line['variance'] for line in lines if line['variance'] < 0),
+        'net_value': sum((line['variance_value'] or 0) for line in lines),
+        'lines': lines,
+    }
+
+
+def commit_stock_take(stock_take, user=None):
+    """
+    Set every counted product's stock to its count and close the session.
+
+    Stock that moved since the count (e.g. sales) is overwritten: the count
+    is the truth at commit time. Returns the number of products adjusted.
+    """
+    with transaction.atomic():
+        stock_take = StockTake.objects.select_for_update().get(pk=stock_take.pk)
+        if stock_take.status != 'open':
+            raise ValueError(f'Stock take is already {stock_take.status}')
+
+        counts = StockTakeCount.objects.filter(stock_take=stock_take)
+        current = dict(
+            Product.objects.select_for_update().filter(pk__in=counts.values('product')).values_list('id', 'stock')
+        )
+        # Record the system quantity each count was reconciled against
+        counts.update(expected=Subquery(Product.objects.filter(pk=OuterRef('product')).values('stock')[:1]))
+
+        now = timezone.now()
+        note = f'Stock take #{stock_take.pk}'
+        movements = [
+            inventory.movement(product_id, 'adjustment', counted - current[product_id], user=user, note=note, created_at=now)
+            for product_id, counted in counts.values_list('product', 'counted')
+            if product_id in current
+        ]
+        changed = [m.product_id for m in movements if m.quantity]
+        if changed:
+            Product.objects.filter(pk__in=changed).update(
+                stock=Subquery(counts.filter(product=OuterRef('pk')).values('counted')[:1]),
+                updated_at=now,
+            )
+        inventory.record_movements(movements)
+
+        stock_take.status = 'committed'
+        stock_take.committed_by = user if user is not None and user.is_authenticated else None
+        stock_take.committed_at = now
+        stock_take.save(update_fields=['status', 'committed_by', 'committed_at'])
+
+    if changed:
+        invalidate_analytics()
+    return len(changed)
@@ -1,6 +1,52 @@
-from django.test import TestCase
-from .models import Product
-from .serializers import ProductSerializer
+import gzip
+import importlib
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APITestCase
+from . import associations, classification, compression, forecasting, health, jobs, receipts, throttling, urls
+from .bulk_import import bulk_update_products, import_products, iter_json
+from .cache import acached_payload, cached_payload, invalidate
+from .db_router import ReplicaRouter, use_replica
+from .inventory import stock_as_of, take_snapshots
+from .stocktake import variance_rows
+from .utils import normalize_phone
+from .models import (
+	Category, Notification, Product, ProductAssociation, Sale, SaleItem, StockMovement, StockSnapshot, StockTake, StockTakeCount,
+	StoreSettings, UserProfile, ZReport,
+)
+from .reports import get_or_generate_zreport
+from .retention import compact_low_stock
+from .partitions import (
+	add_months, create_month_partition, is_partitioned, list_partitions, month_range, parse_partition_name, partition_name,
+)
+from .serializers import ProductSerializer, SaleSerializer
 
 
 class ProductModelTests(TestCase):
@@ -20,3 +66,1361 @@ class ProductSerializerTests(TestCase):
 		serializer = ProductSerializer(data=data)
 		self.assertFalse(serializer.is_valid())
 		self.assertIn('non_field_errors', serializer.errors)
+
+
+class SalePartitionTests(TestCase):
+	def test_month_helpers(self):
+		self.assertEqual(add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+		self.assertEqual(add_months(date(2025, 1, 1), -1), date(2024, 12, 1))
+		months = list(month_range(date(2025, 11, 20), date(2026, 1, 5)))
+		self.assertEqual(months, [date(2025, 11, 1), date(2025, 12, 1), date(2026, 1, 1)])
+		name = partition_name('api_saleitem', date(2026, 1, 1))
+		self.assertEqual(name, 'api_saleitem_p2026_01')
+		self.assertEqual(parse_partition_name(name), ('api_saleitem', date(2026, 1, 1)))
+		self.assertIsNone(parse_partition_name('api_sale_default'))
+
+	def test_sale_items_share_sale_partition_key(self):
+		product = Product.objects.create(name='Wipes', sku='WIPES', price='5.00', stock=4)
+		serializer = SaleSerializer(data={
+			'receipt_number': 'R-1',
+			'total_amount': '10.00',
+			'payment_method': 'cash',
+			'items': [{'product': product.id, 'quantity': 2, 'unit_price': '5.00'}],
+		})
+		self.assertTrue(serializer.is_valid(), serializer.errors)
+		sale = serializer.save()
+		item = sale.items.get()
+		self.assertEqual(item.created_at, sale.created_at)
+
+	def test_duplicate_receipt_number_is_rejected_by_the_database(self):
+		product = Product.objects.create(name='Wipes', sku='WIPES', price='5.00', stock=4)
+		data = {'receipt_number': 'R-1', 'total_amount': '5.00', 'items': [{'product': product.id, 'quantity': 1, 'unit_price': '5.00'}]}
+		first, second = SaleSerializer(data=data), SaleSerializer(data=data)
+		# Both validate before either is saved, as two concurrent checkouts would
+		self.assertTrue(first.is_valid() and second.is_valid())
+		first.save()
+		with self.assertRaises(ValidationError):
+			second.save()
+		self.assertEqual(Sale.objects.filter(receipt_number='R-1').count(), 1)
+		self.assertEqual(Product.objects.get(pk=product.pk).stock, 3)
+
+	def test_stray_default_rows_move_into_new_partition(self):
+		if not is_partitioned():
+			self.skipTest('needs the partitioned PostgreSQL tables')
+		month = date(2099, 1, 1)
+		sale = Sale.objects.create(receipt_number='R-STRAY', total_amount='5.00')
+		Sale.objects.filter(pk=sale.pk).update(created_at=datetime(2099, 1, 15, tzinfo=dt_timezone.utc))
+		self.assertTrue(create_month_partition('api_sale', month))
+		self.assertIn(partition_name('api_sale', month), list_partitions('api_sale'))
+		self.assertEqual(Sale.objects.filter(receipt_number='R-STRAY').count(), 1)
+		with connection.cursor() as cursor:
+			cursor.execute("SELECT COUNT(*) FROM api_sale_receipt WHERE receipt_number = 'R-STRAY'")
+			self.assertEqual(cursor.fetchone()[0], 1)
+
+	def test_command_requires_partitioned_table(self):
+		if connection.vendor == 'postgresql':
+			self.skipTest('partitioned on PostgreSQL')
+		with self.assertRaises(CommandError):
+			call_command('sale_partitions')
+
+
+class CachedPayloadTests(TestCase):
+	def setUp(self):
+		cache.clear()
+
+	def test_concurrent_misses_compute_once(self):
+		calls = []
+
+		def compute():
+			calls.append(1)
+			time.sleep(0.2)
+			return {'value': 42}
+
+		results = []
+		threads = [
+			threading.Thread(target=lambda: results.append(cached_payload('test', 'key', compute)))
+			for _ in range(5)
+		]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(len(calls), 1)
+		self.assertEqual(results, [{'value': 42}] * 5)
+
+	def test_invalidated_entry_is_served_stale_and_refreshed(self):
+		cached_payload('test', 'key', lambda: 'old')
+		with self.captureOnCommitCallbacks(execute=True):
+			Sale.objects.create(receipt_number='R-1', total_amount='1.00')
+		with mock.patch('api.cache._refresh_in_background') as refresh:
+			self.assertEqual(cached_payload('test', 'key', lambda: 'new'), 'old')
+		# analytics namespace was invalidated, 'test' was not
+		refresh.assert_not_called()
+
+		invalidate('test')
+		with mock.patch('api.cache._refresh_in_background') as refresh:
+			self.assertEqual(cached_payload('test', 'key', lambda: 'new'), 'old')
+		refresh.assert_called_once()
+
+	def test_async_refresh_survives_async_to_sync(self):
+		cached_payload('test', 'key', lambda: 'old')
+		invalidate('test')
+
+		async def acompute():
+			return 'new'
+
+		# As under WSGI: the loop is closed once the call returns
+		self.assertEqual(async_to_sync(acached_payload)('test', 'key', acompute), 'old')
+		deadline = time.time() + 5
+		while cache.get('payload:test:key')['value'] != 'new' and time.time() < deadline:
+			time.sleep(0.05)
+		self.assertEqual(cache.get('payload:test:key')['value'], 'new')
+
+
+class AnalyticsViewTests(APITestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_authenticate(self.user)
+
+	def test_payload_is_cached_per_range(self):
+		with mock.patch('api.views.build_analytics_payload', return_value={'daily_sales': []}) as build:
+			self.client.get('/api/analytics/')
+			self.client.get('/api/analytics/')
+			self.assertEqual(build.call_count, 1)
+			self.client.get('/api/analytics/', {'start': '2025-01-01', 'end': '2025-01-31'})
+			self.assertEqual(build.call_count, 2)
+
+	def test_daily_sales_cover_requested_range(self):
+		response = self.client.get('/api/analytics/', {'start': '2025-01-01', 'end': '2025-01-10'})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(len(response.data['daily_sales']), 10)
+
+	def test_invalid_range(self):
+		response = self.client.get('/api/analytics/', {'start': '2025-02-01', 'end': '2025-01-01'})
+		self.assertEqual(response.status_code, 400)
+
+	def test_heatmap_buckets_by_store_local_time(self):
+		StoreSettings.objects.create(id=1, time_zone='America/New_York')
+		for receipt, when, amount in (
+			('R-1', datetime(2024, 1, 6, 2, 30, tzinfo=dt_timezone.utc), '10.00'),  # Fri 21:30 in New York
+			('R-2', datetime(2024, 1, 6, 2, 45, tzinfo=dt_timezone.utc), '5.00'),
+			('R-3', datetime(2024, 1, 6, 15, 0, tzinfo=dt_timezone.utc), '7.00'),  # Sat 10:00, outside the range
+		):
+			sale = Sale.objects.create(receipt_number=receipt, total_amount=amount)
+			Sale.objects.filter(pk=sale.pk).update(created_at=when)
+		response = self.client.get('/api/analytics/heatmap/', {'start': '2024-01-01', 'end': '2024-01-05'})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['time_zone'], 'America/New_York')
+		self.assertEqual(response.data['orders'][4][21], 2)
+		self.assertEqual(response.data['revenue'][4][21], 15.0)
+		self.assertEqual(sum(map(sum, response.data['orders'])), 2)
+		self.assertEqual(response.data['busiest'], {'weekday': 'Fri', 'hour': 21, 'orders': 2})
+		self.assertEqual(self.client.post('/api/settings/', {'time_zone': 'Mars/Olympus'}, format='json').status_code, 400)
+
+
+class AsyncViewTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user('cashier', 'cashier@example.com', 'pass')
+		UserProfile.objects.create(user=self.user, role='cashier')
+		self.token = Token.objects.create(user=self.user)
+
+	async def test_products_match_sync_endpoint(self):
+		await Product.objects.acreate(name='Bottle', sku='BOT', price='20.00', stock=5)
+		response = await self.async_client.get('/api/async/products/', headers={'Authorization': f'Token {self.token.key}'})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.json()[0]['sku'], 'BOT')
+		self.assertEqual(response.json()[0]['price'], '20.00')
+
+	async def test_requires_token(self):
+		response = await self.async_client.get('/api/async/settings/')
+		self.assertEqual(response.status_code, 401)
+
+	async def test_analytics_requires_permission(self):
+		response = await self.async_client.get('/api/async/analytics/', headers={'Authorization': f'Token {self.token.key}'})
+		self.assertEqual(response.status_code, 403)
+
+	def test_async_analytics_matches_sync_payload(self):
+		admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		token = Token.objects.create(user=admin)
+		Sale.objects.create(receipt_number='R-1', total_amount='12.00', payment_method='cash')
+		async_payload = self.client.get('/api/async/analytics/', HTTP_AUTHORIZATION=f'Token {token.key}').json()
+		cache.clear()
+		sync_payload = self.client.get('/api/analytics/', HTTP_AUTHORIZATION=f'Token {token.key}').json()
+		self.assertEqual(async_payload, sync_payload)
+		self.assertEqual(async_payload['statistics']['total_orders'], 1)
+
+	def test_bootstrap_batches_startup_calls(self):
+		Product.objects.create(name='Bottle', sku='BOT', price='20.00', stock=5)
+		Category.objects.create(name='Feeding')
+		Notification.objects.create(type='low_stock', title='Low BOT', message='Low', user=self.user)
+		auth = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+		response = self.client.get('/api/bootstrap/', **auth)
+		self.assertEqual(response.status_code, 200)
+		payload = response.json()
+		# Cashiers cannot see analytics
+		self.assertEqual(list(payload), ['user', 'settings', 'notifications', 'categories', 'products'])
+		self.assertEqual(payload['user']['permissions'], self.client.get('/api/users/permissions/', **auth).json()['permissions'])
+		self.assertEqual(payload['products'], self.client.get('/api/products/', **auth).json())
+		self.assertEqual(payload['notifications']['unread_count'], 1)
+		self.assertEqual(payload['categories'][0]['name'], 'Feeding')
+
+		# Every section is served from cache; only the token is looked up
+		with self.assertNumQueries(1):
+			cached = self.client.get('/api/bootstrap/', **auth).json()
+		self.assertEqual(cached, payload)
+
+		response = self.client.get('/api/bootstrap/', {'sections': 'settings,analytics'}, **auth)
+		self.assertEqual(list(response.json()), ['settings'])
+		self.assertEqual(self.client.get('/api/bootstrap/', {'sections': 'everything'}, **auth).status_code, 400)
+
+
+class ListSerializationTests(APITestCase):
+	def setUp(self):
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_authenticate(self.user)
+		self.product = Product.objects.create(name='Formula', sku='FORM', price='45.50', cost='30.00', stock=10)
+
+	def test_product_list_matches_model_serializer_fields(self):
+		response = self.client.get('/api/products/')
+		self.assertEqual(response.status_code, 200)
+		row = response.json()[0]
+		detail = ProductSerializer(self.product).data
+		self.assertEqual(set(row), set(detail))
+		self.assertEqual((row['price'], row['cost'], row['created_at']), (detail['price'], detail['cost'], detail['created_at']))
+		self.assertEqual(row['price'], '45.50')
+		self.assertTrue(row['created_at'].endswith('Z'))
+
+	def test_sale_list_loads_items_in_one_query(self):
+		for n in range(3):
+			sale = Sale.objects.create(receipt_number=f'R-{n}', total_amount='45.50')
+			SaleItem.objects.create(sale=sale, product=self.product, quantity=1, unit_price='45.50', subtotal='45.50')
+		# sales + items
+		with self.assertNumQueries(2):
+			response = self.client.get('/api/sales/')
+		self.assertEqual(len(response.json()), 3)
+		self.assertEqual(response.json()[0]['items'][0]['product'], self.product.id)
+
+	def test_msgpack_negotiation(self):
+		try:
+			import msgpack
+		except ImportError:
+			self.skipTest('msgpack not installed')
+		response = self.client.get('/api/products/', HTTP_ACCEPT='application/msgpack')
+		self.assertEqual(response['Content-Type'], 'application/msgpack')
+		self.assertEqual(msgpack.unpackb(response.content)[0]['sku'], 'FORM')
+
+
+class ConditionalResponseTests(APITestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_authenticate(self.user)
+		for n in range(20):
+			Product.objects.create(name=f'Baby wipes {n}', sku=f'WIPE-{n}', price='12.00', stock=10)
+
+	def test_choose_encoding(self):
+		self.assertEqual(compression.choose_encoding('gzip, deflate'), 'gzip')
+		self.assertIsNone(compression.choose_encoding('gzip;q=0, deflate'))
+		self.assertIsNone(compression.choose_encoding(''))
+
+	@override_settings(COMPRESSION_MIN_SIZE=512)
+	def test_large_responses_are_gzipped(self):
+		response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+		self.assertEqual(response['Content-Encoding'], 'gzip')
+		self.assertIn('Accept-Encoding', response['Vary'])
+		self.assertEqual(len(json.loads(gzip.decompress(response.content))), 20)
+		self.assertTrue(response['ETag'].startswith('W/'))
+
+		response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip;q=0')
+		self.assertFalse(response.has_header('Content-Encoding'))
+
+	@override_settings(COMPRESSION_MIN_SIZE=1 << 20)
+	def test_small_responses_are_sent_as_is(self):
+		response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+		self.assertFalse(response.has_header('Content-Encoding'))
+		self.assertEqual(len(response.json()), 20)
+
+	def test_product_list_not_modified_until_catalog_changes(self):
+		etag = self.client.get('/api/products/')['ETag']
+		# 304 comes from the cache generation, before any query
+		with self.assertNumQueries(0):
+			response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 304)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Product.objects.filter(sku='WIPE-0').first().save()
+		response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertNotEqual(response['ETag'], etag)
+
+	def test_analytics_etag_follows_cached_payload(self):
+		self.client.get('/api/analytics/')
+		etag = self.client.get('/api/analytics/')['ETag']
+		self.assertEqual(self.client.get('/api/analytics/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		# Not cached yet: no version to compare against
+		cache.clear()
+		response = self.client.get('/api/analytics/', HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertFalse(response.has_header('ETag'))
+
+
+class ThrottlingTests(APITestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_authenticate(self.user)
+
+	def test_bucket_per_endpoint_class(self):
+		buckets = {**settings.THROTTLE_BUCKETS, 'reports': {'burst': 2, 'rate': 0.01, 'priority': 'low'}}
+		with override_settings(THROTTLE_BUCKETS=buckets):
+			self.assertEqual(self.client.get('/api/analytics/').status_code, 200)
+			self.assertEqual(self.client.get('/api/reports/abc/').status_code, 200)
+			response = self.client.get('/api/analytics/')
+			self.assertEqual(response.status_code, 429)
+			self.assertGreater(int(response['Retry-After']), 0)
+			# Other classes have their own buckets
+			self.assertEqual(self.client.get('/api/products/').status_code, 200)
+
+	def test_async_views_share_the_buckets(self):
+		token = Token.objects.create(user=self.user)
+		buckets = {**settings.THROTTLE_BUCKETS, 'reports': {'burst': 2, 'rate': 0.01, 'priority': 'low'}}
+		with override_settings(THROTTLE_BUCKETS=buckets):
+			self.assertEqual(self.client.get('/api/analytics/').status_code, 200)
+			self.assertEqual(self.client.get('/api/async/analytics/', HTTP_AUTHORIZATION=f'Token {token.key}').status_code, 200)
+			response = self.client.get('/api/async/analytics/', HTTP_AUTHORIZATION=f'Token {token.key}')
+			self.assertEqual(response.status_code, 429)
+			self.assertGreater(int(response['Retry-After']), 0)
+			self.assertEqual(self.client.get('/api/bootstrap/', HTTP_AUTHORIZATION=f'Token {token.key}').status_code, 200)
+
+	def test_low_priority_shed_before_checkout(self):
+		with mock.patch.object(throttling, '_in_flight', settings.LOAD_SHED_LOW_AT + 1):
+			response = self.client.get('/api/analytics/')
+			self.assertEqual(response.status_code, 503)
+			self.assertIn('Retry-After', response)
+			self.assertEqual(self.client.get('/api/products/').status_code, 200)
+		with mock.patch.object(throttling, '_in_flight', settings.LOAD_SHED_NORMAL_AT + 1):
+			self.assertEqual(self.client.get('/api/products/').status_code, 503)
+			self.assertNotEqual(self.client.post('/api/sales/', {}, format='json').status_code, 503)
+			self.assertEqual(self.client.get('/api/health/live').status_code, 200)
+			self.assertNotIn(b'busy', self.client.get('/api/health/ready').content)
+		self.assertEqual(throttling.in_flight(), 0)
+
+
+class LoginTests(APITestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user('ama', 'Ama.Mensah@example.com', 'pass')
+		UserProfile.objects.create(user=self.user, role='cashier')
+
+	def login(self, email, password='pass'):
+		return self.client.post('/api/auth/login/', {'email': email, 'password': password}, format='json')
+
+	def test_email_is_case_insensitive_and_loads_in_one_query(self):
+		token = Token.objects.create(user=self.user)
+		# user + profile + token
+		with self.assertNumQueries(1):
+			response = self.login(' ama.mensah@EXAMPLE.com')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['token'], token.key)
+		self.assertEqual(response.data['user']['role'], 'cashier')
+
+	def test_creates_missing_token_and_rejects_bad_credentials(self):
+		response = self.login('ama.mensah@example.com')
+		self.assertEqual(response.data['token'], Token.objects.get(user=self.user).key)
+		self.assertEqual(self.login('ama.mensah@example.com', 'wrong').status_code, 401)
+		self.assertEqual(self.login('nobody@example.com').status_code, 401)
+		self.user.is_active = False
+		self.user.save()
+		self.assertEqual(self.login('ama.mensah@example.com').status_code, 401)
+
+
+class ReceiptTests(APITestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass', first_name='Efua', last_name='Owusu')
+		self.client.force_authenticate(self.user)
+		StoreSettings.objects.create(id=1, store_name='Hafshat Kidz', tax_rate='12.5', receipt_footer='Thank you!')
+		product = Product.objects.create(name='Baby (newborn) diapers', sku='DIAP', price='56.25')
+		self.sale = Sale.objects.create(receipt_number='R-100', total_amount='112.50', payment_method='momo', created_by=self.user)
+		SaleItem.objects.create(sale=self.sale, product=product, quantity=2, unit_price='56.25', subtotal='112.50', created_at=self.sale.created_at)
+		self.url = f'/api/sales/{self.sale.pk}/receipt/'
+
+	def test_formats(self):
+		response = self.client.get(self.url)
+		self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+		html = response.content.decode()
+		self.assertIn('Baby (newborn) diapers', html)
+		self.assertIn('Tax incl. (12.5%):</span><span>12.50', html)
+		self.assertIn('Cashier: Efua Owusu', html)
+
+		pdf = self.client.get(self.url, {'format': 'pdf'})
+		self.assertEqual(pdf['Content-Type'], 'application/pdf')
+		self.assertTrue(pdf.content.startswith(b'%PDF-1.4') and pdf.content.rstrip().endswith(b'%%EOF'))
+		self.assertIn(b'(Baby \\(newborn\\) diapers)', pdf.content)
+		# xref offsets point at the objects
+		xref = int(pdf.content.rsplit(b'startxref\n', 1)[1].split()[0])
+		first = int(pdf.content[xref:].split(b'\n')[3].split()[0])
+		self.assertTrue(pdf.content[first:].startswith(b'1 0 obj'))
+
+		escpos = self.client.get(self.url, {'format': 'escpos'}).content
+		self.assertTrue(escpos.startswith(receipts.ESC_INIT) and escpos.endswith(receipts.GS_FEED_CUT))
+		self.assertIn(b'TOTAL' + b' ' * 27 + b'GHS 112.50\n', escpos)
+
+	def test_reprint_is_cached_until_settings_change(self):
+		self.client.get(self.url, {'format': 'escpos'})
+		# Token/session auth aside, a reprint reads nothing from the database
+		with self.assertNumQueries(0):
+			self.assertEqual(self.client.get(self.url, {'format': 'escpos'}).status_code, 200)
+		with self.captureOnCommitCallbacks(execute=True):
+			StoreSettings.objects.filter(id=1).update(receipt_footer='Come again')
+			StoreSettings.get_settings().save()
+		self.assertIn(b'Come again', self.client.get(self.url, {'format': 'escpos'}).content)
+
+	def test_missing_sale_and_unknown_format(self):
+		response = self.client.get('/api/sales/999999/receipt/', {'format': 'pdf'})
+		self.assertEqual(response.status_code, 404)
+		self.assertEqual(response.json(), {'error': 'Sale not found'})
+		self.assertEqual(self.client.get(self.url, {'format': 'docx'}).status_code, 404)
+
+
+class CustomerLookupTests(APITestCase):
+	def setUp(self):
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_authenticate(self.user)
+		self.sales = [
+			Sale.objects.create(receipt_number=f'R-{n}', total_amount=amount, customer_name='Akosua Boateng', customer_phone=phone)
+			for n, (amount, phone) in enumerate((('10.00', '024 123 4567'), ('25.50', '+233 24 123 4567'), ('4.50', '241234567')))
+		]
+		Sale.objects.create(receipt_number='R-other', total_amount='99.00', customer_name='Kofi Boateng', customer_phone='0201112222')
+
+	def test_normalize_phone(self):
+		for value in ('024 123 4567', '0241234567', '241234567', '+233 24 123 4567', '00233241234567', '233-24-123-4567'):
+			self.assertEqual(normalize_phone(value), '+233241234567', value)
+		self.assertEqual(normalize_phone('+44 20 7946 0958'), '+442079460958')
+		for value in (None, '', 'n/a', '12345', '+0241234567'):
+			self.assertIsNone(normalize_phone(value), value)
+		self.assertEqual({sale.customer_phone_normalized for sale in self.sales}, {'+233241234567'})
+
+	def test_search_by_phone_or_name(self):
+		response = self.client.get('/api/customers/', {'q': '0241234567'})
+		self.assertEqual([(row['phone'], row['visits']) for row in response.data['results']], [('+233241234567', 3)])
+		response = self.client.get('/api/customers/', {'q': 'boateng'})
+		self.assertEqual({row['phone'] for row in response.data['results']}, {'+233241234567', '+233201112222'})
+		self.assertEqual(self.client.get('/api/customers/', {'q': 'bo'}).data['results'], [])
+
+	def test_history_pages_and_totals(self):
+		response = self.client.get('/api/customers/0241234567/history/', {'limit': 2})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['totals']['visits'], 3)
+		self.assertEqual(response.data['totals']['total_spent'], Decimal('40.00'))
+		self.assertEqual([row['receipt_number'] for row in response.data['results']], ['R-2', 'R-1'])
+		response = self.client.get('/api/customers/+233241234567/history/', {'limit': 2, 'cursor': response.data['next_cursor']})
+		self.assertEqual([row['receipt_number'] for row in response.data['results']], ['R-0'])
+		self.assertIsNone(response.data['next_cursor'])
+
+		self.assertEqual(self.client.get('/api/customers/0509999999/history/').status_code, 404)
+		self.assertEqual(self.client.get('/api/customers/abc/history/').status_code, 400)
+
+	def test_backfill_migration(self):
+		from django.apps import apps
+		backfill = importlib.import_module('api.migrations.0020_backfill_customer_phone').backfill
+		Sale.objects.update(customer_phone_normalized=None)
+		backfill(apps, None)
+		self.assertEqual(Sale.objects.filter(customer_phone_normalized='+233241234567').count(), 3)
+
+
+class ZReportTests(APITestCase):
+	def setUp(self):
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_authenticate(self.user)
+		self.yesterday = timezone.localdate() - timedelta(days=1)
+		product = Product.objects.create(name='Diapers', sku='DIAP', price='112.50')
+		sale = Sale.objects.create(receipt_number='R-1', total_amount='112.50', payment_method='momo', created_by=self.user)
+		Sale.objects.filter(pk=sale.pk).update(created_at=timezone.now() - timedelta(days=1))
+		sale.refresh_from_db()
+		SaleItem.objects.create(sale=sale, product=product, quantity=1, unit_price='112.50', subtotal='112.50', created_at=sale.created_at)
+
+	def test_report_is_generated_once_and_immutable(self):
+		report = get_or_generate_zreport(self.yesterday)
+		totals = report.data['totals']
+		self.assertEqual(totals['orders'], 1)
+		self.assertEqual(totals['items_sold'], 1)
+		self.assertEqual(totals['tax_collected'], 12.5)
+		self.assertEqual(report.data['cashiers'][0]['username'], 'admin')
+		self.assertEqual(report.data['payment_methods'][0]['name'], 'Momo')
+
+		Sale.objects.create(receipt_number='R-2', total_amount='10.00')
+		Sale.objects.filter(receipt_number='R-2').update(created_at=timezone.now() - timedelta(days=1))
+		with self.assertNumQueries(1):
+			again = get_or_generate_zreport(self.yesterday)
+		self.assertEqual(again.data['totals']['orders'], 1)
+		with self.assertRaises(ValueError):
+			again.save()
+
+	def test_open_day_cannot_be_closed(self):
+		response = self.client.get(f'/api/reports/z/{timezone.localdate().isoformat()}/')
+		self.assertEqual(response.status_code, 400)
+
+	def test_days_before_first_sale_are_not_stored(self):
+		for day in (date(1990, 1, 1), self.yesterday - timedelta(days=1)):
+			response = self.client.get(f'/api/reports/z/{day.isoformat()}/')
+			self.assertEqual(response.status_code, 404)
+		self.assertFalse(ZReport.objects.exists())
+
+	def test_endpoint_and_listing(self):
+		response = self.client.get(f'/api/reports/z/{self.yesterday.isoformat()}/')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.json()['totals']['revenue'], 112.5)
+		listing = self.client.get('/api/reports/z/').json()
+		self.assertEqual(listing[0]['business_date'], self.yesterday.isoformat())
+
+	def test_command_and_scheduled_job(self):
+		call_command('zreport', stdout=StringIO())
+		self.assertTrue(ZReport.objects.filter(business_date=self.yesterday).exists())
+		StoreSettings.objects.update_or_create(id=1, defaults={'daily_sales_report': False})
+		ZReport.objects.all().delete()
+		jobs.daily_zreport()
+		self.assertFalse(ZReport.objects.exists())
+
+
+class HealthTests(TestCase):
+	def setUp(self):
+		health._ready['expires'] = 0
+
+	def test_live_does_not_touch_database(self):
+		with self.assertNumQueries(0):
+			response = self.client.get('/api/health/live')
+		self.assertEqual(response.json(), {'status': 'ok'})
+
+	def test_ready_result_is_cached(self):
+		response = self.client.get('/api/health/ready')
+		self.assertEqual(response.status_code, 200)
+		payload = response.json()
+		self.assertTrue(payload['database']['ok'])
+		self.assertTrue(payload['migrations']['ok'])
+		self.assertTrue(payload['cache']['ok'])
+		with self.assertNumQueries(0):
+			self.assertEqual(self.client.get('/api/health/ready/').status_code, 200)
+
+	def test_ready_does_not_expose_errors(self):
+		with mock.patch.object(health.cache, 'set', side_effect=ConnectionError('redis://admin@10.0.0.5:6379')), \
+				self.assertLogs('api.health', 'ERROR'):
+			payload = self.client.get('/api/health/ready').json()
+		self.assertEqual(payload['cache'], {'ok': False})
+		self.assertNotIn('10.0.0.5', json.dumps(payload))
+
+
+class BulkImportTests(APITestCase):
+	def setUp(self):
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_authenticate(self.user)
+		Product.objects.create(name='Old name', sku='BOT-1', price='10.00', stock=7)
+
+	def test_csv_upload_upserts_and_reports_row_errors(self):
+		csv_file = SimpleUploadedFile('catalogue.csv', (
+			'name,sku,price,cost,stock,category\n'
+			'Feeding bottle, bot-1 ,12.00,8.00,20,Feeding\n'
+			'Wipes,wipes-80,6.50,4.00,100,Hygiene\n'
+			'Bad row,bad sku!,5.00,,1,\n'
+			'Cheap,CHEAP,1.00,2.00,1,\n'
+		).encode())
+		response = self.client.post('/api/products/bulk-import/', {'file': csv_file}, format='multipart')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual((response.data['created'], response.data['updated'], response.data['failed']), (1, 1, 2))
+		self.assertEqual([e['row'] for e in response.data['errors']], [3, 4])
+		bottle = Product.objects.get(sku='BOT-1')
+		self.assertEqual((bottle.name, bottle.stock, bottle.category.name), ('Feeding bottle', 20, 'Feeding'))
+		self.assertEqual(Product.objects.get(sku='WIPES-80').category.name, 'Hygiene')
+
+	def test_json_rows_and_dry_run(self):
+		rows = [{'name': 'Formula', 'sku': 'form-1', 'price': '50'}]
+		response = self.client.post('/api/products/bulk-import/?dry_run=1', rows, format='json')
+		self.assertEqual(response.data['created'], 1)
+		self.assertFalse(Product.objects.filter(sku='FORM-1').exists())
+		self.client.post('/api/products/bulk-import/', {'rows': rows}, format='json')
+		# columns missing from the input keep model defaults
+		self.assertEqual(Product.objects.get(sku='FORM-1').reorder_level, 3)
+
+	def test_blank_cells_keep_existing_values(self):
+		product = Product.objects.get(sku='BOT-1')
+		Product.objects.filter(pk=product.pk).update(cost='4.00', description='Glass')
+		result = import_products([
+			{'name': 'Bottle', 'sku': 'BOT-1', 'price': '11.00', 'cost': '', 'stock': '', 'description': ''},
+			{'name': 'Teether', 'sku': 'TEE-1', 'price': '3.00', 'cost': '', 'stock': '', 'description': ''},
+		])
+		self.assertEqual((result.created, result.updated, result.failed), (1, 1, 0))
+		product.refresh_from_db()
+		self.assertEqual((product.name, product.price, product.stock), ('Bottle', Decimal('11.00'), 7))
+		self.assertEqual((product.cost, product.description), (Decimal('4.00'), 'Glass'))
+		teether = Product.objects.get(sku='TEE-1')
+		self.assertEqual((teether.stock, teether.cost), (0, None))
+		self.assertFalse(StockMovement.objects.exists())
+
+	def test_ndjson_stream(self):
+		stream = BytesIO(b'{"name": "A", "sku": "a", "price": 1}\n\n{"name": "B", "sku": "b", "price": 2}\n')
+		result = import_products(iter_json(stream), chunk_size=1)
+		self.assertEqual((result.processed, result.created), (2, 2))
+
+	def test_bulk_update_only_touches_given_fields(self):
+		response = self.client.post('/api/products/bulk-update/', {'updates': [
+			{'sku': 'bot-1', 'price': '15.00'},
+			{'id': 999, 'stock': 1},
+			{'sku': 'BOT-1'},
+		]}, format='json')
+		self.assertEqual(response.data['updated'], 1)
+		self.assertEqual([e['row'] for e in response.data['errors']], [3, 2])
+		bottle = Product.objects.get(sku='BOT-1')
+		self.assertEqual((bottle.price, bottle.stock), (Decimal('15.00'), 7))
+
+	def test_management_command(self):
+		with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as fh:
+			fh.write('name,sku,price\nBib,BIB-1,3.00\n')
+		self.addCleanup(os.remove, fh.name)
+		out = StringIO()
+		call_command('import_products', fh.name, stdout=out)
+		self.assertIn('1 created', out.getvalue())
+		self.assertTrue(Product.objects.filter(sku='BIB-1').exists())
+
+
+class StockLedgerTests(APITestCase):
+	def setUp(self):
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_authenticate(self.user)
+		self.bottle = Product.objects.create(name='Bottle', sku='BOT-1', price='10.00', stock=5)
+		self.wipes = Product.objects.create(name='Wipes', sku='WIPES', price='4.00', stock=20)
+
+	def checkout(self, receipt, lines):
+		return self.client.post('/api/sales/', {
+			'receipt_number': receipt,
+			'total_amount': '0.00',
+			'items': [{'product': p.id, 'quantity': q, 'unit_price': str(p.price)} for p, q in lines],
+		}, format='json')
+
+	def test_checkout_writes_ledger_in_bulk(self):
+		with self.assertNumQueries(12):
+			# receipt check + one product lookup per line during validation, then
+			# sale insert, items insert, product lock/read, stock update, ledger insert
+			response = self.checkout('R-1', [(self.bottle, 3), (self.wipes, 2), (self.bottle, 4)])
+		self.assertEqual(response.status_code, 201)
+		self.bottle.refresh_from_db()
+		self.wipes.refresh_from_db()
+		self.assertEqual((self.bottle.stock, self.wipes.stock), (0, 18))
+		# Stock is clamped at zero and the ledger records what was actually taken
+		moves = dict(StockMovement.objects.filter(kind='sale').values_list('product_id', 'quantity'))
+		self.assertEqual(moves, {self.bottle.id: -5, self.wipes.id: -2})
+		self.assertEqual(SaleItem.objects.filter(sale_id=response.data['id']).count(), 3)
+
+	def test_edits_and_bulk_paths_are_recorded(self):
+		self.client.patch(f'/api/products/{self.wipes.id}/', {'stock': 25}, format='json')
+		bulk_update_products([{'sku': 'BOT-1', 'stock': 12, 'kind': 'restock'}, {'sku': 'WIPES', 'price': '5.00'}])
+		import_products([{'name': 'Bibs', 'sku': 'BIB', 'price': '3', 'stock': '8'}, {'name': 'Wipes', 'sku': 'WIPES', 'price': '5', 'stock': '30'}])
+		moves = sorted(StockMovement.objects.values_list('product__sku', 'kind', 'quantity'))
+		self.assertEqual(moves, [
+			('BIB', 'restock', 8), ('BOT-1', 'restock', 7), ('WIPES', 'adjustment', 5), ('WIPES', 'adjustment', 5),
+		])
+		errors = bulk_update_products([{'sku': 'BOT-1', 'stock': 1, 'kind': 'sale'}])[1]
+		self.assertIn('kind', errors[0]['errors'])
+
+	def test_edits_read_locked_stock(self):
+		stale = Product.objects.get(pk=self.wipes.pk)
+		# A checkout moves stock after the edit form was loaded
+		Product.objects.filter(pk=self.wipes.pk).update(stock=15)
+		serializer = ProductSerializer(stale, data={'price': '4.50'}, partial=True)
+		self.assertTrue(serializer.is_valid())
+		serializer.save()
+		serializer = ProductSerializer(stale, data={'stock': 18}, partial=True)
+		self.assertTrue(serializer.is_valid())
+		serializer.save()
+		self.assertEqual(Product.objects.get(pk=self.wipes.pk).stock, 18)
+		self.assertEqual(list(StockMovement.objects.values_list('kind', 'quantity')), [('adjustment', 3)])
+
+	def test_admin_edits_are_recorded(self):
+		self.client.force_login(self.user)
+		category = Category.objects.create(name='Feeding')
+		response = self.client.post(f'/admin/api/product/{self.bottle.id}/change/', {
+			'name': 'Bottle', 'sku': 'BOT-1', 'category': category.id, 'price': '10.00', 'stock': 9, 'reorder_level': 3,
+		})
+		self.assertEqual(response.status_code, 302)
+		self.assertEqual(list(StockMovement.objects.values_list('product__sku', 'kind', 'quantity')), [('BOT-1', 'adjustment', 4)])
+
+	def test_stock_as_of_uses_snapshot_plus_tail(self):
+		start = timezone.now() - timedelta(days=3)
+		take_snapshots(start)
+		StockMovement.objects.create(product=self.wipes, kind='sale', quantity=-4, created_at=start + timedelta(days=1))
+		StockMovement.objects.create(product=self.wipes, kind='restock', quantity=10, created_at=start + timedelta(days=2))
+		# Earlier than the snapshot, so already included in it
+		StockMovement.objects.create(product=self.wipes, kind='sale', quantity=-1, created_at=start - timedelta(days=1))
+
+		def level(when):
+			with self.assertNumQueries(1):
+				return stock_as_of(when).get(pk=self.wipes.pk).stock_as_of
+
+		self.assertEqual(level(start), 20)
+		self.assertEqual(level(start + timedelta(days=1, hours=1)), 16)
+		self.assertEqual(level(start + timedelta(days=2, hours=1)), 26)
+		# Without a snapshot the ledger is replayed from zero
+		self.assertEqual(level(start - timedelta(hours=1)), -1)
+
+	def test_endpoints(self):
+		self.checkout('R-2', [(self.wipes, 2)])
+		response = self.client.get(f'/api/products/{self.wipes.id}/stock/')
+		self.assertEqual((response.data['stock'], response.data['current_stock']), (-2, 18))
+		self.assertEqual(response.data['movements'][0]['quantity'], -2)
+		self.assertEqual(self.client.get('/api/products/999/stock/').status_code, 404)
+
+		call_command('stock_snapshot', stdout=StringIO())
+		response = self.client.get('/api/reports/stock/', {'as_of': timezone.now().isoformat()})
+		self.assertEqual({row['sku']: row['stock'] for row in response.data['products']}, {'BOT-1': 5, 'WIPES': 18})
+		self.assertEqual(self.client.get('/api/reports/stock/').status_code, 400)
+
+		response = self.client.get('/api/reports/stock-movements/')
+		self.assertEqual(response.data['products'][0]['sold'], 2)
+
+	def test_snapshot_job_skips_recent_snapshot(self):
+		jobs.stock_snapshot()
+		jobs.stock_snapshot()
+		self.assertEqual(StockSnapshot.objects.count(), 2)
+
+
+class StockTakeTests(APITestCase):
+	def setUp(self):
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_authenticate(self.user)
+		self.products = Product.objects.bulk_create(
+			Product(name=f'Item {n}', sku=f'ITEM-{n}', price='5.00', cost='3.00', stock=10) for n in range(50)
+		)
+		self.take = self.client.post('/api/stock-takes/', {'note': 'Month end'}, format='json').data
+
+	def test_count_upload_variance_and_commit(self):
+		csv_file = SimpleUploadedFile('counts.csv', (
+			'sku,counted\n' + ''.join(f'item-{n},{10 if n % 10 else 7}\n' for n in range(50)) + 'NOPE,1\nITEM-1,-2\n'
+		).encode())
+		url = f'/api/stock-takes/{self.take["id"]}/'
+		response = self.client.post(url + 'counts/', {'file': csv_file}, format='multipart')
+		self.assertEqual((response.data['saved'], response.data['failed']), (50, 2))
+		# A recount replaces the earlier count
+		self.client.post(url + 'counts/', {'counts': [{'id': self.products[1].id, 'counted': 12}]}, format='json')
+
+		take = StockTake.objects.get(pk=self.take['id'])
+		with self.assertNumQueries(1):
+			lines = list(variance_rows(take, only_variances=True))
+		self.assertEqual(len(lines), 6)
+		response = self.client.get(url, {'only_variances': 1})
+		self.assertEqual((response.data['units_short'], response.data['units_over']), (15, 2))
+		self.assertEqual(response.data['net_value'], Decimal('-39.00'))
+
+		response = self.client.post(url + 'commit/')
+		self.assertEqual((response.data['status'], response.data['adjusted']), ('committed', 6))
+		self.assertEqual(Product.objects.get(sku='ITEM-0').stock, 7)
+		self.assertEqual(Product.objects.get(sku='ITEM-1').stock, 12)
+		self.assertEqual(StockMovement.objects.filter(note=f'Stock take #{self.take["id"]}').count(), 6)
+
+		# Committed sessions report against the stock they were reconciled with
+		self.assertEqual(self.client.get(url).data['products_with_variance'], 6)
+		self.assertEqual(self.client.post(url + 'commit/').status_code, 400)
+		self.assertEqual(self.client.post(url + 'counts/', [], format='json').status_code, 400)
+
+	def test_cancel(self):
+		url = f'/api/stock-takes/{self.take["id"]}/'
+		self.client.post(url + 'counts/', [{'sku': 'ITEM-0', 'counted': 1}], format='json')
+		self.assertEqual(self.client.delete(url).status_code, 204)
+		self.assertEqual(self.client.post(url + 'commit/').status_code, 400)
+		self.assertEqual(Product.objects.get(sku='ITEM-0').stock, 10)
+
+
+class NotificationFeedTests(APITestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user('cashier', 'cashier@example.com', 'pass')
+		UserProfile.objects.create(user=self.user, role='cashier')
+		self.client.force_authenticate(self.user)
+		other = User.objects.create_user('other', 'other@example.com', 'pass')
+		product = Product.objects.create(name='Bottle', sku='BOT', price='10.00')
+		for n in range(25):
+			Notification.objects.create(type='low_stock', title=f'Alert {n}', message='Low', related_product=product)
+		Notification.objects.create(type='system', title='Private', message='Not yours', user=other)
+
+	def test_feed_pages_without_per_row_queries(self):
+		with self.assertNumQueries(1):
+			first = self.client.get('/api/notifications/', {'limit': 10}).data
+		self.assertEqual([n['title'] for n in first['results']][:2], ['Alert 24', 'Alert 23'])
+		self.assertEqual(first['results'][0]['product_name'], 'Bottle')
+		seen = [n['id'] for n in first['results']]
+		cursor = first['next_cursor']
+		while cursor:
+			page = self.client.get('/api/notifications/', {'limit': 10, 'cursor': cursor}).data
+			seen += [n['id'] for n in page['results']]
+			cursor = page['next_cursor']
+		self.assertEqual(len(seen), 25)
+		self.assertEqual(len(set(seen)), 25)
+		self.assertEqual(self.client.get('/api/notifications/', {'cursor': 'junk'}).status_code, 400)
+
+	def test_unread_count_is_cached_and_invalidated(self):
+		self.assertEqual(self.client.get('/api/notifications/unread-count/').data['unread'], 25)
+		with self.assertNumQueries(0):
+			self.assertEqual(self.client.get('/api/notifications/unread-count/').data['unread'], 25)
+
+		ids = list(Notification.objects.filter(user__isnull=True).values_list('id', flat=True)[:3])
+		with self.captureOnCommitCallbacks(execute=True):
+			response = self.client.post('/api/notifications/mark-read/', {'ids': ids}, format='json')
+		self.assertEqual(response.data['updated'], 3)
+		self.assertEqual(self.client.get('/api/notifications/unread-count/').data['unread'], 22)
+		# Single mark-read keeps its old request format
+		with self.captureOnCommitCallbacks(execute=True):
+			self.client.post('/api/notifications/', {'notification_id': ids[-1] - 1}, format='json')
+		self.assertEqual(self.client.get('/api/notifications/unread-count/').data['unread'], 21)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			response = self.client.post('/api/notifications/mark-read/', {'all': True}, format='json')
+		self.assertEqual(response.data['updated'], 21)
+		self.assertEqual(self.client.get('/api/notifications/unread-count/').data['unread'], 0)
+		# Other users' notifications are untouched
+		self.assertFalse(Notification.objects.get(title='Private').is_read)
+
+	def test_async_feed_matches_sync(self):
+		token = Token.objects.create(user=self.user)
+		async_page = self.client.get('/api/async/notifications/', {'limit': 5}, HTTP_AUTHORIZATION=f'Token {token.key}').json()
+		self.assertEqual(async_page, self.client.get('/api/notifications/', {'limit': 5}).json())
+
+
+class NotificationRetentionTests(TestCase):
+	def setUp(self):
+		self.product = Product.objects.create(name='Bottle', sku='BOT', price='10.00', stock=1, reorder_level=3)
+
+	def test_low_stock_check_reraises_instead_of_duplicating(self):
+		user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_login(user)
+		self.client.get('/api/notifications/check-low-stock/')
+		self.client.get('/api/notifications/check-low-stock/')
+		self.assertEqual(Notification.objects.count(), 1)
+		Notification.objects.update(is_read=True)
+		with self.assertNumQueries(6):
+			response = self.client.get('/api/notifications/check-low-stock/').json()
+		self.assertEqual(response['reraised'], 1)
+		notif = Notification.objects.get()
+		self.assertEqual((notif.occurrences, notif.is_read), (2, False))
+
+	def test_prune_command_compacts_and_purges_in_batches(self):
+		old = timezone.now() - timedelta(days=40)
+		for n in range(5):
+			Notification.objects.create(type='low_stock', title='Low', message='Low', related_product=self.product, is_read=n < 4)
+		for n in range(7):
+			Notification.objects.create(type='system', title=f'Old {n}', message='Done', is_read=True)
+		Notification.objects.create(type='system', title='Unread', message='Keep')
+		Notification.objects.filter(type='system').update(created_at=old)
+
+		out = StringIO()
+		call_command('prune_notifications', '--dry-run', stdout=out)
+		self.assertIn('Would remove 4 duplicate', out.getvalue())
+		self.assertEqual(Notification.objects.count(), 13)
+
+		with tempfile.TemporaryDirectory() as archive_dir:
+			out = StringIO()
+			call_command('prune_notifications', '--batch-size', '3', '--archive-dir', archive_dir, stdout=out)
+			self.assertIn('Removed 7 read notifications', out.getvalue())
+			self.assertIn('Archived 11 rows', out.getvalue())
+		alert = Notification.objects.get(type='low_stock')
+		self.assertEqual((alert.occurrences, alert.is_read), (5, False))
+		self.assertEqual(list(Notification.objects.filter(type='system').values_list('title', flat=True)), ['Unread'])
+
+	def test_compact_keeps_most_recently_raised_alert(self):
+		reraised = Notification.objects.create(type='low_stock', title='Low', message='Reraised', related_product=self.product)
+		Notification.objects.create(type='low_stock', title='Low', message='Older', related_product=self.product, is_read=True)
+		Notification.objects.filter(id=reraised.id).update(created_at=timezone.now() + timedelta(minutes=5))
+		self.assertEqual(compact_low_stock(), 1)
+		alert = Notification.objects.get()
+		self.assertEqual((alert.id, alert.occurrences, alert.is_read), (reraised.id, 2, False))
+
+
+class SalesAdminTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_login(self.user)
+		self.product = Product.objects.create(name='Bottle', sku='BOT', price='10.00')
+
+	def add_sales(self, count):
+		for n in range(count):
+			sale = Sale.objects.create(receipt_number=f'R-{Sale.objects.count()}', total_amount='20.00', created_by=self.user)
+			SaleItem.objects.create(sale=sale, product=self.product, quantity=2, unit_price='10.00', subtotal='20.00', created_at=sale.created_at)
+		return sale
+
+	def queries_for(self, url):
+		ContentType.objects.clear_cache()
+		with CaptureQueriesContext(connection) as ctx:
+			self.assertEqual(self.client.get(url).status_code, 200)
+		return len(ctx.captured_queries)
+
+	def test_changelists_do_not_query_per_row(self):
+		sale = self.add_sales(2)
+		small = [self.queries_for(url) for url in ('/admin/api/sale/', '/admin/api/saleitem/', f'/admin/api/sale/{sale.pk}/change/')]
+		sale = self.add_sales(10)
+		for n in range(5):
+			SaleItem.objects.create(sale=sale, product=self.product, quantity=1, unit_price='10.00', subtotal='10.00', created_at=sale.created_at)
+		large = [self.queries_for(url) for url in ('/admin/api/sale/', '/admin/api/saleitem/', f'/admin/api/sale/{sale.pk}/change/')]
+		self.assertEqual(small, large)
+
+
+
+class ReadReplicaTests(APITestCase):
+	"""Routing with a replica alias; 'default' stands in for it so queries still run"""
+
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_authenticate(self.user)
+		self.routed = []
+		original = ReplicaRouter.db_for_read
+
+		def spy(router, model, **hints):
+			alias = original(router, model, **hints)
+			self.routed.append((model, alias))
+			return alias
+
+		patcher = mock.patch.object(ReplicaRouter, 'db_for_read', spy)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def sale_aliases(self):
+		return {alias for model, alias in self.routed if model is Sale}
+
+	def test_no_replica_configured(self):
+		self.client.get('/api/analytics/')
+		self.assertEqual(self.sale_aliases(), {None})
+
+	@override_settings(DATABASE_REPLICA_ALIAS='replica')
+	def test_only_reporting_reads_go_to_replica(self):
+		router = ReplicaRouter()
+		self.assertIsNone(router.db_for_read(Sale))
+		with use_replica():
+			self.assertEqual(router.db_for_read(Sale), 'replica')
+			self.assertEqual(router.db_for_write(Sale), 'default')
+			# Read-your-writes within the block
+			self.assertIsNone(router.db_for_read(Sale))
+		with use_replica():
+			self.assertEqual(router.db_for_read(Sale), 'replica')
+		self.assertFalse(router.allow_migrate('replica', 'api'))
+		self.assertTrue(router.allow_migrate('default', 'api'))
+
+	@override_settings(DATABASE_REPLICA_ALIAS='default')
+	def test_reporting_views_use_replica(self):
+		self.client.get('/api/analytics/')
+		self.assertEqual(self.sale_aliases(), {'default'})
+		self.routed.clear()
+		self.client.get('/api/products/')
+		self.assertFalse(any(alias for model, alias in self.routed))
+
+	@override_settings(DATABASE_REPLICA_ALIAS='default', REPLICA_PIN_SECONDS=60)
+	def test_client_is_pinned_to_primary_after_write(self):
+		response = self.client.post('/api/categories/', {'name': 'Toys'})
+		self.assertEqual(response.status_code, 201)
+		self.client.get('/api/analytics/')
+		self.assertEqual(self.sale_aliases(), {None})
+
+		# Pin expires (cleared here) -> replica again
+		cache.clear()
+		self.routed.clear()
+		self.client.get('/api/analytics/')
+		self.assertEqual(self.sale_aliases(), {'default'})
+
+	@override_settings(DATABASE_REPLICA_ALIAS='default')
+	def test_zreport_is_generated_from_primary(self):
+		Sale.objects.create(receipt_number='R-1', total_amount='10.00')
+		Sale.objects.update(created_at=timezone.now() - timedelta(days=2))
+		self.routed.clear()
+		day = timezone.localdate() - timedelta(days=1)
+		self.assertEqual(self.client.get(f'/api/reports/z/{day.isoformat()}/').status_code, 200)
+		self.assertEqual({alias for model, alias in self.routed if model in (Sale, SaleItem)}, {None})
+
+	@override_settings(DATABASE_REPLICA_ALIAS='default')
+	def test_admin_changelist_uses_replica(self):
+		self.client.force_login(self.user)
+		self.assertEqual(self.client.get('/admin/api/sale/').status_code, 200)
+		self.assertEqual(self.sale_aliases(), {'default'})
+
+
+class ForecastTests(TestCase):
+	def setUp(self):
+		self.today = timezone.localdate()
+		self.steady = Product.objects.create(name='Wipes', sku='WIPES', price='4.00', stock=30)
+		self.weekend = Product.objects.create(name='Bibs', sku='BIBS', price='3.00', stock=10)
+		self.new = Product.objects.create(name='Bottle', sku='BOT', price='10.00', stock=5)
+		Product.objects.exclude(pk=self.new.pk).update(created_at=timezone.now() - timedelta(days=120))
+		Product.objects.filter(pk=self.new.pk).update(created_at=timezone.now() - timedelta(days=5))
+
+	def sell(self, product, day, quantity):
+		when = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=12)
+		sale = Sale.objects.create(receipt_number=f'R-{product.sku}-{day}', total_amount='0.00')
+		Sale.objects.filter(pk=sale.pk).update(created_at=when)
+		SaleItem.objects.create(sale=sale, product=product, quantity=quantity, unit_price='1.00', subtotal='1.00', created_at=when)
+
+	def test_steady_and_seasonal_demand(self):
+		days = 90
+		demand = np.zeros((2, days))
+		demand[0] = 2
+		start = self.today - timedelta(days=days)
+		# Six units every Saturday only
+		demand[1, [n for n in range(days) if (start + timedelta(days=n)).weekday() == 5]] = 6
+		velocity, reorder, cover, observed = forecasting.compute(
+			demand, np.array([0, 0]), np.array([30.0, 10.0]), start.weekday(), 7, 14, 1.645,
+		)
+		self.assertAlmostEqual(velocity[0], 2)
+		# No variance -> no safety stock
+		self.assertEqual(reorder[0], 14)
+		self.assertAlmostEqual(cover[0], 15)
+		# A week of lead time covers one Saturday plus safety stock
+		self.assertGreaterEqual(reorder[1], 6)
+		self.assertEqual(list(observed), [days, days])
+
+	def test_forecast_writes_suggestions(self):
+		for n in range(1, 29):
+			self.sell(self.steady, self.today - timedelta(days=n), 2)
+		self.sell(self.new, self.today - timedelta(days=1), 5)
+		summary = forecasting.forecast(apply=True)
+		self.assertEqual(summary, {'products': 3, 'with_sales': 2, 'suggested': 2, 'applied': True})
+
+		self.steady.refresh_from_db()
+		self.assertGreater(self.steady.daily_demand, 0)
+		self.assertEqual(self.steady.reorder_level, self.steady.suggested_reorder_level)
+		self.assertIsNotNone(self.steady.days_of_cover)
+		self.weekend.refresh_from_db()
+		# Never sold: nothing to cover, reorder at zero
+		self.assertEqual((self.weekend.suggested_reorder_level, self.weekend.days_of_cover), (0, None))
+		self.new.refresh_from_db()
+		# Five days old: too little history to suggest anything, manual level kept
+		self.assertEqual((self.new.suggested_reorder_level, self.new.reorder_level), (None, 3))
+		self.assertIsNotNone(self.new.forecast_at)
+
+
+class ProductAssociationTests(APITestCase):
+	def setUp(self):
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_authenticate(self.user)
+		self.formula, self.bottle, self.wipes, self.diapers, self.bibs = (
+			Product.objects.create(name=name, sku=name.upper(), price='5.00', stock=10)
+			for name in ('Formula', 'Bottle', 'Wipes', 'Diapers', 'Bibs')
+		)
+		self.receipts = 0
+		for _ in range(4):
+			self.basket(self.formula, self.bottle)
+			self.basket(self.diapers, self.wipes)
+		self.basket(self.formula, self.bottle, self.bibs)
+		self.basket(self.diapers)
+		self.basket(self.bibs)
+
+	def basket(self, *products):
+		self.receipts += 1
+		sale = Sale.objects.create(receipt_number=f'R-{self.receipts}', total_amount='0.00')
+		SaleItem.objects.bulk_create(
+			SaleItem(sale=sale, product=product, quantity=1, unit_price='5.00', subtotal='5.00', created_at=sale.created_at)
+			for product in products
+		)
+
+	def neighbours(self):
+		return sorted(ProductAssociation.objects.values_list('product__sku', 'associated__sku', 'rank', 'support'))
+
+	def test_build_keeps_top_neighbours(self):
+		summary = associations.build(min_support=2, now=timezone.now() + timedelta(minutes=1))
+		self.assertEqual((summary['baskets'], summary['associations']), (11, 4))
+		self.assertEqual(self.neighbours(), [
+			('BOTTLE', 'FORMULA', 1, 5), ('DIAPERS', 'WIPES', 1, 4), ('FORMULA', 'BOTTLE', 1, 5), ('WIPES', 'DIAPERS', 1, 4),
+		])
+		wipes = ProductAssociation.objects.get(product=self.wipes)
+		# Every wipes basket had diapers; diapers were in 5 of 11 baskets
+		self.assertEqual(wipes.confidence, 1.0)
+		self.assertAlmostEqual(wipes.lift, 11 / 5, places=3)
+
+	def test_numpy_fallback_matches_scipy(self):
+		now = timezone.now() + timedelta(minutes=1)
+		associations.build(min_support=1, top_k=2, now=now)
+		expected = self.neighbours()
+		with mock.patch.object(associations, 'sparse', None):
+			self.assertEqual(associations.build(min_support=1, top_k=2, now=now)['engine'], 'numpy')
+		self.assertEqual(self.neighbours(), expected)
+
+	def test_suggestions_for_cart(self):
+		associations.build(min_support=1, now=timezone.now() + timedelta(minutes=1))
+		with self.assertNumQueries(1):
+			response = self.client.get('/api/products/suggestions/', {'products': f'{self.formula.id},{self.bibs.id}'})
+		self.assertEqual(response.status_code, 200)
+		skus = [row['sku'] for row in response.data['suggestions']]
+		# Suggested by both cart items; cart items themselves are never suggested
+		self.assertEqual(skus[0], 'BOTTLE')
+		self.assertNotIn('FORMULA', skus)
+
+		Product.objects.filter(pk=self.bottle.pk).update(stock=0)
+		response = self.client.get('/api/products/suggestions/', {'products': str(self.formula.id)})
+		# Out-of-stock bottles are skipped
+		self.assertEqual([row['sku'] for row in response.data['suggestions']], ['BIBS'])
+		self.assertEqual(self.client.get('/api/products/suggestions/', {'products': 'x'}).status_code, 400)
+
+
+class AbcReportTests(APITestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.client.force_authenticate(self.user)
+		self.today = timezone.localdate()
+		products = {
+			sku: Product.objects.create(name=sku.title(), sku=sku, price='10.00', cost=cost, stock=stock)
+			for sku, cost, stock in (('DIAPERS', '6.00', 4), ('WIPES', None, 0), ('BIBS', '1.00', 0), ('FORMULA', '10.00', 5), ('CAP', '2.00', 2))
+		}
+		self.sell(products['DIAPERS'], 1, 80, '800.00')
+		self.sell(products['WIPES'], 3, 15, '150.00')
+		self.sell(products['BIBS'], 2, 5, '50.00')
+		self.sell(products['CAP'], 100, 1, '10.00')
+
+	def sell(self, product, days_ago, quantity, subtotal):
+		when = timezone.now() - timedelta(days=days_ago)
+		sale = Sale.objects.create(receipt_number=f'R-{product.sku}', total_amount=subtotal)
+		Sale.objects.filter(pk=sale.pk).update(created_at=when)
+		SaleItem.objects.create(sale=sale, product=product, quantity=quantity, unit_price='10.00', subtotal=subtotal, created_at=when)
+
+	def test_classes_value_and_slow_movers(self):
+		response = self.client.get('/api/reports/abc/')
+		self.assertEqual(response.status_code, 200)
+		rows = {row['sku']: row for row in response.data['products']}
+		self.assertEqual([row['sku'] for row in response.data['products']][:3], ['DIAPERS', 'WIPES', 'BIBS'])
+		self.assertEqual({sku: row['revenue_class'] for sku, row in rows.items()}, {
+			'DIAPERS': 'A', 'WIPES': 'B', 'BIBS': 'C', 'FORMULA': 'C', 'CAP': 'C',
+		})
+		self.assertEqual((rows['DIAPERS']['margin'], rows['DIAPERS']['stock_value']), (320.0, 24.0))
+		# No cost: no margin, and it drops out of the margin ranking
+		self.assertEqual((rows['WIPES']['margin'], rows['WIPES']['margin_class']), (None, 'C'))
+		self.assertEqual(rows['BIBS']['margin_class'], 'B')
+		# Sold before the 90-day period: counted for recency, not revenue
+		self.assertEqual((rows['CAP']['revenue'], rows['CAP']['days_since_last_sale']), (0, 100))
+		self.assertEqual({sku for sku, row in rows.items() if row['slow_mover']}, {'FORMULA', 'CAP'})
+		self.assertIsNone(rows['FORMULA']['days_since_last_sale'])
+		self.assertEqual(response.data['summary']['slow_mover_stock_value'], 54.0)
+		self.assertEqual(response.data['summary']['A'], {'products': 1, 'revenue': 800.0, 'stock_value': 24.0})
+
+		with self.assertNumQueries(0):
+			cached = self.client.get('/api/reports/abc/', {'slow': '1'})
+		self.assertEqual([row['sku'] for row in cached.data['products']], ['FORMULA', 'CAP'])
+
+	def test_abc_classes(self):
+		classes = classification.abc_classes(np.array([10.0, 0.0, 50.0, np.nan, 40.0]), 0.8, 0.95)
+		self.assertEqual(list(classes), ['B', 'C', 'A', 'C', 'A'])
+
+# Query budgets for every URL in api/urls.py: name -> (method, payload, max queries).
+# QueryBudgetTests requests each endpoint at two data sizes and fails if the
+# count grows with the data or exceeds the budget. New URLs must be added here.
+# Counts include token authentication and any savepoints.
+QUERY_BUDGETS = {
+	'health-live': ('get', None, 0),
+	'health-ready': ('get', None, 3),
+	'profiles': ('get', None, 1),
+	'profile-report': ('get', None, 1),
+	# One query once the token and profile exist (LoginTests); this first sign-in creates both
+	'login': ('post', {'email': 'budget@example.com', 'password': 'pass'}, 6),
+	'logout': ('post', None, 2),
+	'profile': ('get', None, 1),
+	'analytics': ('get', None, 7),
+	'sales-heatmap': ('get', None, 6),
+	'users': ('get', None, 4),
+	'user-permissions': ('get', None, 3),
+	'update-user-role': ('post', {'user_id': 'cashier', 'role': 'super_admin'}, 4),
+	'toggle-user-status': ('post', {'user_id': 'cashier'}, 3),
+	'reset-user-password': ('post', {'user_id': 'cashier', 'new_password': 'new-pass'}, 3),
+	'update-user-profile': ('post', {'user_id': 'cashier', 'first_name': 'Ama'}, 3),
+	'settings': ('get', None, 5),
+	'notifications': ('get', None, 2),
+	'notifications-mark-read': ('post', {'all': True}, 3),
+	'notifications-unread-count': ('get', None, 2),
+	'check-low-stock': ('get', None, 7),
+	'zreports': ('get', None, 2),
+	'zreport-detail': ('get', None, 2),
+	'stock-as-of': ('get', {'as_of': '2030-01-01'}, 2),
+	'stock-movements': ('get', None, 2),
+	'abc-report': ('get', None, 3),
+	'categories': ('get', None, 2),
+	'products': ('get', None, 2),
+	'product-detail': ('get', None, 2),
+	'product-stock': ('get', None, 3),
+	'product-suggestions': ('get', {'products': 'product'}, 2),
+	'product-bulk-import': ('post', {'rows': [{'name': 'Bib', 'sku': 'P-0', 'price': '3'}, {'name': 'Cap', 'sku': 'NEW-1', 'price': '4'}]}, 5),
+	'product-bulk-update': ('post', {'updates': [{'sku': 'P-0', 'stock': 9}, {'sku': 'P-1', 'price': '12'}]}, 7),
+	'product-upload-image': ('post', 'image', 1),
+	'sales': ('get', None, 3),
+	# Sale, items, settings (created here: get_or_create); reprints are cache hits
+	'sale-receipt': ('get', None, 7),
+	'customers': ('get', {'q': 'mensah'}, 2),
+	# Page, its items, totals
+	'customer-history': ('get', None, 4),
+	'stock-takes': ('get', None, 2),
+	'stock-take-detail': ('get', None, 3),
+	'stock-take-counts': ('post', {'counts': [{'sku': 'P-0', 'counted': 4}, {'sku': 'P-1', 'counted': 6}]}, 6),
+	'stock-take-commit': ('post', None, 12),
+	'async-products': ('get', None, 2),
+	'async-notifications': ('get', None, 2),
+	'async-settings': ('get', None, 5),
+	'async-analytics': ('get', None, 7),
+	'bootstrap': ('get', None, 15),
+}
+
+
+class QueryBudgetTests(APITestCase):
+	def setUp(self):
+		self.admin = User.objects.create_superuser('budget', 'budget@example.com', 'pass')
+		self.token = Token.objects.create(user=self.admin)
+		self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+		self.cashier = User.objects.create_user('cashier', 'cashier@example.com', 'pass')
+		UserProfile.objects.create(user=self.cashier, role='cashier')
+		self.seeded = 0
+		self.stock_take = StockTake.objects.create(created_by=self.admin)
+		self.seed(3)
+		self.product = Product.objects.get(sku='P-0')
+		self.sale = Sale.objects.get(receipt_number='S-0')
+		self.zreport = ZReport.objects.create(business_date=date(2024, 1, 1), data={'totals': {}})
+
+	def seed(self, count):
+		"""Add ``count`` of every kind of row the endpoints read"""
+		start, self.seeded = self.seeded, self.seeded + count
+		category = Category.objects.create(name=f'Category {start}')
+		products = Product.objects.bulk_create(
+			Product(name=f'Product {n}', sku=f'P-{n}', price='10.00', cost='6.00', stock=n % 5, category=category)
+			for n in range(start * 3, self.seeded * 3)
+		)
+		users = []
+		for n in range(start, self.seeded):
+			user = User.objects.create_user(f'seed-{n}', f'seed-{n}@example.com', 'pass')
+			if n % 2:
+				# Some users have no profile yet
+				UserProfile.objects.create(user=user, role='cashier')
+			users.append(user)
+		now = timezone.now()
+		sales = Sale.objects.bulk_create(
+			Sale(
+				receipt_number=f'S-{n}', total_amount='20.00', payment_method='Cash', created_by=users[n % count], created_at=now,
+				customer_name='Ama Mensah', customer_phone='024 123 4567', customer_phone_normalized='+233241234567',
+			)
+			for n in range(start * 4, self.seeded * 4)
+		)
+		SaleItem.objects.bulk_create(
+			SaleItem(sale=sale, product=products[(n + k) % len(products)], quantity=1, unit_price='10.00', subtotal='10.00', created_at=sale.created_at)
+			for n, sale in enumerate(sales) for k in range(2)
+		)
+		StockMovement.objects.bulk_create(
+			StockMovement(product=product, kind='sale', quantity=-1, created_at=now) for product in products
+		)
+		StockSnapshot.objects.bulk_create(
+			StockSnapshot(product=product, stock=product.stock, taken_at=now - timedelta(days=1)) for product in products
+		)
+		Notification.objects.bulk_create(
+			Notification(type='low_stock', title=f'Low {product.sku}', message='Low', related_product=product)
+			for product in products
+		)
+		ZReport.objects.bulk_create(
+			ZReport(business_date=date(2023, 1, 1) + timedelta(days=n), data={'totals': {}}) for n in range(start, self.seeded)
+		)
+		StockTakeCount.objects.bulk_create(
+			StockTakeCount(stock_take=self.stock_take, product=product, counted=3) for product in products
+		)
+		first = Product.objects.order_by('id').first()
+		ranked = first.associations.count()
+		ProductAssociation.objects.bulk_create(
+			ProductAssociation(product=first, associated=product, rank=ranked + n, support=3, confidence=0.5, lift=2.0)
+			for n, product in enumerate((product for product in products if product != first), start=1)
+		)
+
+	def url(self, name):
+		kwargs = {}
+		if name in ('product-detail', 'product-stock'):
+			kwargs = {'pk': self.product.pk}
+		elif name == 'sale-receipt':
+			kwargs = {'pk': self.sale.pk}
+		elif name == 'customer-history':
+			kwargs = {'phone': '0241234567'}
+		elif name.startswith('stock-take-'):
+			kwargs = {'pk': self.stock_take.pk}
+		elif name == 'zreport-detail':
+			kwargs = {'business_date': self.zreport.business_date.isoformat()}
+		elif name == 'profile-report':
+			kwargs = {'profile_id': self.profile_id}
+		return reverse(name, kwargs=kwargs)
+
+	def count_queries(self, name):
+		method, payload, _ = QUERY_BUDGETS[name]
+		if isinstance(payload, dict):
+			placeholders = {'cashier': self.cashier.id, 'product': self.product.id}
+			payload = {key: placeholders.get(value, value) if isinstance(value, str) else value for key, value in payload.items()}
+		cache.clear()
+		health._ready['expires'] = health._migrations['expires'] = 0
+		ContentType.objects.clear_cache()
+		with transaction.atomic():
+			with CaptureQueriesContext(connection) as ctx:
+				if payload == 'image':
+					upload = SimpleUploadedFile('p.png', b'\x89PNG', content_type='image/png')
+					response = self.client.post(self.url(name), {'image': upload}, format='multipart')
+				elif method == 'get':
+					response = self.client.get(self.url(name), payload)
+				else:
+					response = self.client.post(self.url(name), payload, format='json')
+			# Writes are rolled back so both data sizes see the same fixtures
+			transaction.set_rollback(True)
+		self.assertLess(response.status_code, 400, f'{name}: {response.content[:200]}')
+		return len(ctx.captured_queries)
+
+	def test_every_url_has_a_budget(self):
+		names = {pattern.name for pattern in urls.urlpatterns}
+		self.assertEqual(names - QUERY_BUDGETS.keys(), set())
+		self.assertEqual(QUERY_BUDGETS.keys() - names, set())
+
+	def test_query_counts_do_not_grow_with_data(self):
+		with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media, PROFILER_DIR=Path(media) / 'profiles'):
+			self.profile_id = self.client.get('/api/health/live?__profile=1')['X-Profile-Id']
+			small = {name: self.count_queries(name) for name in QUERY_BUDGETS}
+			self.seed(12)
+			large = {name: self.count_queries(name) for name in QUERY_BUDGETS}
+		for name, (_, _, budget) in QUERY_BUDGETS.items():
+			with self.subTest(endpoint=name):
+				self.assertEqual(large[name], small[name], 'query count grows with data size')
+				self.assertLessEqual(large[name], budget)
+
+
+class ProfilerTests(APITestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(self.tmp.cleanup)
+		override = self.settings(PROFILER_DIR=Path(self.tmp.name), PROFILER_SAMPLE_INTERVAL=0.0005)
+		override.enable()
+		self.addCleanup(override.disable)
+		self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+		self.admin_token = Token.objects.create(user=self.admin)
+		cashier = User.objects.create_user('cashier', 'cashier@example.com', 'pass')
+		UserProfile.objects.create(user=cashier, role='cashier')
+		self.cashier_token = Token.objects.create(user=cashier)
+		Product.objects.bulk_create(Product(name=f'P{n}', sku=f'P{n}', price='1.00') for n in range(50))
+
+	def test_only_superusers_are_profiled(self):
+		response = self.client.get('/api/products/?__profile=1', HTTP_AUTHORIZATION=f'Token {self.cashier_token.key}')
+		self.assertEqual(response.status_code, 200)
+		self.assertNotIn('X-Profile-Id', response)
+		response = self.client.get('/api/products/', HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+		self.assertNotIn('X-Profile-Id', response)
+		self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+
+	def test_sampled_profile_with_sql(self):
+		self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+		response = self.client.get('/api/users/?__profile=1')
+		self.assertEqual(response.status_code, 200)
+		report = self.client.get(f"/api/profiles/{response['X-Profile-Id']}/").data
+		self.assertEqual((report['mode'], report['path'], report['status']), ('sample', '/api/users/?__profile=1', 200))
+		self.assertEqual(report['sql']['count'], int(response['X-Profile-Queries']))
+		self.assertTrue(any('auth_user' in query['sql'] for query in report['sql']['queries']))
+		download = self.client.get(f"/api/profiles/{report['id']}/", {'download': 1})
+		self.assertTrue(download['Content-Disposition'].endswith('.folded"'))
+		self.assertEqual([row['id'] for row in self.client.get('/api/profiles/').data], [report['id']])
+
+	def test_cprofile_mode_via_header(self):
+		self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+		response = self.client.get('/api/products/', HTTP_X_PROFILE='cprofile')
+		report = self.client.get(f"/api/profiles/{response['X-Profile-Id']}/").data
+		self.assertIn('cumulative', report['top'])
+		stats = pstats.Stats(str(Path(self.tmp.name) / f"{report['id']}.prof"))
+		self.assertGreater(stats.total_calls, 0)
+		self.assertEqual(self.client.get('/api/profiles/../../etc/').status_code, 404)
+		self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.cashier_token.key}')
+		self.assertEqual(self.client.get('/api/profiles/').status_code, 403)
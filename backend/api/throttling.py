@@ -0,0 +1,162 @@
+"""
+Priority-aware throttling.
+
+Every view belongs to an endpoint class (its ``throttle_scope``; a dict maps
+HTTP methods to classes, anything unlisted is ``default``). Each class has a
+token bucket per client in THROTTLE_BUCKETS: ``burst`` requests at once,
+refilled at ``rate`` per second, so a till stuck polling or a manager
+hammering refresh gets 429s without touching the database. Clients are told
+apart by user (every till signs in with its own token), anonymous ones by IP.
+Buckets live in the default cache, so they are shared between workers when
+it is Redis; the read-modify-write is not atomic, which at worst lets a
+request or two through on a race. DRF views are throttled by
+``TokenBucketThrottle``; the async views in async_views.py call
+``atake_token`` themselves, against the same buckets.
+
+``LoadSheddingMiddleware`` counts the requests in flight in this process and,
+while more than LOAD_SHED_LOW_AT are, answers 503 to ``low`` priority classes
+(reports, bulk jobs) before their views run; above LOAD_SHED_NORMAL_AT
+``normal`` ones too. ``critical`` classes - checkout, and the health probes so
+a busy process is not taken out of rotation - are never shed, so they keep
+the database connections. A class without ``burst``/``rate`` is not
+rate-limited.
+"""
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+DEFAULT_SCOPE = 'default'
+
+
+def scope_for(view, method):
+    """Endpoint class of a view (class or function) for an HTTP method"""
+    scope = getattr(view, 'throttle_scope', None) or DEFAULT_SCOPE
+    if isinstance(scope, dict):
+        scope = scope.get(method, DEFAULT_SCOPE)
+    return scope
+
+
+def throttle_scope(scope):
+    """Set the endpoint class of a function view (class views use the attribute)"""
+    def decorator(view):
+        view.throttle_scope = scope
+        return view
+    return decorator
+
+
+def _bucket(scope):
+    bucket = settings.THROTTLE_BUCKETS.get(scope)
+    return bucket if bucket and 'rate' in bucket else None
+
+
+def _spend(bucket, state, now):
+    """Refill ``state`` (tokens, updated) and take a token: (new state or None, seconds to wait)"""
+    burst, rate = bucket['burst'], bucket['rate']
+    tokens, updated = state or (burst, now)
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens < 1:
+        return None, (1 - tokens) / rate
+    return (tokens - 1, now), None
+
+
+def _timeout(bucket):
+    # Kept until the bucket would be full again anyway
+    return int(bucket['burst'] / bucket['rate']) + 1
+
+
+def take_token(scope, client):
+    """Take a token from the client's bucket; returns None, or the seconds to wait when empty"""
+    bucket = _bucket(scope)
+    if not bucket:
+        return None
+    key = f'throttle:{scope}:{client}'
+    state, wait = _spend(bucket, cache.get(key), time.time())
+    if state:
+        cache.set(key, state, _timeout(bucket))
+    return wait
+
+
+async def atake_token(scope, client):
+    """Async ``take_token``, for the views in async_views.py"""
+    bucket = _bucket(scope)
+    if not bucket:
+        return None
+    key = f'throttle:{scope}:{client}'
+    state, wait = _spend(bucket, await cache.aget(key), time.time())
+    if state:
+        await cache.aset(key, state, _timeout(bucket))
+    return wait
+
+
+class TokenBucketThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        user = request.user
+        client = f'user:{user.pk}' if user and user.is_authenticated else f'ip:{self.get_ident(request)}'
+        self.retry_after = take_token(scope_for(view, request.method), client)
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
+
+
+_in_flight = 0
+_lock = threading.Lock()
+
+
+def in_flight():
+    return _in_flight
+
+
+def _enter():
+    global _in_flight
+    with _lock:
+        _in_flight += 1
+
+
+def _leave():
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+
+
+class LoadSheddingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limits = {'low': settings.LOAD_SHED_LOW_AT, 'normal': settings.LOAD_SHED_NORMAL_AT}
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        _enter()
+        try:
+            return self.get_response(request)
+        finally:
+            _leave()
+
+    async def __acall__(self, request):
+        _enter()
+        try:
+            return await self.get_response(request)
+        finally:
+            _leave()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # DRF keeps the view class on the function as_view() returns
+        view = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None) or view_func
+        bucket = settings.THROTTLE_BUCKETS.get(scope_for(view, request.method), {})
+        limit = self.limits.get(bucket.get('priority', 'normal'))
+        if limit is None or _in_flight <= limit:
+            return None
+        response = JsonResponse({'error': 'Server is busy, please retry shortly'}, status=503)
+        response['Retry-After'] = str(settings.LOAD_SHED_RETRY_AFTER)
+        return response
@@ -1,13 +1,27 @@
-from django.urls import path
+from django.urls import path, re_path
+from . import async_views, health
 from .views import (
     CategoryListCreateView, ProductListCreateView, SaleListCreateView, 
     ProductImageUploadView, ProductRetrieveUpdateDestroyView, LoginView, LogoutView, 
     UserProfileView, AnalyticsView, UsersListView, UserPermissionsView, UpdateUserRoleView,
     ToggleUserStatusView, ResetUserPasswordView, UpdateUserProfileView,
-    StoreSettingsView, NotificationsView, CheckLowStockView
+    StoreSettingsView, NotificationsView, CheckLowStockView, ZReportListView, ZReportDetailView,
+    ProductBulkImportView, ProductBulkUpdateView, ProductStockHistoryView, StockAsOfView,
+    StockMovementReportView, StockTakeListCreateView, StockTakeDetailView, StockTakeCountsView,
+    StockTakeCommitView, NotificationMarkReadView, NotificationUnreadCountView, ProfileListView,
+    ProfileDetailView, ProductSuggestionsView, AbcReportView,
+    SalesHeatmapView, SaleReceiptView, CustomerSearchView, CustomerHistoryView
 )
 
 urlpatterns = [
+    # Health probes
+    re_path(r'^health/live/?$', health.live, name='health-live'),
+    re_path(r'^health/ready/?$', health.ready, name='health-ready'),
+    
+    # Request profiles (superusers, see api/profiling.py)
+    path('profiles/', ProfileListView.as_view(), name='profiles'),
+    path('profiles/<str:profile_id>/', ProfileDetailView.as_view(), name='profile-report'),
+    
     # Authentication
     path('auth/login/', LoginView.as_view(), name='login'),
     path('auth/logout/', LogoutView.as_view(), name='logout'),
@@ -15,6 +29,7 @@ urlpatterns = [
     
     # Analytics and Users
     path('analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('analytics/heatmap/', SalesHeatmapView.as_view(), name='sales-heatmap'),
     path('users/', UsersListView.as_view(), name='users'),
     path('users/permissions/', UserPermissionsView.as_view(), name='user-permissions'),
     path('users/update-role/', UpdateUserRoleView.as_view(), name='update-user-role'),
@@ -25,12 +40,41 @@ urlpatterns = [
     # Settings and Notifications
     path('settings/', StoreSettingsView.as_view(), name='settings'),
     path('notifications/', NotificationsView.as_view(), name='notifications'),
+    path('notifications/mark-read/', NotificationMarkReadView.as_view(), name='notifications-mark-read'),
+    path('notifications/unread-count/', NotificationUnreadCountView.as_view(), name='notifications-unread-count'),
     path('notifications/check-low-stock/', CheckLowStockView.as_view(), name='check-low-stock'),
     
+    # Reports
+    path('reports/z/', ZReportListView.as_view(), name='zreports'),
+    path('reports/z/<str:business_date>/', ZReportDetailView.as_view(), name='zreport-detail'),
+    path('reports/stock/', StockAsOfView.as_view(), name='stock-as-of'),
+    path('reports/stock-movements/', StockMovementReportView.as_view(), name='stock-movements'),
+    path('reports/abc/', AbcReportView.as_view(), name='abc-report'),
+    
     # Existing endpoints
     path('categories/', CategoryListCreateView.as_view(), name='categories'),
     path('products/', ProductListCreateView.as_view(), name='products'),
     path('products/<int:pk>/', ProductRetrieveUpdateDestroyView.as_view(), name='product-detail'),
+    path('products/bulk-import/', ProductBulkImportView.as_view(), name='product-bulk-import'),
+    path('products/<int:pk>/stock/', ProductStockHistoryView.as_view(), name='product-stock'),
+    path('products/suggestions/', ProductSuggestionsView.as_view(), name='product-suggestions'),
+    path('products/bulk-update/', ProductBulkUpdateView.as_view(), name='product-bulk-update'),
     path('products/upload-image/', ProductImageUploadView.as_view(), name='product-upload-image'),
     path('sales/', SaleListCreateView.as_view(), name='sales'),
+    path('sales/<int:pk>/receipt/', SaleReceiptView.as_view(), name='sale-receipt'),
+    path('customers/', CustomerSearchView.as_view(), name='customers'),
+    path('customers/<str:phone>/history/', CustomerHistoryView.as_view(), name='customer-history'),
+    
+    # Stock takes
+    path('stock-takes/', StockTakeListCreateView.as_view(), name='stock-takes'),
+    path('stock-takes/<int:pk>/', StockTakeDetailView.as_view(), name='stock-take-detail'),
+    path('stock-takes/<int:pk>/counts/', StockTakeCountsView.as_view(), name='stock-take-counts'),
+    path('stock-takes/<int:pk>/commit/', StockTakeCommitView.as_view(), name='stock-take-commit'),
+    
+    # Async (ASGI) read endpoints
+    path('async/products/', async_views.products, name='async-products'),
+    path('async/notifications/', async_views.notifications, name='async-notifications'),
+    path('async/settings/', async_views.store_settings, name='async-settings'),
+    path('async/analytics/', async_views.analytics, name='async-analytics'),
+    path('bootstrap/', async_views.bootstrap, name='bootstrap'),
 ]
\ No newline at end of file
@@ -0,0 +1,57 @@
+import base64
+import re
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def day_range(day):
+    """Return the [start, end) datetimes of a calendar day in the current timezone.
+
+    Filtering on a created_at range (rather than ``created_at__date``) lets
+    PostgreSQL prune the monthly sales partitions.
+    """
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def encode_cursor(row):
+    """Keyset cursor for the position of ``row`` in a (-created_at, -id) ordering"""
+    return base64.urlsafe_b64encode(f'{row.created_at.isoformat()}|{row.id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Inverse of ``encode_cursor``; raises ValueError for malformed cursors"""
+    try:
+        created_at, _, pk = base64.urlsafe_b64decode(cursor.encode()).decode().partition('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except ValueError as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def normalize_phone(value):
+    """
+    E.164 form of a phone number (``+233241234567``), or None when it is not
+    one. National numbers (``024 123 4567``, or without the leading 0) get
+    PHONE_COUNTRY_CODE; ``+``/``00`` prefixed numbers keep their own.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    digits = re.sub(r'\D', '', value)
+    country = settings.PHONE_COUNTRY_CODE
+    if value.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith(country) and len(digits) == len(country) + settings.PHONE_NATIONAL_DIGITS:
+        pass
+    elif digits.startswith('0'):
+        digits = country + digits[1:]
+    elif len(digits) == settings.PHONE_NATIONAL_DIGITS:
+        digits = country + digits
+    # E.164 allows at most 15 digits; fewer than 8 is not a phone number
+    if not 8 <= len(digits) <= 15 or digits.startswith('0'):
+        return None
+    return '+' + digits
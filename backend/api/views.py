@@ -1,28 +1,49 @@
 from django.shortcuts import render
+from django.http import FileResponse
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.db.models import Sum, Count, Q, F
+from django.db.models import Sum, Count, F
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from rest_framework import generics, status
 from rest_framework.views import APIView
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import permission_classes
 from django.core.files.storage import default_storage
 from django.conf import settings
-import os, uuid
+import os, uuid, zoneinfo
 
-from .models import Category, Product, Sale, SaleItem, UserProfile, StoreSettings, Notification
-from .serializers import CategorySerializer, ProductSerializer, SaleSerializer
+from .models import Category, Product, Sale, UserProfile, StoreSettings, Notification, ZReport, StockMovement, StockTake
+from .serializers import (
+    CategorySerializer, ProductSerializer, SaleSerializer, ProductValuesSerializer, SaleValuesSerializer
+)
 from .permissions import require_permission, get_user_permissions
+from .analytics import build_analytics_payload, build_heatmap_payload, default_date_range
+from .associations import suggestions
+from .classification import build_report, default_period
+from .cache import cached_payload, payload_version
+from .conditional import conditional, generation_etag, with_etag
+from .db_router import use_replica
+from .reports import get_or_generate_zreport
+from .bulk_import import bulk_update_products, import_products, iter_csv, iter_json
+from .inventory import movement_report, stock_as_of
+from .stocktake import add_counts, commit_stock_take, variance_report
+from .signals import invalidate_notifications
+from .utils import day_range, normalize_phone
+from .renderers import ESCPOSRenderer, ReceiptHTMLRenderer, ReceiptPDFRenderer
+from . import customers, notifications, profiling, receipts
 
 
 class CategoryListCreateView(generics.ListCreateAPIView):
     queryset = Category.objects.all().order_by('id')
     serializer_class = CategorySerializer
+    
+    @conditional(generation_etag('catalog'))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 
 class ProductListCreateView(generics.ListCreateAPIView):
@@ -31,12 +52,64 @@ class ProductListCreateView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     
     @require_permission('view_products')
+    @conditional(generation_etag('catalog'))
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
     
     @require_permission('manage_products')
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
+    
+    def list(self, request, *args, **kwargs):
+        # Read path skips ModelSerializer (see ValuesSerializer)
+        return Response(ProductValuesSerializer(self.filter_queryset(self.get_queryset())).data)
+
+
+class ProductBulkImportView(APIView):
+    throttle_scope = 'bulk'
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    
+    @require_permission('manage_products')
+    def post(self, request):
+        """Upsert products by SKU from an uploaded CSV/JSON file or a JSON list of rows"""
+        dry_run = str(request.query_params.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        upload = request.FILES.get('file')
+        
+        if upload is not None:
+            fmt = request.data.get('format') or ('json' if upload.name.lower().endswith(('.json', '.ndjson', '.jsonl')) else 'csv')
+            rows = iter_json(upload) if fmt == 'json' else iter_csv(upload)
+        else:
+            rows = request.data.get('rows') if isinstance(request.data, dict) else request.data
+            if not isinstance(rows, list):
+                return Response({
+                    'error': 'Upload a CSV/JSON file as "file" or send a JSON list of rows'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            result = import_products(rows, dry_run=dry_run, user=request.user)
+        except (ValueError, UnicodeDecodeError) as e:
+            # Malformed JSON/CSV encoding; rows already committed stay committed
+            return Response({'error': f'Could not parse import file: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({'dry_run': dry_run, **result.as_dict()})
+
+
+class ProductBulkUpdateView(APIView):
+    throttle_scope = 'bulk'
+    permission_classes = [IsAuthenticated]
+    
+    @require_permission('manage_products')
+    def post(self, request):
+        """Update price/cost/stock/reorder_level for many products by id or sku"""
+        updates = request.data.get('updates') if isinstance(request.data, dict) else request.data
+        if not isinstance(updates, list):
+            return Response({
+                'error': 'updates must be a list'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        updated, errors = bulk_update_products(updates, user=request.user)
+        return Response({'updated': updated, 'failed': len(errors), 'errors': errors})
 
 
 class ProductRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
@@ -62,17 +135,75 @@ class ProductRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
 
 class SaleListCreateView(generics.ListCreateAPIView):
+    # Checkout: its own bucket, never shed under load (api/throttling.py)
+    throttle_scope = {'POST': 'checkout'}
     queryset = Sale.objects.all().order_by('-created_at')
     serializer_class = SaleSerializer
     permission_classes = [IsAuthenticated]
     
     @require_permission('view_sales')
+    # Sales changes bump the analytics generation (api/signals.py)
+    @conditional(generation_etag('analytics'))
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
     
     @require_permission('pos_access')
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
+    
+    def list(self, request, *args, **kwargs):
+        return Response(SaleValuesSerializer(self.filter_queryset(self.get_queryset())).data)
+
+
+class SaleReceiptView(APIView):
+    """Rendered receipt of a sale: ?format=html (default), pdf or escpos; cached (api/receipts.py)"""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [ReceiptHTMLRenderer, ReceiptPDFRenderer, ESCPOSRenderer]
+    
+    @require_permission('view_sales')
+    def get(self, request, pk):
+        fmt = request.accepted_renderer.format
+        try:
+            content = receipts.render(pk, fmt)
+        except Sale.DoesNotExist:
+            return Response({'error': 'Sale not found'}, status=status.HTTP_404_NOT_FOUND)
+        response = Response(content)
+        if fmt != 'html':
+            extension = 'bin' if fmt == 'escpos' else fmt
+            response['Content-Disposition'] = f'inline; filename="receipt-{pk}.{extension}"'
+        return response
+
+
+class CustomerSearchView(APIView):
+    """Returning customers by phone number or part of the name (?q=); see api/customers.py"""
+    permission_classes = [IsAuthenticated]
+    
+    @require_permission('view_sales')
+    def get(self, request):
+        return Response({'results': customers.search(request.query_params.get('q', ''))})
+
+
+class CustomerHistoryView(APIView):
+    """A customer's lifetime totals and purchase history, newest first (?cursor=&limit=)"""
+    permission_classes = [IsAuthenticated]
+    
+    @require_permission('view_sales')
+    def get(self, request, phone):
+        normalized = normalize_phone(phone)
+        if not normalized:
+            return Response({'error': 'Invalid phone number'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = customers.history_page(
+                normalized,
+                cursor=request.query_params.get('cursor'),
+                limit=request.query_params.get('limit', customers.PAGE_SIZE),
+            )
+        except ValueError:
+            return Response({'error': 'Invalid cursor or limit'}, status=status.HTTP_400_BAD_REQUEST)
+        totals = customers.totals(normalized)
+        if not totals['visits']:
+            return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'phone': normalized, 'totals': totals, **page})
 
 
 class ProductImageUploadView(APIView):
@@ -100,26 +231,19 @@ class LoginView(APIView):
                 'message': 'Email and password are required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Try to find user by email
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return Response({
-                'message': 'Invalid credentials'
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        
-        # Authenticate with username (Django's default)
-        user = authenticate(username=user.username, password=password)
+        # One query: user, profile and token by lower(email) (api/backends.py)
+        user = authenticate(request, email=email, password=password)
         
         if user:
-            # Create or get token
-            token, created = Token.objects.get_or_create(user=user)
+            try:
+                token = user.auth_token
+            except Token.DoesNotExist:
+                token, created = Token.objects.get_or_create(user=user)
             
-            # Get or create user profile
             try:
                 profile = user.profile
             except UserProfile.DoesNotExist:
-                profile = UserProfile.objects.create(user=user, role='cashier')
+                profile, created = UserProfile.objects.get_or_create(user=user, defaults={'role': 'cashier'})
             
             return Response({
                 'token': token.key,
@@ -173,86 +297,64 @@ class UserProfileView(APIView):
 
 
 class AnalyticsView(APIView):
+    throttle_scope = 'reports'
     permission_classes = [IsAuthenticated]
+    max_days = 366
     
     @require_permission('view_analytics')
+    @use_replica()
     def get(self, request):
         # Get date range (last 7 days by default)
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=6)
-        
-        # Daily sales data for the last 7 days
-        daily_sales = []
-        for i in range(7):
-            date = start_date + timedelta(days=i)
-            day_sales = Sale.objects.filter(created_at__date=date)
-            revenue = day_sales.aggregate(total=Sum('total_amount'))['total'] or 0
-            orders = day_sales.count()
-            
-            daily_sales.append({
-                'day': date.strftime('%a'),  # Mon, Tue, etc.
-                'date': date.isoformat(),
-                'revenue': float(revenue),
-                'orders': orders
-            })
-        
-        # Payment method distribution
-        payment_methods = Sale.objects.values('payment_method').annotate(
-            total=Sum('total_amount'),
-            count=Count('id')
-        ).order_by('-total')
-        
-        payment_data = [
-            {
-                'name': method['payment_method'] or 'Cash',
-                'value': float(method['total'] or 0),
-                'count': method['count']
-            }
-            for method in payment_methods
-        ]
-        
-        # Top selling products (based on sale items)
-        top_products = SaleItem.objects.values(
-            'product__name', 'product__price'
-        ).annotate(
-            total_quantity=Sum('quantity'),
-            total_revenue=Sum('subtotal')
-        ).order_by('-total_quantity')[:5]
-        
-        top_products_data = [
-            {
-                'name': product['product__name'][:20] + ('...' if len(product['product__name']) > 20 else ''),
-                'sales': product['total_quantity'],
-                'revenue': float(product['total_revenue'] or 0)
-            }
-            for product in top_products
-        ]
+        start_date, end_date = default_date_range()
+        try:
+            if request.query_params.get('start'):
+                start_date = date.fromisoformat(request.query_params['start'])
+            if request.query_params.get('end'):
+                end_date = date.fromisoformat(request.query_params['end'])
+        except ValueError:
+            return Response({
+                'error': 'start and end must be dates in YYYY-MM-DD format'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Overall statistics
-        total_sales = Sale.objects.aggregate(total=Sum('total_amount'))['total'] or 0
-        total_orders = Sale.objects.count()
-        today_sales = Sale.objects.filter(created_at__date=end_date)
-        today_revenue = today_sales.aggregate(total=Sum('total_amount'))['total'] or 0
-        today_orders = today_sales.count()
+        if start_date > end_date or (end_date - start_date).days >= self.max_days:
+            return Response({
+                'error': f'start must be before end and the range at most {self.max_days} days'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Low stock products
-        low_stock_products = Product.objects.filter(
-            stock__lte=F('reorder_level')
-        ).values('id', 'name', 'stock', 'reorder_level')[:10]
+        role = 'superuser' if request.user.is_superuser else request.user.profile.role
+        key = f'{role}:{start_date.isoformat()}:{end_date.isoformat()}'
+        version = payload_version('analytics', key)
+        payload = cached_payload('analytics', key, lambda: build_analytics_payload(start_date, end_date))
+        return with_etag(request, Response(payload), version)
+
+
+class SalesHeatmapView(APIView):
+    throttle_scope = 'reports'
+    permission_classes = [IsAuthenticated]
+    
+    @require_permission('view_analytics')
+    @use_replica()
+    def get(self, request):
+        """Revenue and orders by weekday x hour in the store's time zone (default last 28 days)"""
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=27)
+        try:
+            if request.query_params.get('start'):
+                start_date = date.fromisoformat(request.query_params['start'])
+            if request.query_params.get('end'):
+                end_date = date.fromisoformat(request.query_params['end'])
+        except ValueError:
+            return Response({
+                'error': 'start and end must be dates in YYYY-MM-DD format'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date:
+            return Response({'error': 'start must be before end'}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response({
-            'daily_sales': daily_sales,
-            'payment_methods': payment_data,
-            'top_products': top_products_data,
-            'statistics': {
-                'total_revenue': float(total_sales),
-                'total_orders': total_orders,
-                'today_revenue': float(today_revenue),
-                'today_orders': today_orders,
-                'avg_order_value': float(total_sales / total_orders) if total_orders > 0 else 0
-            },
-            'low_stock_products': list(low_stock_products)
-        })
+        tz = StoreSettings.get_settings().tzinfo
+        key = f'heatmap:{tz}:{start_date.isoformat()}:{end_date.isoformat()}'
+        version = payload_version('analytics', key)
+        payload = cached_payload('analytics', key, lambda: build_heatmap_payload(start_date, end_date, tz))
+        return with_etag(request, Response(payload), version)
 
 
 class UsersListView(APIView):
@@ -261,32 +363,30 @@ class UsersListView(APIView):
     @require_permission('manage_users')
     def get(self, request):
         
-        users = User.objects.all().order_by('-date_joined')
-        users_data = []
+        users = list(User.objects.select_related('profile').order_by('-date_joined'))
         
+        # Sales count and total for every cashier in one grouped query
+        sales_by_user = {
+            row['created_by']: row
+            for row in Sale.objects.filter(created_by__isnull=False).order_by().values('created_by').annotate(
+                count=Count('id'), total=Sum('total_amount')
+            )
+        }
+        
+        # Create default profiles for users without one, in one insert
+        missing = [UserProfile(user=user, role='staff') for user in users if not hasattr(user, 'profile')]
+        for profile in UserProfile.objects.bulk_create(missing):
+            profile.user.profile = profile
+        
+        users_data = []
         for user in users:
-            # Get user's sales count and total
-            try:
-                user_sales = Sale.objects.filter(created_by=user)
-                sales_count = user_sales.count()
-                sales_total = user_sales.aggregate(total=Sum('total_amount'))['total'] or 0
-            except Exception as e:
-                print(f"Error getting sales for user {user.username}: {e}")
-                sales_count = 0
-                sales_total = 0
-            
-            # Get user profile and role
-            try:
-                profile = user.profile
-                role = profile.role
-                role_display = profile.role_display
-                permissions = profile.permissions
-            except UserProfile.DoesNotExist:
-                # Create default profile for users without one
-                profile = UserProfile.objects.create(user=user, role='staff')
-                role = profile.role
-                role_display = profile.role_display
-                permissions = profile.permissions
+            stats = sales_by_user.get(user.id, {})
+            sales_count = stats.get('count', 0)
+            sales_total = stats.get('total') or 0
+            profile = user.profile
+            role = profile.role
+            role_display = profile.role_display
+            permissions = profile.permissions
             
             users_data.append({
                 'id': user.id,
@@ -477,28 +577,34 @@ class UpdateUserProfileView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
 
 
+def store_settings_data(settings):
+    """Serialize the StoreSettings singleton for the settings endpoints"""
+    return {
+        'store_name': settings.store_name,
+        'store_address': settings.store_address,
+        'store_phone': settings.store_phone,
+        'store_email': settings.store_email,
+        'currency': settings.currency,
+        'tax_rate': float(settings.tax_rate),
+        'time_zone': settings.time_zone,
+        'receipt_footer': settings.receipt_footer,
+        'auto_open_cash_drawer': settings.auto_open_cash_drawer,
+        'print_receipts': settings.print_receipts,
+        'ask_for_customer_info': settings.ask_for_customer_info,
+        'low_stock_alerts': settings.low_stock_alerts,
+        'daily_sales_report': settings.daily_sales_report,
+        'email_notifications': settings.email_notifications,
+        'sms_notifications': settings.sms_notifications,
+    }
+
+
 class StoreSettingsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         """Get store settings"""
         settings = StoreSettings.get_settings()
-        return Response({
-            'store_name': settings.store_name,
-            'store_address': settings.store_address,
-            'store_phone': settings.store_phone,
-            'store_email': settings.store_email,
-            'currency': settings.currency,
-            'tax_rate': float(settings.tax_rate),
-            'receipt_footer': settings.receipt_footer,
-            'auto_open_cash_drawer': settings.auto_open_cash_drawer,
-            'print_receipts': settings.print_receipts,
-            'ask_for_customer_info': settings.ask_for_customer_info,
-            'low_stock_alerts': settings.low_stock_alerts,
-            'daily_sales_report': settings.daily_sales_report,
-            'email_notifications': settings.email_notifications,
-            'sms_notifications': settings.sms_notifications,
-        })
+        return Response(store_settings_data(settings))
     
     @require_permission('manage_settings')
     def post(self, request):
@@ -518,6 +624,14 @@ class StoreSettingsView(APIView):
             settings.currency = request.data['currency']
         if 'tax_rate' in request.data:
             settings.tax_rate = request.data['tax_rate']
+        if 'time_zone' in request.data:
+            try:
+                zoneinfo.ZoneInfo(request.data['time_zone'])
+            except (zoneinfo.ZoneInfoNotFoundError, ValueError, TypeError):
+                return Response({
+                    'error': 'time_zone must be an IANA time zone name such as Africa/Accra'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            settings.time_zone = request.data['time_zone']
         if 'receipt_footer' in request.data:
             settings.receipt_footer = request.data['receipt_footer']
         if 'auto_open_cash_drawer' in request.data:
@@ -547,45 +661,75 @@ class StoreSettingsView(APIView):
                 'store_email': settings.store_email,
                 'currency': settings.currency,
                 'tax_rate': float(settings.tax_rate),
+                'time_zone': settings.time_zone,
             }
         })
 
 
+def notification_data(notif):
+    return {
+        'id': notif.id,
+        'type': notif.type,
+        'title': notif.title,
+        'message': notif.message,
+        'is_read': notif.is_read,
+        'created_at': notif.created_at.isoformat(),
+        'occurrences': notif.occurrences,
+        'product_id': notif.related_product_id,
+        'product_name': notif.related_product.name if notif.related_product else None,
+    }
+
+
 class NotificationsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        """Get user notifications"""
-        # Get unread notifications for the user or all if superuser
-        if request.user.is_superuser:
-            notifications = Notification.objects.all()[:20]
-        else:
-            notifications = Notification.objects.filter(
-                Q(user=request.user) | Q(user__isnull=True)
-            )[:20]
+        """Notification feed, newest first; pass ?cursor=<next_cursor> for older pages"""
+        try:
+            rows, limit = notifications.page_queryset(
+                request.user,
+                cursor=request.query_params.get('cursor'),
+                limit=request.query_params.get('limit', notifications.PAGE_SIZE),
+            )
+        except ValueError:
+            return Response({'error': 'Invalid cursor or limit'}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response([{
-            'id': notif.id,
-            'type': notif.type,
-            'title': notif.title,
-            'message': notif.message,
-            'is_read': notif.is_read,
-            'created_at': notif.created_at.isoformat(),
-            'product_id': notif.related_product_id,
-            'product_name': notif.related_product.name if notif.related_product else None,
-        } for notif in notifications])
+        return Response(notifications.page_data(list(rows), limit, notification_data))
     
     def post(self, request):
         """Mark notification as read"""
         notification_id = request.data.get('notification_id')
         
-        try:
-            notification = Notification.objects.get(id=notification_id)
-            notification.is_read = True
-            notification.save()
-            return Response({'message': 'Notification marked as read'})
-        except Notification.DoesNotExist:
+        if not Notification.objects.filter(id=notification_id).exists():
             return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
+        notifications.mark_read(request.user, ids=[notification_id])
+        return Response({'message': 'Notification marked as read'})
+
+
+class NotificationMarkReadView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        """Mark many notifications read: {"ids": [...]} or {"all": true}"""
+        if request.data.get('all') is True:
+            ids = None
+        else:
+            ids = request.data.get('ids')
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                return Response({
+                    'error': 'ids must be a list of notification ids (or send "all": true)'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        updated = notifications.mark_read(request.user, ids=ids)
+        return Response({'updated': updated, 'unread': notifications.unread_count(request.user)})
+
+
+class NotificationUnreadCountView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Unread badge count (served from cache between notification writes)"""
+        return Response({'unread': notifications.unread_count(request.user)})
 
 
 class CheckLowStockView(APIView):
@@ -599,28 +743,383 @@ class CheckLowStockView(APIView):
             return Response({'message': 'Low stock alerts are disabled'})
         
         # Find products with low stock
-        low_stock_products = Product.objects.filter(stock__lte=F('reorder_level'))
+        low_stock_products = list(
+            Product.objects.filter(stock__lte=F('reorder_level')).only('id', 'name', 'stock', 'reorder_level')
+        )
         
-        # Create notifications for low stock products
-        notifications_created = 0
+        # Latest low stock alert per product, in one query
+        latest = {}
+        for notif in Notification.objects.filter(
+            type='low_stock', user__isnull=True, related_product__in=[p.id for p in low_stock_products]
+        ).order_by('related_product', '-created_at', '-id'):
+            latest.setdefault(notif.related_product_id, notif)
+        
+        now = timezone.now()
+        new, reraised = [], []
         for product in low_stock_products:
-            # Check if notification already exists for this product
-            existing = Notification.objects.filter(
-                type='low_stock',
-                related_product=product,
-                is_read=False
-            ).exists()
-            
-            if not existing:
-                Notification.objects.create(
+            message = f'{product.name} is running low. Current stock: {product.stock}, Reorder level: {product.reorder_level}'
+            notif = latest.get(product.id)
+            if notif is None:
+                new.append(Notification(
                     type='low_stock',
                     title=f'Low Stock Alert: {product.name}',
-                    message=f'{product.name} is running low. Current stock: {product.stock}, Reorder level: {product.reorder_level}',
+                    message=message,
                     related_product=product
-                )
-                notifications_created += 1
+                ))
+            elif notif.is_read:
+                # Raise the existing alert again instead of adding another row
+                notif.is_read = False
+                notif.occurrences += 1
+                notif.message = message
+                notif.created_at = now
+                reraised.append(notif)
+        
+        Notification.objects.bulk_create(new)
+        Notification.objects.bulk_update(reraised, ['is_read', 'occurrences', 'message', 'created_at'])
+        if new or reraised:
+            invalidate_notifications()
         
         return Response({
-            'message': f'Created {notifications_created} new low stock notifications',
-            'low_stock_count': low_stock_products.count()
+            'message': f'Created {len(new)} new low stock notifications',
+            'reraised': len(reraised),
+            'low_stock_count': len(low_stock_products)
         })
+
+
+def zreport_data(report):
+    return {
+        'business_date': report.business_date.isoformat(),
+        'generated_at': report.generated_at.isoformat(),
+        'generated_by': report.generated_by_id,
+        **report.data,
+    }
+
+
+class ZReportListView(APIView):
+    throttle_scope = 'reports'
+    permission_classes = [IsAuthenticated]
+    
+    @require_permission('view_reports')
+    @use_replica()
+    def get(self, request):
+        """List stored Z-reports with their headline totals"""
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 31)), 366))
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        reports = ZReport.objects.values('business_date', 'generated_at', 'data__totals')[:limit]
+        return Response([{
+            'business_date': report['business_date'].isoformat(),
+            'generated_at': report['generated_at'].isoformat(),
+            'totals': report['data__totals'],
+        } for report in reports])
+
+
+class ZReportDetailView(APIView):
+    throttle_scope = 'reports'
+    permission_classes = [IsAuthenticated]
+    
+    @require_permission('view_reports')
+    @use_replica()
+    def get(self, request, business_date):
+        """Get the Z-report for a closed day, generating it on first request"""
+        try:
+            day = date.fromisoformat(business_date)
+        except ValueError:
+            return Response({
+                'error': 'Date must be in YYYY-MM-DD format'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            report = get_or_generate_zreport(day, user=request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ZReport.DoesNotExist as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response(zreport_data(report))
+
+
+def parse_moment(value):
+    """ISO date or datetime query parameter -> aware datetime (a date means end of that day)"""
+    if 'T' not in value and ' ' not in value:
+        return day_range(date.fromisoformat(value))[1] - timedelta(microseconds=1)
+    moment = datetime.fromisoformat(value)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+class ProductSuggestionsView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_cart = 100
+    
+    @require_permission('pos_access')
+    def get(self, request):
+        """Frequently-bought-together add-ons for the cart in ?products=1,2,3"""
+        try:
+            cart = [int(pk) for pk in request.query_params.get('products', '').split(',') if pk.strip()]
+            limit = max(1, min(int(request.query_params.get('limit', 5)), 20))
+        except ValueError:
+            return Response({
+                'error': 'products must be comma-separated product ids and limit a number'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(cart) > self.max_cart:
+            return Response({'error': f'At most {self.max_cart} products'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'products': cart,
+            'suggestions': suggestions(cart, limit) if cart else [],
+        })
+
+
+class ProductStockHistoryView(APIView):
+    throttle_scope = 'reports'
+    permission_classes = [IsAuthenticated]
+    
+    @require_permission('view_products')
+    @use_replica()
+    def get(self, request, pk):
+        """Stock of one product as of ?as_of= (default now) with the movements leading up to it"""
+        try:
+            as_of = parse_moment(request.query_params['as_of']) if request.query_params.get('as_of') else timezone.now()
+            limit = max(1, min(int(request.query_params.get('limit', 50)), 500))
+        except ValueError:
+            return Response({
+                'error': 'as_of must be an ISO date or datetime and limit a number'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        product = stock_as_of(as_of, Product.objects.filter(pk=pk)).values('id', 'name', 'sku', 'stock', 'stock_as_of').first()
+        if product is None:
+            return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        movements = StockMovement.objects.filter(product_id=pk, created_at__lte=as_of).values(
+            'id', 'kind', 'quantity', 'sale', 'note', 'created_by', 'created_at'
+        )[:limit]
+        return Response({
+            'product_id': product['id'],
+            'name': product['name'],
+            'sku': product['sku'],
+            'as_of': as_of.isoformat(),
+            'stock': product['stock_as_of'],
+            'current_stock': product['stock'],
+            'movements': list(movements),
+        })
+
+
+class StockAsOfView(APIView):
+    throttle_scope = 'reports'
+    permission_classes = [IsAuthenticated]
+    
+    @require_permission('view_reports')
+    @use_replica()
+    def get(self, request):
+        """Stock of every product as of ?as_of= (ISO date or datetime), in one query"""
+        try:
+            as_of = parse_moment(request.query_params['as_of'])
+        except (KeyError, ValueError):
+            return Response({
+                'error': 'as_of is required as an ISO date or datetime'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        rows = stock_as_of(as_of).order_by('id').values('id', 'name', 'sku', 'stock_as_of')
+        return Response({
+            'as_of': as_of.isoformat(),
+            'products': [{
+                'product_id': row['id'],
+                'name': row['name'],
+                'sku': row['sku'],
+                'stock': row['stock_as_of'],
+            } for row in rows],
+        })
+
+
+class StockMovementReportView(APIView):
+    throttle_scope = 'reports'
+    permission_classes = [IsAuthenticated]
+    
+    @require_permission('view_reports')
+    @use_replica()
+    def get(self, request):
+        """Movements per product and kind between ?start= and ?end= (dates, inclusive)"""
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=6)
+        try:
+            if request.query_params.get('start'):
+                start_date = date.fromisoformat(request.query_params['start'])
+            if request.query_params.get('end'):
+                end_date = date.fromisoformat(request.query_params['end'])
+            product_id = int(request.query_params['product']) if request.query_params.get('product') else None
+        except ValueError:
+            return Response({
+                'error': 'start and end must be dates in YYYY-MM-DD format and product a number'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date:
+            return Response({'error': 'start must be before end'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'products': movement_report(day_range(start_date)[0], day_range(end_date)[1], product_id),
+        })
+
+
+class AbcReportView(APIView):
+    throttle_scope = 'reports'
+    permission_classes = [IsAuthenticated]
+    max_days = 366
+    
+    @require_permission('view_reports')
+    @use_replica()
+    def get(self, request):
+        """ABC classes by revenue and margin for every product; ?class=A|B|C and ?slow=1 filter the list"""
+        start_date, end_date = default_period()
+        try:
+            if request.query_params.get('start'):
+                start_date = date.fromisoformat(request.query_params['start'])
+            if request.query_params.get('end'):
+                end_date = date.fromisoformat(request.query_params['end'])
+        except ValueError:
+            return Response({
+                'error': 'start and end must be dates in YYYY-MM-DD format'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date or (end_date - start_date).days >= self.max_days:
+            return Response({
+                'error': f'start must be before end and the range at most {self.max_days} days'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Stale once sales or products change (analytics generation, api/signals.py)
+        key = f'abc:{start_date.isoformat()}:{end_date.isoformat()}'
+        version = payload_version('analytics', key)
+        report = cached_payload('analytics', key, lambda: build_report(start_date, end_date), ttl=settings.ABC_REPORT_CACHE_TTL)
+        products = report['products']
+        if request.query_params.get('class'):
+            products = [row for row in products if row['revenue_class'] == request.query_params['class'].upper()]
+        if request.query_params.get('slow') in ('1', 'true'):
+            products = [row for row in products if row['slow_mover']]
+        return with_etag(request, Response({**report, 'products': products}), version)
+
+
+def stock_take_data(take):
+    return {
+        'id': take.id,
+        'note': take.note,
+        'status': take.status,
+        'created_by': take.created_by_id,
+        'created_at': take.created_at.isoformat(),
+        'committed_by': take.committed_by_id,
+        'committed_at': take.committed_at.isoformat() if take.committed_at else None,
+    }
+
+
+class StockTakeListCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    @require_permission('manage_products')
+    def get(self, request):
+        """Recent stock-take sessions"""
+        return Response([stock_take_data(take) for take in StockTake.objects.all()[:50]])
+    
+    @require_permission('manage_products')
+    def post(self, request):
+        """Open a new stock-take session"""
+        take = StockTake.objects.create(note=str(request.data.get('note') or '')[:255], created_by=request.user)
+        return Response(stock_take_data(take), status=status.HTTP_201_CREATED)
+
+
+class StockTakeDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    @require_permission('manage_products')
+    def get(self, request, pk):
+        """Session with its variance report (?only_variances=1 to hide matching counts)"""
+        take = StockTake.objects.filter(pk=pk).first()
+        if take is None:
+            return Response({'error': 'Stock take not found'}, status=status.HTTP_404_NOT_FOUND)
+        only_variances = str(request.query_params.get('only_variances', '')).lower() in ('1', 'true', 'yes')
+        return Response({**stock_take_data(take), **variance_report(take, only_variances)})
+    
+    @require_permission('manage_products')
+    def delete(self, request, pk):
+        """Cancel an open session; stock is left untouched"""
+        updated = StockTake.objects.filter(pk=pk, status='open').update(status='cancelled')
+        if not updated:
+            return Response({'error': 'No open stock take with this id'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class StockTakeCountsView(APIView):
+    throttle_scope = 'bulk'
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    
+    @require_permission('manage_products')
+    def post(self, request, pk):
+        """Add counts from a CSV/JSON file (sku/id, counted) or a JSON list of counts"""
+        take = StockTake.objects.filter(pk=pk).first()
+        if take is None:
+            return Response({'error': 'Stock take not found'}, status=status.HTTP_404_NOT_FOUND)
+        if take.status != 'open':
+            return Response({'error': f'Stock take is already {take.status}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        upload = request.FILES.get('file')
+        if upload is not None:
+            fmt = request.data.get('format') or ('json' if upload.name.lower().endswith(('.json', '.ndjson', '.jsonl')) else 'csv')
+            rows = iter_json(upload) if fmt == 'json' else iter_csv(upload)
+        else:
+            rows = request.data.get('counts') if isinstance(request.data, dict) else request.data
+            if not isinstance(rows, list):
+                return Response({
+                    'error': 'Upload a CSV/JSON file as "file" or send a JSON list of counts'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            saved, errors = add_counts(take, rows)
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({'error': f'Could not parse counts file: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({'saved': saved, 'failed': len(errors), 'errors': errors[:1000]})
+
+
+class StockTakeCommitView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    @require_permission('manage_products')
+    def post(self, request, pk):
+        """Apply the counts to product stock and record the adjustments in the ledger"""
+        take = StockTake.objects.filter(pk=pk).first()
+        if take is None:
+            return Response({'error': 'Stock take not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            adjusted = commit_stock_take(take, user=request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        take.refresh_from_db()
+        return Response({**stock_take_data(take), 'adjusted': adjusted})
+
+
+class ProfileListView(APIView):
+    throttle_scope = 'reports'
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Stored request profiles (see api/profiling.py), newest first"""
+        if not request.user.is_superuser:
+            return Response({'error': 'Superuser access required'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(profiling.list_reports())
+
+
+class ProfileDetailView(APIView):
+    throttle_scope = 'reports'
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, profile_id):
+        """A stored profile report; ?download=1 returns the flamegraph/pstats file"""
+        if not request.user.is_superuser:
+            return Response({'error': 'Superuser access required'}, status=status.HTTP_403_FORBIDDEN)
+        report = profiling.load(profile_id)
+        if report is None:
+            return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+        if request.query_params.get('download'):
+            path = profiling.artifact_path(report)
+            return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+        return Response(report)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os 
 from dotenv import load_dotenv
@@ -50,10 +51,18 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Sheds low-priority requests while the process is busy (api/throttling.py)
+    'api.throttling.LoadSheddingMiddleware',
+    # gzip/Brotli/zstd above anything that touches the body (api/compression.py)
+    'api.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Read-your-writes pinning when a read replica is configured (api/db_router.py)
+    'api.db_router.ReplicaPinMiddleware',
+    # Superuser-only ?__profile=1 request profiling (api/profiling.py)
+    'api.profiling.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -89,10 +98,86 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        # Persistent connections are off by default: under ASGI (uvicorn) each async
+        # request runs in its own thread and would leak its connection. WSGI
+        # deployments (gunicorn) can set DB_CONN_MAX_AGE=60 to reuse connections;
+        # the health checks then drop ones the server closed
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '0')),
+        'CONN_HEALTH_CHECKS': True,
     }
 
 }
 
+# Optional read replica for reporting traffic (api/db_router.py). Unset values
+# fall back to the primary's, so DB_REPLICA_HOST=localhost gives a second alias
+# on the same database for local testing.
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICA_ALIAS = 'replica'
+else:
+    DATABASE_REPLICA_ALIAS = None
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+# Seconds a client that just wrote keeps reading from the primary
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
+
+# Cache
+# Redis when REDIS_URL is set (shared between workers), otherwise per-process memory
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Responses smaller than this many bytes are sent uncompressed (api/compression.py)
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+
+# Token buckets per client and endpoint class (api/throttling.py): requests allowed at once,
+# sustained requests per second and the priority used when shedding load. Views pick their
+# class with `throttle_scope`; checkout and the health probes are never shed (the probes have
+# no bucket, so they are not rate-limited either)
+THROTTLE_BUCKETS = {
+    'checkout': {'burst': 30, 'rate': 2.0, 'priority': 'critical'},
+    'default': {'burst': 120, 'rate': 5.0, 'priority': 'normal'},
+    'reports': {'burst': 30, 'rate': 0.5, 'priority': 'low'},
+    'bulk': {'burst': 10, 'rate': 0.1, 'priority': 'low'},
+    'health': {'priority': 'critical'},
+}
+# Requests in flight per process above which low / normal priority requests get a 503
+LOAD_SHED_LOW_AT = int(os.getenv('LOAD_SHED_LOW_AT', '6'))
+LOAD_SHED_NORMAL_AT = int(os.getenv('LOAD_SHED_NORMAL_AT', '16'))
+LOAD_SHED_RETRY_AFTER = int(os.getenv('LOAD_SHED_RETRY_AFTER', '2'))
+
+# Precomputed payloads (api/cache.py): seconds an entry is fresh, seconds a stale
+# entry may still be served while it is refreshed, and the recompute lock timeout
+PAYLOAD_CACHE_TTL = int(os.getenv('PAYLOAD_CACHE_TTL', '60'))
+PAYLOAD_CACHE_STALE_TTL = int(os.getenv('PAYLOAD_CACHE_STALE_TTL', '86400'))
+PAYLOAD_CACHE_LOCK_TIMEOUT = int(os.getenv('PAYLOAD_CACHE_LOCK_TIMEOUT', '30'))
+
+
+# Email sign-in with user, profile and token in one query (api/backends.py); usernames
+# still work for the admin
+AUTHENTICATION_BACKENDS = [
+    'api.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -147,8 +232,73 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    # Token buckets per client and endpoint class (api/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': ['api.throttling.TokenBucketThrottle'],
+    # orjson-backed JSON (api/renderers.py); MessagePack when the package is installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        *(['api.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # Media files (for uploaded product images)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Compressed dumps of sales partitions removed by `manage.py sale_partitions`
+SALES_ARCHIVE_DIR = Path(os.getenv('SALES_ARCHIVE_DIR', BASE_DIR / 'archive'))
+
+# Periodic jobs (api/jobs.py), run by `manage.py run_scheduler`
+ZREPORT_CHECK_INTERVAL = int(os.getenv('ZREPORT_CHECK_INTERVAL', '600'))
+# Seconds between stock snapshots (api/inventory.py); history reads replay movements since the last one
+STOCK_SNAPSHOT_INTERVAL = int(os.getenv('STOCK_SNAPSHOT_INTERVAL', '86400'))
+
+# Rendered receipts (api/receipts.py): seconds a receipt stays cached, ESC/POS characters per line
+RECEIPT_CACHE_TTL = int(os.getenv('RECEIPT_CACHE_TTL', str(7 * 86400)))
+RECEIPT_LINE_WIDTH = int(os.getenv('RECEIPT_LINE_WIDTH', '42'))
+
+# Customer phone numbers are stored in E.164 form (api/utils.py): country calling code for
+# national numbers and their length without the leading 0
+PHONE_COUNTRY_CODE = os.getenv('PHONE_COUNTRY_CODE', '233')
+PHONE_NATIONAL_DIGITS = int(os.getenv('PHONE_NATIONAL_DIGITS', '9'))
+
+# Demand forecast (`manage.py forecast_demand`, api/forecasting.py): days of sales history,
+# supplier lead time, service level for safety stock, weighting half-life, minimum history
+# for a suggestion; the scheduled run copies suggestions into reorder_level when APPLY is on
+FORECAST_HISTORY_DAYS = int(os.getenv('FORECAST_HISTORY_DAYS', '90'))
+FORECAST_LEAD_TIME_DAYS = int(os.getenv('FORECAST_LEAD_TIME_DAYS', '7'))
+FORECAST_SERVICE_LEVEL = float(os.getenv('FORECAST_SERVICE_LEVEL', '0.95'))
+FORECAST_HALF_LIFE_DAYS = float(os.getenv('FORECAST_HALF_LIFE_DAYS', '14'))
+FORECAST_MIN_HISTORY_DAYS = int(os.getenv('FORECAST_MIN_HISTORY_DAYS', '14'))
+FORECAST_INTERVAL = int(os.getenv('FORECAST_INTERVAL', '86400'))
+FORECAST_APPLY = os.getenv('FORECAST_APPLY', 'False') == 'True'
+
+# ABC / slow-mover report (api/classification.py): default period, cumulative revenue
+# shares closing classes A and B, days without a sale that make stock a slow mover, and
+# how long a computed report stays fresh (new sales mark it stale sooner)
+ABC_PERIOD_DAYS = int(os.getenv('ABC_PERIOD_DAYS', '90'))
+ABC_A_SHARE = float(os.getenv('ABC_A_SHARE', '0.8'))
+ABC_B_SHARE = float(os.getenv('ABC_B_SHARE', '0.95'))
+SLOW_MOVER_DAYS = int(os.getenv('SLOW_MOVER_DAYS', '60'))
+ABC_REPORT_CACHE_TTL = int(os.getenv('ABC_REPORT_CACHE_TTL', '3600'))
+
+# "Frequently bought together" index (`manage.py build_associations`, api/associations.py):
+# days of baskets, days per read window, neighbours kept per product, minimum shared baskets
+ASSOCIATION_HISTORY_DAYS = int(os.getenv('ASSOCIATION_HISTORY_DAYS', '180'))
+ASSOCIATION_CHUNK_DAYS = int(os.getenv('ASSOCIATION_CHUNK_DAYS', '7'))
+ASSOCIATION_TOP_K = int(os.getenv('ASSOCIATION_TOP_K', '10'))
+ASSOCIATION_MIN_SUPPORT = int(os.getenv('ASSOCIATION_MIN_SUPPORT', '3'))
+ASSOCIATION_INTERVAL = int(os.getenv('ASSOCIATION_INTERVAL', '86400'))
+
+# Notification retention (`manage.py prune_notifications`, api/retention.py)
+NOTIFICATION_READ_TTL_DAYS = int(os.getenv('NOTIFICATION_READ_TTL_DAYS', '30'))
+NOTIFICATION_DELETE_BATCH = int(os.getenv('NOTIFICATION_DELETE_BATCH', '1000'))
+
+# Seconds /api/health/ready reuses its last result
+HEALTH_READY_CACHE_SECONDS = float(os.getenv('HEALTH_READY_CACHE_SECONDS', '2'))
+
+# Request profiler (api/profiling.py): where reports go, how many are kept, sampling period
+PROFILER_DIR = Path(os.getenv('PROFILER_DIR', BASE_DIR / 'profiles'))
+PROFILER_KEEP = int(os.getenv('PROFILER_KEEP', '50'))
+PROFILER_SAMPLE_INTERVAL = float(os.getenv('PROFILER_SAMPLE_INTERVAL', '0.002'))
@@ -68,7 +68,8 @@ def create_recent_sales():
                 product=product,
                 quantity=quantity,
                 unit_price=unit_price,
-                subtotal=subtotal
+                subtotal=subtotal,
+                created_at=sale.created_at
             )
             
             total += subtotal
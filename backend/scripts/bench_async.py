@@ -0,0 +1,73 @@
+"""
+Compare throughput of the sync (DRF) and async read endpoints under load.
+
+Start the server you want to measure, then point this script at it:
+
+    # ASGI
+    uvicorn backend_project.asgi:application --port 8001 --workers 1
+    # WSGI (threaded)
+    python manage.py runserver 8002 --noreload
+
+    python scripts/bench_async.py --base http://127.0.0.1:8001 --token <key>
+    python scripts/bench_async.py --base http://127.0.0.1:8002 --token <key>
+
+Each endpoint is hit with ``--concurrency`` simultaneous clients for
+``--requests`` requests, once through /api/<path> and once through
+/api/async/<path>.
+"""
+import argparse
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+PATHS = ['products/', 'notifications/', 'settings/', 'analytics/']
+
+
+def fetch(url, token):
+    request = urllib.request.Request(url, headers={'Authorization': f'Token {token}'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    return time.perf_counter() - start, status
+
+
+def run(url, token, concurrency, requests):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda _: fetch(url, token), range(requests)))
+        elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, status in results if status != 200)
+    return {
+        'rps': requests / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base', default='http://127.0.0.1:8000')
+    parser.add_argument('--token', required=True)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f'{"endpoint":<28}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"errors":>8}')
+    for path in PATHS:
+        for prefix in ('/api/', '/api/async/'):
+            url = f'{args.base}{prefix}{path}'
+            fetch(url, args.token)  # warm up
+            result = run(url, args.token, args.concurrency, args.requests)
+            print(f'{prefix + path:<28}{result["rps"]:>10.1f}{result["p50"]:>10.1f}{result["p95"]:>10.1f}{result["errors"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
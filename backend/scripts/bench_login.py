@@ -0,0 +1,133 @@
+"""
+Logins/s of the old and new login paths.
+
+    python scripts/bench_login.py --users 5000 --logins 500
+    python scripts/bench_login.py --hasher md5   # database cost only
+
+Seeds the requested number of users (with profiles and tokens) inside a
+transaction that is rolled back afterwards, then signs in random users
+through:
+
+* the old view: exact-match ``get(email=...)``, ``authenticate`` by
+  username, ``Token.get_or_create`` and a lazy profile load (before)
+* ``LoginView``: ``EmailBackend`` on ``lower(email)`` with profile and token
+  joined in (after)
+
+and reports logins/s and queries per login. With the configured password
+hasher (PBKDF2) the hash dominates; ``--hasher md5`` seeds and checks cheap
+hashes so the lookup cost shows. Throttling is switched off for the run.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import authenticate  # noqa: E402
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext, override_settings  # noqa: E402
+from rest_framework import status  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+from rest_framework.response import Response  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+from rest_framework.views import APIView  # noqa: E402
+
+from api.models import UserProfile  # noqa: E402
+from api.views import LoginView  # noqa: E402
+
+HASHERS = {
+    'default': None,
+    'md5': ['django.contrib.auth.hashers.MD5PasswordHasher'],
+}
+PASSWORD = 'bench-password'
+
+
+class Rollback(Exception):
+    pass
+
+
+class OldLoginView(APIView):
+    """The login view before the email backend, for comparison"""
+
+    def post(self, request):
+        email = request.data.get('email')
+        password = request.data.get('password')
+        try:
+            user = User.objects.get(email=email)
+        except User.DoesNotExist:
+            return Response({'message': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+        user = authenticate(username=user.username, password=password)
+        if not user:
+            return Response({'message': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+        token, created = Token.objects.get_or_create(user=user)
+        try:
+            profile = user.profile
+        except UserProfile.DoesNotExist:
+            profile = UserProfile.objects.create(user=user, role='cashier')
+        return Response({'token': token.key, 'user': {'id': user.id, 'role': profile.role}})
+
+
+def seed(users):
+    password = make_password(PASSWORD)
+    created = User.objects.bulk_create(
+        User(username=f'bench-{n}', email=f'Bench.User{n}@example.com', password=password)
+        for n in range(users)
+    )
+    UserProfile.objects.bulk_create(UserProfile(user=user, role='cashier') for user in created)
+    Token.objects.bulk_create(Token(user=user, key=Token.generate_key()) for user in created)
+    return [user.email for user in created]
+
+
+def measure(view, emails, logins):
+    factory = APIRequestFactory()
+    picks = [random.choice(emails) for _ in range(logins)]
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for email in picks:
+            response = view(factory.post('/api/auth/login/', {'email': email, 'password': PASSWORD}, format='json'))
+            assert response.status_code == 200, response.status_code
+        elapsed = time.perf_counter() - start
+    return logins / elapsed, len(queries) / logins
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--hasher', choices=HASHERS, default='default')
+    args = parser.parse_args()
+
+    overrides = {'THROTTLE_BUCKETS': {}}
+    if HASHERS[args.hasher]:
+        overrides['PASSWORD_HASHERS'] = HASHERS[args.hasher]
+
+    print(f'{"path":<12}{"logins/s":>12}{"queries":>10}')
+    try:
+        with override_settings(**overrides), transaction.atomic():
+            emails = seed(args.users)
+            # The new path matches regardless of case
+            variants = [email.lower() for email in emails]
+            for label, view, candidates in (
+                ('before', OldLoginView.as_view(), emails),
+                ('after', LoginView.as_view(), variants),
+            ):
+                measure(view, candidates, 5)  # warm up
+                rate, queries = measure(view, candidates, args.logins)
+                print(f'{label:<12}{rate:>12.1f}{queries:>10.1f}')
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()
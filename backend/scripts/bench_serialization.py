@@ -0,0 +1,102 @@
+"""
+Rows/s serialized by the old and new list read paths.
+
+    python scripts/bench_serialization.py --products 5000 --sales 2000
+
+Seeds the requested number of products and sales inside a transaction that is
+rolled back afterwards, then times, for the product and sales lists:
+
+* ModelSerializer(many=True) + DRF JSONRenderer (before)
+* ValuesSerializer + ORJSONRenderer (after)
+* ValuesSerializer + MessagePackRenderer (if msgpack is installed)
+"""
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import transaction  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from api.models import Product, Sale, SaleItem  # noqa: E402
+from api.renderers import MessagePackRenderer, ORJSONRenderer, msgpack  # noqa: E402
+from api.serializers import (  # noqa: E402
+    ProductSerializer, ProductValuesSerializer, SaleSerializer, SaleValuesSerializer
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(products, sales):
+    created = Product.objects.bulk_create(
+        Product(name=f'Bench product {n}', sku=f'BENCH-{n}', price=Decimal('10.00'), cost=Decimal('7.50'), stock=100)
+        for n in range(products)
+    )
+    sale_rows = Sale.objects.bulk_create(
+        Sale(receipt_number=f'BENCH-R-{n}', total_amount=Decimal('30.00'), payment_method='Cash')
+        for n in range(sales)
+    )
+    SaleItem.objects.bulk_create(
+        SaleItem(sale=sale, product=created[(n * 3 + k) % len(created)], quantity=1,
+                 unit_price=Decimal('10.00'), subtotal=Decimal('10.00'), created_at=sale.created_at)
+        for n, sale in enumerate(sale_rows) for k in range(3)
+    )
+
+
+def timed(label, rows, func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'{label:<44}{rows / best:>14,.0f} rows/s{len(body) / 1024:>12,.0f} KiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--sales', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            seed(args.products, args.sales)
+            products = Product.objects.order_by('id')
+            sales = Sale.objects.order_by('-created_at')
+            n_products, n_sales = products.count(), sales.count()
+
+            timed('products: ModelSerializer + JSONRenderer', n_products,
+                  lambda: JSONRenderer().render(ProductSerializer(products, many=True).data), args.repeat)
+            timed('products: ValuesSerializer + ORJSONRenderer', n_products,
+                  lambda: ORJSONRenderer().render(ProductValuesSerializer(products).data), args.repeat)
+            if msgpack is not None:
+                timed('products: ValuesSerializer + MessagePack', n_products,
+                      lambda: MessagePackRenderer().render(ProductValuesSerializer(products).data), args.repeat)
+
+            timed('sales: ModelSerializer + JSONRenderer', n_sales,
+                  lambda: JSONRenderer().render(SaleSerializer(sales, many=True).data), args.repeat)
+            timed('sales: ValuesSerializer + ORJSONRenderer', n_sales,
+                  lambda: ORJSONRenderer().render(SaleValuesSerializer(sales).data), args.repeat)
+            if msgpack is not None:
+                timed('sales: ValuesSerializer + MessagePack', n_sales,
+                      lambda: MessagePackRenderer().render(SaleValuesSerializer(sales).data), args.repeat)
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,9 @@
 // Health check utility to test backend connectivity
 export const checkBackendHealth = async (): Promise<boolean> => {
   try {
-    const response = await fetch('/api/products/', {
-      method: 'HEAD', // Just check if endpoint is reachable
+    // Dedicated readiness probe: no auth, no catalogue query, cached server-side
+    const response = await fetch('/api/health/ready', {
+      method: 'GET',
       signal: AbortSignal.timeout(5000), // 5 second timeout
     });
     return response.ok;